@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Recently used answers of the published crossword games, so new games don't repeat them.
+The answers of every committed game (game_N.json, including those moved to _archive) are logged in
+recent_answers.tsv next to the games, with one line per game:
+    timestamp<TAB>game file name<TAB>difficulty<TAB>ANSWER ANSWER ...
+judge_commit.py appends the line of each game it commits. Games missing from the log, e.g. committed
+before it existed, are appended the next time the log is loaded.
+Game numbers are reused once a game is archived, so a game is identified by its file name and timestamp.
+
+Usage:
+  python3 answer_freshness.py                    # update the log and list the answers of the last 50 games
+  python3 answer_freshness.py --fresh-days 30
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+RECENT_ANSWERS_FILE = 'recent_answers.tsv'
+DEFAULT_FRESH_GAMES = 50
+# The published games served by the server, whatever directory new games are generated into
+DEFAULT_GAMES_DIR = Path(__file__).parent / ".." / ".." / "server" / "data" / "crossword"
+
+
+def committed_game_files(games_dir):
+    """The committed game files in the games directory and its _archive, skipping unjudged .new.json games."""
+    games_path = Path(games_dir)
+    game_files = list(games_path.glob('game_*.json')) + list((games_path / '_archive').glob('game_*.json'))
+    return [game_file for game_file in game_files if not game_file.name.endswith('.new.json')]
+
+
+def read_recent_answers_log(log_file):
+    """
+    Reads the log as {(game file name, timestamp): (timestamp, difficulty, answers)}. A missing log is empty.
+    Every line is kept, so an archived game and a newer game with the same file name are both logged.
+    """
+    entries = {}
+    try:
+        with open(log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 4:
+                    continue
+                timestamp, name, difficulty, answers = fields
+                entries[(name, timestamp)] = (timestamp, difficulty, answers.split())
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def format_log_line(timestamp, name, difficulty, answers):
+    return f"{timestamp}\t{name}\t{difficulty}\t{' '.join(answers)}\n"
+
+
+# Game files already read, keyed by path, modification time and size, so reloading the log only reads new games
+_game_cache = {}
+
+
+def read_committed_game(game_file):
+    """Reads the (timestamp, difficulty, answers) of a committed game file."""
+    stat = game_file.stat()
+    cache_key = (str(game_file), stat.st_mtime_ns, stat.st_size)
+    if cache_key not in _game_cache:
+        with open(game_file, 'r', encoding='utf-8') as f:
+            game = json.load(f)
+        timestamp = game.get('timestamp') or datetime.fromtimestamp(stat.st_mtime).isoformat()
+        answers = [entry['answer'] for entry in game.get('clues', [])]
+        _game_cache[cache_key] = (timestamp, game.get('difficulty', 'UNKNOWN'), answers)
+    return _game_cache[cache_key]
+
+
+def update_recent_answers_log(games_dir, log_file=None):
+    """Appends the committed games that aren't logged yet. Returns every logged game."""
+    if log_file is None:
+        log_file = Path(games_dir) / RECENT_ANSWERS_FILE
+    entries = read_recent_answers_log(log_file)
+
+    new_lines = []
+    for game_file in committed_game_files(games_dir):
+        try:
+            timestamp, difficulty, answers = read_committed_game(game_file)
+        except (OSError, ValueError) as e:
+            print(f"✗ Skipping unreadable game file {game_file}: {e}", file=sys.stderr)
+            continue
+        # Archived games keep their file name and timestamp, so moving them doesn't log them again
+        if (game_file.name, timestamp) in entries:
+            continue
+        entries[(game_file.name, timestamp)] = (timestamp, difficulty, answers)
+        new_lines.append(format_log_line(timestamp, game_file.name, difficulty, answers))
+
+    if new_lines:
+        try:
+            with open(log_file, 'a', encoding='utf-8') as f:
+                f.writelines(new_lines)
+        except OSError as e:
+            print(f"✗ Failed to update {log_file}: {e}", file=sys.stderr)
+    return entries
+
+
+def load_recent_answers(games_dir, max_games=DEFAULT_FRESH_GAMES, max_age_days=None, now=None):
+    """
+    Answers of the max_games most recently published games, leaving out games older than max_age_days if given.
+    Rejected games were never published, so their answers stay available.
+    """
+    if not Path(games_dir).is_dir():
+        return set()
+    entries = update_recent_answers_log(games_dir)
+
+    published = sorted(
+        (entry for entry in entries.values() if entry[1] != 'REJECT'),
+        key=lambda entry: entry[0],
+        reverse=True)[:max_games]
+    if max_age_days is not None:
+        oldest = ((now or datetime.now()) - timedelta(days=max_age_days)).isoformat()
+        published = [entry for entry in published if entry[0] >= oldest]
+
+    return {answer for _, _, answers in published for answer in answers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the log of published answers and list the recently used ones.")
+    parser.add_argument("-d", "--games-dir", type=str, default=str(DEFAULT_GAMES_DIR), help="Directory of the published game files (default: server/data/crossword)")
+    parser.add_argument("--fresh-games", type=int, default=DEFAULT_FRESH_GAMES, help=f"Number of recent games whose answers are listed (default: {DEFAULT_FRESH_GAMES})")
+    parser.add_argument("--fresh-days", type=int, help="Only list answers of games published in the last N days")
+    args = parser.parse_args()
+
+    answers = load_recent_answers(args.games_dir, max_games=args.fresh_games, max_age_days=args.fresh_days)
+    print(f"✓ {len(answers)} answers used in the last {args.fresh_games} published games"
+          + (f" within {args.fresh_days} days" if args.fresh_days is not None else ''))
+    for answer in sorted(answers):
+        print(f"  {answer}")
+
+
+if __name__ == "__main__":
+    main()
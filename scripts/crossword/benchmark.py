@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the crossword generator over every shape with a fixed set of RNG seeds.
+Records wall time, words found, backtracks, retries and failure rate per shape, and compares
+the results to the committed baseline, failing if p50/p95 regress past a threshold.
+The search counters (backtracks, retries, failures) are deterministic per seed, so they are compared on any
+machine. Wall time depends on the machine, so it's only compared with --compare-wall-time against a baseline
+recorded on the same machine.
+
+By default it runs the backjump solver, which fills every shape for every seed, against the bundled
+data/benchmark_words.txt word list, so it doesn't need the downloads from init.py.
+Use --clues to benchmark against crossword_clues.json instead.
+
+Usage:
+  python3 benchmark.py                      # run and compare to data/benchmark_baseline.json
+  python3 benchmark.py --update-baseline    # run and store the results as the new baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from generate_games import generate_game, load_json_file, new_generation_metrics, DEFAULT_SCORING_ENGINE, RESTART_POLICIES, SCORING_ENGINES, SLOT_ORDERS, SOLVER_ENGINES
+from stage_timer import peak_rss_kb
+from word_index import WordIndex
+
+COMPARED_METRICS = ['backtracks', 'retry_count']
+COMPARED_PERCENTILES = ['p50', 'p95']
+# Both scoring engines pick the same words, so a baseline recorded with either one applies
+IGNORED_PARAMETERS = ['scoring']
+
+
+def load_benchmark_words(words_file):
+    """Loads a plain word list (one word per line) with placeholder clues for every word."""
+    with open(words_file, 'r', encoding='utf-8') as f:
+        words = [line.strip().upper() for line in f if line.strip()]
+    return {word: {'score': 50, 'clues': [f"Benchmark clue for {word}"]} for word in words}
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(values):
+    return {
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'max': max(values) if values else 0,
+        'mean': round(sum(values) / len(values), 1) if values else 0,
+    }
+
+
+def benchmark_shape(shape, clues_index, word_index, seeds, generation_options, trace_memory=False):
+    runs = []
+    for seed in seeds:
+        random.seed(seed)
+        metrics = new_generation_metrics()
+        if trace_memory:
+            tracemalloc.start()
+
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            game = generate_game(shape, clues_index, word_index, metrics=metrics, **generation_options)
+        wall_ms = (time.perf_counter() - start_time) * 1000
+
+        run = {
+            'seed': seed,
+            'success': game is not None,
+            'wall_ms': round(wall_ms, 1),
+            'words_found': metrics['words_found'],
+            'backtracks': metrics['backtracks'],
+            'retry_count': metrics['retry_count'],
+            'restarts': metrics['restarts'],
+        }
+        if trace_memory:
+            run['peak_traced_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+        runs.append(run)
+
+    failures = sum(1 for run in runs if not run['success'])
+    result = {
+        'runs': len(runs),
+        'failures': failures,
+        'failure_rate': round(failures / len(runs), 3) if runs else 0,
+    }
+    for key in ['wall_ms', 'words_found', 'backtracks', 'retry_count', 'restarts']:
+        result[key] = summarize([run[key] for run in runs])
+    if trace_memory:
+        result['peak_traced_kb'] = max(run['peak_traced_kb'] for run in runs)
+    result['seeds'] = runs
+    return result
+
+
+def run_benchmark(shapes, clues_index, seeds, generation_options, trace_memory=False):
+    word_index = WordIndex(clues_index.keys())
+    report = {
+        'parameters': {
+            'seeds': list(seeds),
+            'words': len(word_index),
+            **generation_options,
+        },
+        'shapes': {},
+    }
+
+    print(f"{'shape':<28} {'fail':>6} {'p50 ms':>9} {'p95 ms':>9} {'p50 bt':>8} {'p95 bt':>8} {'p50 retry':>10}" + (f" {'traced kb':>10}" if trace_memory else ''))
+    for shape in shapes:
+        result = benchmark_shape(shape, clues_index, word_index, seeds, generation_options, trace_memory=trace_memory)
+        report['shapes'][shape['name']] = result
+        line = (f"{shape['name']:<28} {result['failure_rate']:>6.0%} {result['wall_ms']['p50']:>9.1f} {result['wall_ms']['p95']:>9.1f} "
+                f"{result['backtracks']['p50']:>8} {result['backtracks']['p95']:>8} {result['retry_count']['p50']:>10}")
+        if trace_memory:
+            line += f" {result['peak_traced_kb']:>10}"
+        print(line)
+
+    # The RSS high-water mark only grows, so it is reported once for the whole run rather than per shape
+    report['peak_rss_kb'] = peak_rss_kb()
+    print(f"Peak RSS: {report['peak_rss_kb'] or '-'} KB")
+    return report
+
+
+def compare_to_baseline(report, baseline, threshold, min_wall_ms, compare_wall_time=False):
+    """
+    Returns a list of regressions of the report compared to the baseline.
+    p50/p95 of the compared metrics regress when they grow by more than the threshold (a fraction),
+    and the failure rate regresses when it grows by more than the threshold in absolute terms.
+    With compare_wall_time, wall time is compared too, ignoring differences under min_wall_ms as noise.
+    """
+    def compared_parameters(parameters):
+        return {key: value for key, value in parameters.items() if key not in IGNORED_PARAMETERS}
+
+    if compared_parameters(report['parameters']) != compared_parameters(baseline['parameters']):
+        return [f"Baseline parameters {baseline['parameters']} don't match the run parameters {report['parameters']}"]
+
+    metrics = COMPARED_METRICS + (['wall_ms'] if compare_wall_time else [])
+
+    regressions = []
+    for shape_name, result in report['shapes'].items():
+        baseline_result = baseline['shapes'].get(shape_name)
+        if baseline_result is None:
+            continue
+
+        if result['failure_rate'] > baseline_result['failure_rate'] + threshold:
+            regressions.append(f"{shape_name}: failure rate {baseline_result['failure_rate']:.0%} -> {result['failure_rate']:.0%}")
+
+        for metric in metrics:
+            for stat in COMPARED_PERCENTILES:
+                before = baseline_result[metric][stat]
+                after = result[metric][stat]
+                if metric == 'wall_ms' and after - before < min_wall_ms:
+                    continue
+                if after > before * (1 + threshold) and after > before:
+                    regressions.append(f"{shape_name}: {stat} {metric} {before} -> {after}")
+    return regressions
+
+
+def main():
+    script_dir = Path(__file__).parent
+    data_dir = script_dir / "data"
+
+    parser = argparse.ArgumentParser(description="Benchmark crossword game generation.")
+    parser.add_argument("--shapes", type=str, default=str(data_dir / "crossword_shapes.json"), help="Crossword shapes file")
+    parser.add_argument("--shape", action="append", help="Only benchmark the named shape (can be repeated)")
+    parser.add_argument("--words", type=str, default=str(data_dir / "benchmark_words.txt"), help="Plain word list to generate from")
+    parser.add_argument("--clues", type=str, help="Use a crossword_clues.json file instead of the word list")
+    parser.add_argument("--seeds", type=int, default=5, help="Number of RNG seeds to run per shape (default: 5)")
+    parser.add_argument("-t", "--top", type=int, default=100, help="Number of top-scored words to randomly select from (default: 100)")
+    parser.add_argument("--solver", choices=SOLVER_ENGINES, default='backjump', help="Search engine to benchmark (default: backjump)")
+    parser.add_argument("--order", choices=SLOT_ORDERS, help="Slot ordering strategy to benchmark (default: the solver's default)")
+    parser.add_argument("--restarts", choices=RESTART_POLICIES, default='none', help="Restart schedule to benchmark (default: none)")
+    parser.add_argument("--timeout-ms", type=int, help="Per game time limit")
+    parser.add_argument("--portfolio", action="store_true", help="Benchmark portfolio mode, racing strategies in parallel processes")
+    parser.add_argument("--scoring", choices=SCORING_ENGINES, default=DEFAULT_SCORING_ENGINE, help=f"Candidate scoring engine (default: {DEFAULT_SCORING_ENGINE})")
+    parser.add_argument("--trace-memory", action="store_true", help="Also record the peak traced allocation of each run (slows the runs down)")
+    parser.add_argument("--report", type=str, help="Write the JSON report to this file")
+    parser.add_argument("--baseline", type=str, default=str(data_dir / "benchmark_baseline.json"), help="Baseline report to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p50/p95 regression as a fraction (default: 0.2)")
+    parser.add_argument("--compare-wall-time", action="store_true", help="Also compare wall times, for a baseline recorded on this machine")
+    parser.add_argument("--min-wall-ms", type=float, default=50, help="Ignore wall time regressions smaller than this (default: 50)")
+    args = parser.parse_args()
+
+    shapes = load_json_file(args.shapes)
+    if args.shape:
+        shapes = [s for s in shapes if s['name'] in args.shape]
+        if not shapes:
+            print(f"✗ No crossword shapes found named {args.shape}", file=sys.stderr)
+            sys.exit(2)
+
+    clues_index = load_json_file(args.clues) if args.clues else load_benchmark_words(args.words)
+    generation_options = {
+        'top_n': args.top,
+        'solver': args.solver,
+        'order': args.order,
+        'restarts': args.restarts,
+        'timeout_ms': args.timeout_ms,
+        'portfolio': args.portfolio,
+        'scoring': args.scoring,
+    }
+
+    report = run_benchmark(shapes, clues_index, range(args.seeds), generation_options, trace_memory=args.trace_memory)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Wrote benchmark report to {args.report}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Updated benchmark baseline {args.baseline}")
+        return
+
+    if not Path(args.baseline).exists():
+        print(f"\n✗ No baseline found at {args.baseline}, run with --update-baseline to create one.", file=sys.stderr)
+        sys.exit(2)
+
+    regressions = compare_to_baseline(report, load_json_file(args.baseline), args.threshold, args.min_wall_ms, compare_wall_time=args.compare_wall_time)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) compared to {args.baseline}:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  - {regression}", file=sys.stderr)
+        sys.exit(1)
+    print(f"\n✓ No regressions compared to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+SQLite clue store for the crossword generator.
+The generator only needs the answer list to search for a fill, so rather than loading every clue
+into memory it reads the answers at startup and looks up the clues of the final answers on demand.
+"""
+import os
+import sqlite3
+from pathlib import Path
+
+
+def write_clue_store(clues_by_answer, store_file):
+    """
+    Writes {answer: {'score': int, 'clues': [str]}} to an indexed SQLite database.
+    The database is built in a temporary file and replaced atomically.
+    """
+    store_path = Path(store_file)
+    temp_path = store_path.with_name(store_path.name + '.tmp')
+    if temp_path.exists():
+        temp_path.unlink()
+
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute("CREATE TABLE answers (answer TEXT PRIMARY KEY, score INTEGER NOT NULL) WITHOUT ROWID")
+        connection.execute("CREATE TABLE clues (answer TEXT NOT NULL, clue TEXT NOT NULL)")
+        with connection:
+            connection.executemany(
+                "INSERT INTO answers (answer, score) VALUES (?, ?)",
+                ((answer, entry['score']) for answer, entry in sorted(clues_by_answer.items())))
+            connection.executemany(
+                "INSERT INTO clues (answer, clue) VALUES (?, ?)",
+                ((answer, clue) for answer, entry in sorted(clues_by_answer.items()) for clue in entry['clues']))
+        # Build the index after the bulk insert, it's much faster than maintaining it row by row
+        connection.execute("CREATE INDEX clues_by_answer ON clues (answer)")
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_path, store_path)
+
+
+class ClueStore:
+    """
+    Read-only view of a clue store database, answering the same get()/keys() lookups as the
+    crossword_clues.json dictionary. Each process opens its own connection on first use,
+    so a store inherited by forked worker processes never shares a connection.
+    """
+
+    def __init__(self, store_file):
+        self.store_file = Path(store_file)
+        if not self.store_file.exists():
+            raise FileNotFoundError(f"Clue store {store_file} not found")
+        self._connection = None
+        self._connection_pid = None
+
+    def connection(self):
+        if self._connection is None or self._connection_pid != os.getpid():
+            uri = self.store_file.resolve().as_uri() + '?mode=ro'
+            self._connection = sqlite3.connect(uri, uri=True)
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def keys(self):
+        """Lists every answer in the store."""
+        return [answer for (answer,) in self.connection().execute("SELECT answer FROM answers")]
+
+    def __len__(self):
+        return self.connection().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def __contains__(self, answer):
+        return self.connection().execute("SELECT 1 FROM answers WHERE answer = ?", (answer,)).fetchone() is not None
+
+    def get(self, answer, default=None):
+        """The {'score': int, 'clues': [str]} entry of the answer, or default if it isn't in the store."""
+        connection = self.connection()
+        row = connection.execute("SELECT score FROM answers WHERE answer = ?", (answer,)).fetchone()
+        if row is None:
+            return default
+        clues = [clue for (clue,) in connection.execute("SELECT clue FROM clues WHERE answer = ? ORDER BY rowid", (answer,))]
+        return {'score': row[0], 'clues': clues}
+
+    def close(self):
+        if self._connection is not None and self._connection_pid == os.getpid():
+            self._connection.close()
+        self._connection = None
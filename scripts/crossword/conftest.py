@@ -0,0 +1,45 @@
+"""
+Shared fixtures for the crossword script tests.
+They generate from the bundled data/benchmark_words.txt and data/crossword_shapes.json, like benchmark.py,
+so the tests don't need the downloads from init.py.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+import generate_games
+from benchmark import load_benchmark_words
+from shape_library import compile_shape
+from word_index import WordIndex
+
+DATA_DIR = Path(__file__).parent / "data"
+WORDS_FILE = DATA_DIR / "benchmark_words.txt"
+SHAPES_FILE = DATA_DIR / "crossword_shapes.json"
+
+
+@pytest.fixture(scope="session")
+def clues_index():
+    return load_benchmark_words(WORDS_FILE)
+
+
+@pytest.fixture
+def word_index(clues_index):
+    # A fresh index per test, as some tests exclude words from it
+    return WordIndex(clues_index.keys())
+
+
+@pytest.fixture(scope="session")
+def shapes():
+    with open(SHAPES_FILE, 'r', encoding='utf-8') as f:
+        return {shape['name']: compile_shape(shape) for shape in json.load(f)}
+
+
+@pytest.fixture
+def worker_context():
+    """Leaves the module-level worker context as it was, since pools started by a test fill it in this process."""
+    saved = dict(generate_games._worker_context)
+    generate_games._worker_context.clear()
+    yield generate_games._worker_context
+    generate_games._worker_context.clear()
+    generate_games._worker_context.update(saved)
@@ -3,76 +3,146 @@
 Filters and formats crossword clue files from the raw datasets, reducing the size on disk.
 NOTE: This script is automatically called by init.py - you probably don't need to run it manually.
 """
-import os
+import argparse
+import hashlib
 import json
+import multiprocessing
+import os
+import zipfile
+from pathlib import Path
+from clue_store import write_clue_store
+from stage_timer import StageTimer
 
-def read_clues(file_path, min_length=None, max_length=None, min_year=None, max_year=None):
-    """Read crossword clues from a text file and return as a list."""
-    clues = []
-    total_clues = 0
-    invalid_clues = 0
-    clues_too_old = 0
-    clues_too_new = 0
-    words_too_short = 0
-    words_too_long = 0
+def new_clue_counters():
+    return {
+        'total': 0,
+        'valid': 0,
+        'invalid': 0,
+        'too_old': 0,
+        'too_new': 0,
+        'too_short': 0,
+        'too_long': 0,
+    }
 
-    with open(file_path, 'r', encoding='utf-8') as f:
+
+def print_clue_summary(counters):
+    print("=== Clue file processing summary ===")
+    print(f"Invalid clues skipped: {counters['invalid']}")
+    print(f"Invalid clue date: {counters['too_old'] + counters['too_new']}")
+    print(f"    - Too old: {counters['too_old']}")
+    print(f"    - Too new: {counters['too_new']}")
+    print(f"Invalid answer length: {counters['too_short'] + counters['too_long']}")
+    print(f"    - Too short: {counters['too_short']}")
+    print(f"    - Too long: {counters['too_long']}")
+    print(f"Total clues processed: {counters['total']}")
+    print(f"Valid clues retained: {counters['valid']}")
+    print()
+
+
+def decode_lines(f, position=0, end=None):
+    """Decode the lines of a binary stream, stopping at the first line starting at or after the end offset."""
+    for line in f:
+        if end is not None and position >= end:
+            break
+        position += len(line)
+        text = line.decode('utf-8')
+        # Match text mode, which also ends lines on a lone carriage return
+        if b'\r' in line and '\r' in text.rstrip('\r\n'):
+            yield from text.replace('\r\n', '\n').split('\r')
+        else:
+            yield text
+
+
+def read_lines(file_path, start=0, end=None, member=None):
+    """
+    Read the lines of a text file that start within the byte range [start, end).
+    The line straddling start belongs to the previous range, so ranges split anywhere cover every line once.
+    If a member is given, the file is a zip archive and the member is decompressed as it is read.
+    """
+    if member is not None:
+        with zipfile.ZipFile(file_path, 'r') as archive, archive.open(member) as f:
+            yield from decode_lines(f)
+        return
+
+    with open(file_path, 'rb') as f:
+        f.seek(max(0, start - 1))
+        if start > 0:
+            # Skip the rest of the line the previous range ends with
+            f.readline()
+        yield from decode_lines(f, f.tell(), end)
+
+
+def find_chunk_ranges(file_path, chunks):
+    """Split a file into about equal byte ranges. read_lines aligns them to line boundaries."""
+    size = os.path.getsize(file_path)
+    boundaries = sorted(set(size * i // chunks for i in range(chunks + 1)))
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_clues(file_path, min_length=None, max_length=None, min_year=None, max_year=None, start=0, end=None, counters=None, member=None):
+    """
+    Read crossword clues from a text file, yielding the valid clues one at a time.
+    Only reads the lines starting in the byte range [start, end) if given.
+    If a member is given, the clues are read straight out of that file in the zip archive file_path.
+    The processing summary is printed once the file has been read to the end,
+    unless a counters dict is passed in to collect the counts instead.
+    """
+    print_summary = counters is None
+    if counters is None:
+        counters = new_clue_counters()
+
+    lines = read_lines(file_path, start, end, member=member)
+    if start == 0:
         # skip first line (header)
-        next(f)
+        next(lines, None)
 
-        for line in f:
-            # read pubid	year	answer	clue split by tabs
-            parts = line.strip().split('\t')
-            total_clues += 1
+    for line in lines:
+        # read pubid	year	answer	clue split by tabs
+        parts = line.strip().split('\t')
+        counters['total'] += 1
 
-            if len(parts) != 4:
-                invalid_clues += 1
-                continue
-            
-            pubid, year, answer, clue = parts[:4]
-            year = int(year)
-            if (min_year is not None and year < min_year):
-                clues_too_old += 1
-                continue
+        if len(parts) != 4:
+            counters['invalid'] += 1
+            continue
+        
+        pubid, year, answer, clue = parts[:4]
+        year = int(year)
+        if (min_year is not None and year < min_year):
+            counters['too_old'] += 1
+            continue
 
-            if (max_year is not None and year > max_year):
-                clues_too_new += 1
-                continue
+        if (max_year is not None and year > max_year):
+            counters['too_new'] += 1
+            continue
 
-            answer_length = len(answer)
-            if (min_length is not None and answer_length < min_length):
-                words_too_short += 1
-                continue
+        answer_length = len(answer)
+        if (min_length is not None and answer_length < min_length):
+            counters['too_short'] += 1
+            continue
 
-            if (max_length is not None and answer_length > max_length):
-                words_too_long += 1
-                continue
+        if (max_length is not None and answer_length > max_length):
+            counters['too_long'] += 1
+            continue
 
-            clues.append({
-                'pubid': pubid,
-                'year': year,
-                'answer': answer,
-                'clue': clue
-            })
+        counters['valid'] += 1
+        yield {
+            'pubid': pubid,
+            'year': year,
+            'answer': answer,
+            'clue': clue
+        }
 
-    print("=== Clue file processing summary ===")
-    print(f"Invalid clues skipped: {invalid_clues}")
-    print(f"Invalid clue date: {clues_too_old + clues_too_new}")
-    print(f"    - Too old: {clues_too_old}")
-    print(f"    - Too new: {clues_too_new}")
-    print(f"Invalid answer length: {words_too_short + words_too_long}")
-    print(f"    - Too short: {words_too_short}")
-    print(f"    - Too long: {words_too_long}")
-    print(f"Total clues processed: {total_clues}")
-    print(f"Valid clues retained: {len(clues)}")
-    print()
-    return clues
+    if print_summary:
+        print_clue_summary(counters)
 
 
 def read_wordlist(file_path):
-    """Read words from a text file and return as a list."""
-    words = []
+    """
+    Read words from a text file, yielding the valid words one at a time.
+    The processing summary is printed once the file has been read to the end.
+    """
     total_words = 0
+    valid_words = 0
     invalid_words = 0
     with open(file_path, 'r', encoding='utf-8') as f:
         for line in f:
@@ -84,20 +154,199 @@ def read_wordlist(file_path):
                 continue
             
             word, score = parts
-            words.append({
+            valid_words += 1
+            yield {
                 'word': word,
                 'score': int(score)
-            })
+            }
 
     print("=== Wordlist file processing summary ===")
     print(f"Invalid words skipped: {invalid_words}")
     print(f"Total words processed: {total_words}")
-    print(f"Valid words retained: {len(words)}")
+    print(f"Valid words retained: {valid_words}")
     print()
-    return words
 
-def format_crossword_clues_dictionary(wordlist_file, clues_file, output_file, parameters=None):
-    """Merge clues for crossword answers - add with wordlist score for filtering."""
+
+def resolve_answer_score(scores, min_score):
+    """
+    Replays the word list entries of an answer that has clues, in word list order.
+    An entry below the score threshold drops the answer, and entries after that count as missing clues.
+    Returns (score, below_threshold, clues_missing), where score is None if the answer was dropped.
+    """
+    present = True
+    score = None
+    below_threshold = 0
+    clues_missing = 0
+    for entry_score in scores:
+        if not present:
+            clues_missing += 1
+        elif entry_score >= min_score:
+            score = entry_score
+        else:
+            below_threshold += 1
+            present = False
+            score = None
+    return score, below_threshold, clues_missing
+
+
+# Answers to keep clues for, shared with the chunk worker processes
+_chunk_context = {}
+
+
+def init_chunk_worker(kept_answers):
+    _chunk_context['kept_answers'] = kept_answers
+
+
+def group_clue_chunk(task):
+    """
+    Filters the clues in a byte range of the clues file and groups them by answer.
+    Returns the clue counters, the number of valid clues of every answer seen and the
+    clues of the answers being kept, all in order of first appearance.
+    """
+    file_path, start, end, parameters, member = task
+    kept_answers = _chunk_context['kept_answers']
+    counters = new_clue_counters()
+    clue_counts = {}
+    clues_by_answer = {}
+    for clue in read_clues(file_path,
+                           min_length=parameters['min_length'],
+                           max_length=parameters['max_length'],
+                           min_year=parameters['min_year'],
+                           max_year=parameters['max_year'],
+                           start=start,
+                           end=end,
+                           counters=counters,
+                           member=member):
+        answer = clue['answer']
+        clue_counts[answer] = clue_counts.get(answer, 0) + 1
+        if answer in kept_answers:
+            # A dict keeps the clues unique like a set, but in a deterministic order
+            clues_by_answer.setdefault(answer, {})[clue['clue']] = None
+    return counters, clue_counts, clues_by_answer
+
+
+def group_clues(clues_file, parameters, kept_answers, workers=1, clues_member=None):
+    """
+    Groups the valid clues of the kept answers, splitting the clues file between worker processes.
+    Chunks are merged in file order, so the result is the same for any number of workers.
+    """
+    if clues_member is not None and workers > 1:
+        # Compressed zip members can't be split into byte ranges without decompressing them
+        print(f"✗ Clues streamed from a zip archive are read by a single process, ignoring --workers {workers}")
+        workers = 1
+
+    if workers > 1:
+        # A few chunks per worker evens out the load
+        ranges = find_chunk_ranges(clues_file, workers * 4)
+    else:
+        ranges = [(0, None)]
+    tasks = [(clues_file, start, end, parameters, clues_member) for start, end in ranges]
+
+    if workers > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(workers, initializer=init_chunk_worker, initargs=(kept_answers,))
+        results = pool.imap(group_clue_chunk, tasks)
+    else:
+        pool = None
+        init_chunk_worker(kept_answers)
+        results = map(group_clue_chunk, tasks)
+
+    counters = new_clue_counters()
+    clue_counts = {}
+    clues_by_answer = {}
+    try:
+        for chunk_counters, chunk_clue_counts, chunk_clues_by_answer in results:
+            for key, count in chunk_counters.items():
+                counters[key] += count
+            for answer, count in chunk_clue_counts.items():
+                clue_counts[answer] = clue_counts.get(answer, 0) + count
+            for answer, clues in chunk_clues_by_answer.items():
+                clues_by_answer.setdefault(answer, {}).update(clues)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return counters, clue_counts, clues_by_answer
+
+
+# The manifest records what the formatted clues were built from, so unchanged inputs aren't rebuilt
+MANIFEST_VERSION = 1
+CLUE_PARAMETERS = ['min_length', 'max_length', 'min_year', 'max_year']
+
+
+def file_fingerprint(file_path, previous=None):
+    """
+    Content hash of a file with its size and modification time.
+    The previous fingerprint is reused if the size and modification time haven't changed.
+    """
+    stat = os.stat(file_path)
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+        return previous
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return {
+        'sha256': digest.hexdigest(),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+
+def same_content(fingerprint, previous):
+    return previous is not None and fingerprint['sha256'] == previous.get('sha256')
+
+
+def load_manifest(manifest_file):
+    """Loads the build manifest, or returns None if it is missing, unreadable or from another version."""
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_json_atomic(data, output_file, **kwargs):
+    output_path = Path(output_file)
+    temp_path = output_path.with_name(output_path.name + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **kwargs)
+    os.replace(temp_path, output_path)
+
+
+def outputs_unchanged(manifest, output_files):
+    """Checks the output files still match the fingerprints recorded in the manifest."""
+    recorded = manifest.get('outputs', {})
+    for name, output_file in output_files.items():
+        if not Path(output_file).exists() or not same_content(file_fingerprint(output_file, recorded.get(name)), recorded.get(name)):
+            return False
+    return True
+
+
+def format_crossword_clues_dictionary(wordlist_file, clues_file, output_file, parameters=None, store_file=None, workers=1, clues_member=None,
+                                      manifest_file=None, force=False, stages=None):
+    """
+    Merge clues for crossword answers - add with wordlist score for filtering.
+    Also writes the result to a SQLite clue store (by default next to the output file with a .db extension)
+    that the generator reads clues from on demand.
+
+    Whether an answer is kept only depends on its word list entries, so that is decided up front
+    and only the clues of kept answers are held in memory. Parsing the clues file can be split
+    between several worker processes. If clues_member is given, clues_file is a zip archive and the
+    clues are streamed out of that member without extracting it.
+
+    A manifest (by default next to the output file) records content hashes of the inputs and the
+    parameters of the last build. Nothing is rebuilt if none of them changed. If only the word list
+    or min_score changed, the clues file isn't parsed again: answers that stay kept reuse their clues
+    from the previous output, and only newly kept answers are looked up in the clues file.
+    Pass force=True to always rebuild from scratch.
+
+    The time and memory of each step are recorded in stages, a StageTimer.
+    """
 
     total_answers = 0
     total_clues = 0
@@ -109,58 +358,121 @@ def format_crossword_clues_dictionary(wordlist_file, clues_file, output_file, pa
     if parameters is None:
         parameters = {
             'min_length': 2,
-            'max_length': 7,
+            'max_length': 15,
             'min_year': 2009,
             'max_year': None,
             'min_score': 50
         }
 
-    wordlist = read_wordlist(wordlist_file)
-    clues = read_clues(clues_file, 
-                       min_length=parameters['min_length'],
-                       max_length=parameters['max_length'],
-                       min_year=parameters['min_year'],
-                       max_year=parameters['max_year'])
+    output_path = Path(output_file)
+    if store_file is None:
+        store_file = output_path.with_suffix('.db')
+    if manifest_file is None:
+        manifest_file = output_path.with_suffix('.manifest.json')
+    # Number of valid clues of every answer in the clues file, kept to rebuild without parsing it again
+    counts_file = Path(manifest_file).with_name(output_path.stem + '.counts.json')
+    output_files = {'json': output_file, 'store': store_file, 'counts': counts_file}
+    if stages is None:
+        stages = StageTimer()
 
-    clues_by_answer = {}
-    for clue in clues:
-        answer = clue['answer']
-        if answer not in clues_by_answer:
+    with stages.stage('fingerprint_inputs'):
+        manifest = None if force else load_manifest(manifest_file)
+        previous = manifest or {}
+        wordlist_fingerprint = file_fingerprint(wordlist_file, previous.get('wordlist'))
+        clues_fingerprint = file_fingerprint(clues_file, previous.get('clues'))
+        clues_fingerprint['member'] = clues_member
+
+        clues_unchanged = (
+            manifest is not None
+            and same_content(clues_fingerprint, previous.get('clues'))
+            and clues_member == previous['clues'].get('member')
+            and all(parameters.get(key) == previous.get('parameters', {}).get(key) for key in CLUE_PARAMETERS)
+            and outputs_unchanged(manifest, output_files)
+        )
+    if (clues_unchanged
+            and same_content(wordlist_fingerprint, previous.get('wordlist'))
+            and parameters == previous.get('parameters')):
+        print(f"✓ {output_file} is up to date with {wordlist_file} and {clues_file}, skipping rebuild")
+        return
+
+    # The word list is small next to the clues file, so its scores are kept in memory
+    with stages.stage('read_wordlist'):
+        scores_by_word = {}
+        for word_entry in read_wordlist(wordlist_file):
+            scores_by_word.setdefault(word_entry['word'], []).append(word_entry['score'])
+
+        word_scores = {word: resolve_answer_score(scores, parameters['min_score']) for word, scores in scores_by_word.items()}
+        kept_answers = {
+            word for word, (score, _, _) in word_scores.items()
+            if score is not None and not any(char.isdigit() for char in word)
+        }
+
+    if clues_unchanged:
+        clue_summary = previous['clue_summary']
+        with stages.stage('load_previous_clues'):
+            with open(counts_file, 'r', encoding='utf-8') as f:
+                clue_counts = json.load(f)
+            with open(output_file, 'r', encoding='utf-8') as f:
+                previous_clues = json.load(f)
+
+        grouped_clues = {answer: entry['clues'] for answer, entry in previous_clues.items() if answer in kept_answers}
+        new_answers = {answer for answer in kept_answers if answer in clue_counts and answer not in previous_clues}
+        changed_answers = len(new_answers) + sum(
+            1 for answer, entry in previous_clues.items()
+            if answer not in kept_answers or word_scores[answer][0] != entry['score'])
+        print(f"✓ Clues file and parameters unchanged, updating {changed_answers} answers from the word list")
+        if new_answers:
+            print(f"Looking up clues for {len(new_answers)} newly kept answers...")
+            with stages.stage('read_clues'):
+                _, _, new_clues = group_clues(clues_file, parameters, new_answers, workers=workers, clues_member=clues_member)
+            grouped_clues.update(new_clues)
+        print()
+    else:
+        # Clues are grouped as they are parsed, so this stage covers both
+        with stages.stage('read_clues'):
+            clue_summary, clue_counts, grouped_clues = group_clues(clues_file, parameters, kept_answers, workers=workers, clues_member=clues_member)
+    print_clue_summary(clue_summary)
+
+    with stages.stage('merge_scores'):
+        clues_by_answer = {}
+        for answer, count in clue_counts.items():
+            total_clues += count
             total_answers += 1
-            clues_by_answer[answer] = { 'score': None, 'clues': set()}
-        clues_by_answer[answer]['clues'].add(clue['clue'])
-        total_clues += 1
-
-    for word_entry in wordlist:
-        answer = word_entry['word']
-        score = word_entry['score']
-        if answer in clues_by_answer:
-            if score >= parameters['min_score']:
-                clues_by_answer[answer]['score'] = score
-            else:
-                score_below_threshold_count += 1
-                del clues_by_answer[answer]
-        else:
-            clues_missing_count += 1
-
-    score_missing_words = [answer for answer, entry in clues_by_answer.items() if entry['score'] is None]
-    for answer in score_missing_words:
-        score_missing_count += 1
-        del clues_by_answer[answer]
-    
-    words_with_numbers = [answer for answer in clues_by_answer.keys() if any(char.isdigit() for char in answer)]
-    for answer in words_with_numbers:
-        answers_with_digits += 1
-        del clues_by_answer[answer]
-
-    # Convert sets to lists for JSON serialization
-    for answer in clues_by_answer:
-        clues_by_answer[answer]['clues'] = list(clues_by_answer[answer]['clues'])
-
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(clues_by_answer, f, indent=2, sort_keys=True)
-
-    print(f"✓ Formatted {total_clues} crossword clues. Written to {output_file}")
+            score, below_threshold, clues_missing = word_scores.get(answer, (None, 0, 0))
+            score_below_threshold_count += below_threshold
+            clues_missing_count += clues_missing
+            if score is None:
+                if not below_threshold:
+                    score_missing_count += 1
+                continue
+            if answer not in kept_answers:
+                answers_with_digits += 1
+                continue
+            clues_by_answer[answer] = { 'score': score, 'clues': list(grouped_clues[answer]) }
+
+        # Word list entries for answers without any clues
+        for word, scores in scores_by_word.items():
+            if word not in clue_counts:
+                clues_missing_count += len(scores)
+
+    with stages.stage('write_json'):
+        write_json_atomic(clues_by_answer, output_file, indent=2, sort_keys=True)
+    with stages.stage('write_clue_store'):
+        write_clue_store(clues_by_answer, store_file)
+    with stages.stage('write_manifest'):
+        if not clues_unchanged:
+            write_json_atomic(clue_counts, counts_file, separators=(',', ':'))
+
+        write_json_atomic({
+            'version': MANIFEST_VERSION,
+            'wordlist': wordlist_fingerprint,
+            'clues': clues_fingerprint,
+            'parameters': parameters,
+            'clue_summary': clue_summary,
+            'outputs': {name: file_fingerprint(path) for name, path in output_files.items()},
+        }, manifest_file, indent=2, sort_keys=True)
+
+    print(f"✓ Formatted {total_clues} crossword clues. Written to {output_file} and {store_file}")
     print(f"   - Clues missing for {clues_missing_count} words")
     print(f"   - Scores missing for {score_missing_count} words")
     print(f"   - {score_below_threshold_count} words below score threshold of {parameters['min_score']}")
@@ -177,4 +489,18 @@ if __name__ == "__main__":
     clues_file = os.path.join(script_dir, 'data', 'clues.tsv')
     crossword_clues_file =  os.path.join(script_dir, 'data', 'crossword_clues.json')
 
-    format_crossword_clues_dictionary(wordlist_file, clues_file, crossword_clues_file)
+    parser = argparse.ArgumentParser(description="Format the crossword clues dictionary from the raw datasets.")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of worker processes parsing the clues file (default: 1)")
+    parser.add_argument("-f", "--force", action="store_true", help="Rebuild even if the inputs and parameters haven't changed")
+    parser.add_argument("--report", type=str, help="Append the time and memory of each stage as a JSON line to this file")
+    parser.add_argument("--trace-memory", action="store_true", help="Also record peak Python allocations per stage with tracemalloc (slower)")
+    args = parser.parse_args()
+
+    stages = StageTimer(trace_memory=args.trace_memory)
+    format_crossword_clues_dictionary(wordlist_file, clues_file, crossword_clues_file, workers=args.workers, force=args.force, stages=stages)
+    stages.stop()
+    print()
+    stages.print_table()
+    if args.report:
+        stages.write_report(args.report, script='format_crossword_clues.py', workers=args.workers, force=args.force)
+        print(f"✓ Appended stage report to {args.report}")
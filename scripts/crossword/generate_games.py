@@ -4,10 +4,25 @@ Generates new crossword game files.
 """
 import argparse
 import json
+import multiprocessing
+import os
+import queue
 import random
 import sys
 import time
+from collections import OrderedDict
+from datetime import datetime
 from pathlib import Path
+from answer_freshness import DEFAULT_FRESH_GAMES, DEFAULT_GAMES_DIR, load_recent_answers
+from clue_store import ClueStore
+from search_trace import TRACE_FORMATS, SearchTrace, find_worker_trace_files, merge_trace_files, worker_trace_file
+from shape_library import compile_shape, load_shape_library, print_word_slots
+from word_index import DEFAULT_COUNT_CACHE_SIZE, WordIndex, load_or_build_word_index
+
+try:
+    import numpy as np
+except ImportError:  # the numpy scoring engine is optional
+    np = None
 
 
 def load_json_file(json_file):
@@ -16,28 +31,33 @@ def load_json_file(json_file):
     return data
 
 
-def load_crossword_shape(shapes_file, shape_name=None, verbose=False):
+def load_clues_index(clues_file):
     """
-    Loads template crossword shape grid from the available shapes.
-    Identifies where the word slots are located to fill in the puzzle.
-    ["grid"]: 2D array with 0=black cell, 1=white cell
-    ["slots"]: list of word slots with row, col, length, direction
+    Opens the clues for generation. A SQLite clue store (.db) only loads clues on demand,
+    anything else is read as a crossword_clues.json dictionary.
     """
-    shapes = load_json_file(shapes_file)
-    if verbose:
-        print(f"Loaded {len(shapes)} crossword shapes from {shapes_file}")
+    if Path(clues_file).suffix == '.db':
+        return ClueStore(clues_file)
+    return load_json_file(clues_file)
+
 
+def load_crossword_shape(shapes, shape_name=None, verbose=False):
+    """
+    Loads template crossword shape grid from the available compiled shapes (a ShapeLibrary).
+    The word slots where the puzzle is filled in were found when the shape was compiled.
+    ["grid"]: 2D array with 0=black cell, 1=white cell
+    ["slot_graph"]: word slots with row, col, length, direction and their crossings
+    """
     shape = None
     if shape_name:
-        candidate_shapes = [s for s in shapes if s['name'] == shape_name]
-        if candidate_shapes:
-            shape = candidate_shapes[0]
+        shape = shapes.get(shape_name)
+        if shape:
             print(f"✓ Loaded crossword shape '{shape_name}'")
         else:
             print(f"✗ No crossword shape found with name '{shape_name}'", file=sys.stderr)
 
     if not shape:
-        shape = random.choice(shapes)
+        shape = shapes.random_shape()
         print(f"✓ Loaded random crossword shape '{shape['name']}'")
 
     if verbose:
@@ -47,71 +67,17 @@ def load_crossword_shape(shapes_file, shape_name=None, verbose=False):
     return shape
 
 
-def find_crossword_word_slots(crossword_shape, verbose=False):
-    slots = []
-    grid = crossword_shape['grid']
-    rows = len(grid)
-    cols = len(grid[0])
-
-    # Find horizontal slots
-    for r in range(rows):
-        c = 0
-        while c < cols:
-            if grid[r][c] == 1:
-                start_c = c
-                while c < cols and grid[r][c] == 1:
-                    c += 1
-                length = c - start_c
-                if length > 1:
-                    slots.append({'row': r, 'col': start_c, 'length': length, 'direction': 'across'})
-            else:
-                c += 1
-
-    # Find vertical slots
-    for c in range(cols):
-        r = 0
-        while r < rows:
-            if grid[r][c] == 1:
-                start_r = r
-                while r < rows and grid[r][c] == 1:
-                    r += 1
-                length = r - start_r
-                if length > 1:
-                    slots.append({'row': start_r, 'col': c, 'length': length, 'direction': 'down'})
-            else:
-                r += 1
-
-    if verbose:
-        print(f"Found {len(slots)} clues to fill in the crossword shape.")
-        for slot in slots:
-            print(f"  - {slot['direction'].capitalize()} slot at (row={slot['row']}, col={slot['col']}) length={slot['length']}")
-    return slots
-
-
-def build_word_wildcard_variants(word):
-    wildcards = []
-    length = len(word)
-    for mask in range(1 << length):
-        variant = list(word)
-        for i in range(length):
-            if (mask >> i) & 1:
-                variant[i] = '?'
-        wildcards.append(''.join(variant))
-    return wildcards
-
-
-def build_word_index(words, verbose=False):
+def build_word_index(words, cache_file=None, source_file=None, verbose=False):
     """
     Builds an index of all possible matches for different wildcard patterns.
     e.g. C?T would match CAT, COT, CUT, etc.
+    If a cache file is given, the index is loaded from it when it is up to date with the source file.
     """
-    word_index = {}
-    for word in words:
-        for wildcard in build_word_wildcard_variants(word):
-            if wildcard not in word_index:
-                word_index[wildcard] = set()
-            word_index[wildcard].add(word)
-    print(f"Built word index for {len(words)} words with {len(word_index)} wildcard indices.")
+    if cache_file is not None and source_file is not None:
+        word_index = load_or_build_word_index(source_file, lambda: words, cache_file=cache_file, verbose=verbose)
+    else:
+        word_index = WordIndex(words)
+    print(f"Built word index for {len(word_index)} words with {word_index.bitset_count()} position bitsets.")
     return word_index
 
 
@@ -193,58 +159,35 @@ def get_slot_pattern(slot, puzzle):
     return ''.join(pattern)
 
 
-def get_slot_cells(slot):
-    """Get list of (row, col) cells that a slot occupies."""
-    cells = []
-    for i in range(slot['length']):
-        if slot['direction'] == 'across':
-            cells.append((slot['row'], slot['col'] + i))
-        else:
-            cells.append((slot['row'] + i, slot['col']))
-    return cells
+def get_cells_pattern(cells, puzzle):
+    """Get the current pattern for a slot's cells based on filled cells in the puzzle."""
+    return ''.join([puzzle[r][c] or '?' for r, c in cells])
 
 
-def find_intersecting_slots(slot, empty_slots):
-    """Find all empty slots that intersect with the given slot."""
-    slot_cells = set(get_slot_cells(slot))
-    intersecting = []
-    for other_slot in empty_slots:
-        if other_slot == slot:
-            continue
-        other_cells = get_slot_cells(other_slot)
-        for idx, cell in enumerate(other_cells):
-            if cell in slot_cells:
-                intersecting.append((other_slot, idx, cell))
-                break  # Each slot can only intersect once
-    return intersecting
+def get_open_crossings(slot, open_slot_ids, puzzle, slot_graph):
+    """
+    List the crossings of a slot with open slots as (index in slot, other pattern before, other pattern after).
+    These don't depend on the candidate word, so they are looked up once per slot instead of once per word.
+    """
+    crossings = []
+    for other_id, idx, other_idx in slot_graph['neighbors'][slot['id']]:
+        if other_id in open_slot_ids:
+            other_pattern = get_cells_pattern(slot_graph['cells'][other_id], puzzle)
+            crossings.append((idx, other_pattern[:other_idx], other_pattern[other_idx + 1:]))
+    return crossings
 
 
-def calculate_word_heuristic(word, slot, empty_slots, puzzle, word_index):
+def calculate_word_heuristic(word, crossings, word_index):
     """
-    Calculate a heuristic score for placing a word in a slot.
+    Calculate a heuristic score for placing a word in a slot, given the slot's open crossings.
     The score is the sum of possible words remaining for each intersecting empty slot.
     If any intersecting slot is left with 0 options, subtract 1,000,000.
     """
-    intersecting = find_intersecting_slots(slot, empty_slots)
-    if not intersecting:
-        return 0  # No intersections, neutral score
-    
     total_score = 0
-    slot_cells = get_slot_cells(slot)
-    
-    for other_slot, other_idx, intersect_cell in intersecting:
-        # Find which character from our word goes at the intersection
-        word_idx = slot_cells.index(intersect_cell)
-        new_char = word[word_idx]
-        
-        # Get current pattern for the other slot and update with the new character
-        other_pattern = list(get_slot_pattern(other_slot, puzzle))
-        other_pattern[other_idx] = new_char
-        updated_pattern = ''.join(other_pattern)
-        
-        # Count possible words for this updated pattern
-        possible_count = len(word_index.get(updated_pattern, []))
-        
+    for idx, pattern_before, pattern_after in crossings:
+        # Count possible words for the other slot's pattern updated with our character
+        possible_count = word_index.count(pattern_before + word[idx] + pattern_after)
+
         if possible_count == 0:
             total_score -= 1_000_000
         else:
@@ -253,10 +196,48 @@ def calculate_word_heuristic(word, slot, empty_slots, puzzle, word_index):
     return total_score
 
 
-def pick_random_valid_word(slot, puzzle, word_index, empty_slots=None, used_words=None, top_n=10, verbose=False):
+SCORING_ENGINES = ['python', 'numpy']
+DEFAULT_SCORING_ENGINE = 'numpy' if np is not None else 'python'
+NUMPY_SCORING_MIN_WORDS = 64  # below this the array setup costs more than it saves
+
+
+def score_candidate_words(words, crossings, word_index, scoring='python', trace=None):
+    """
+    Scores every candidate word with calculate_word_heuristic, returning (word, score) pairs in the same order.
+    The numpy engine gets the same scores by looking up each crossing's count once per distinct letter
+    and scoring all the candidates with array operations on a letter matrix.
+    """
+    if trace:
+        start = trace.clock()
+        scored_words = score_candidate_words(words, crossings, word_index, scoring=scoring)
+        trace.span('calculate_word_heuristic', start, words=len(words), crossings=len(crossings), scoring=scoring)
+        return scored_words
+
+    if scoring == 'numpy' and np is not None and len(words) >= NUMPY_SCORING_MIN_WORDS:
+        try:
+            encoded = ''.join(words).encode('ascii')
+        except UnicodeEncodeError:
+            encoded = None
+        if encoded is not None:
+            # One row of letter codes per candidate word
+            letters = np.frombuffer(encoded, dtype=np.uint8).reshape(len(words), -1)
+            scores = np.zeros(len(words), dtype=np.int64)
+            for idx, pattern_before, pattern_after in crossings:
+                column = letters[:, idx]
+                support = np.zeros(256, dtype=np.int64)
+                for letter in np.unique(column).tolist():
+                    possible_count = word_index.count(pattern_before + chr(letter) + pattern_after)
+                    support[letter] = possible_count if possible_count else -1_000_000
+                scores += support[column]
+            return list(zip(words, scores.tolist()))
+
+    return [(word, calculate_word_heuristic(word, crossings, word_index)) for word in words]
+
+
+def pick_random_valid_word(slot, puzzle, word_index, slot_graph=None, open_slot_ids=None, used_words=None, top_n=10, scoring='python', trace=None, verbose=False):
     """
     Pick a random word from the top N words with highest heuristic scores.
-    If empty_slots is None, falls back to pure random selection.
+    If open_slot_ids is None, falls back to pure random selection.
     """
     word_pattern = get_slot_pattern(slot, puzzle)
     possible_words = word_index.get(word_pattern, [])
@@ -276,15 +257,13 @@ def pick_random_valid_word(slot, puzzle, word_index, empty_slots=None, used_word
             return None, word_pattern
     
     # If no empty slots provided or only one word available, pick randomly
-    if empty_slots is None or len(possible_words) == 1:
+    if open_slot_ids is None or len(possible_words) == 1:
         chosen_word = random.choice(possible_words)
         return chosen_word, word_pattern
     
     # Calculate heuristic scores for all possible words
-    scored_words = []
-    for word in possible_words:
-        score = calculate_word_heuristic(word, slot, empty_slots, puzzle, word_index)
-        scored_words.append((word, score))
+    crossings = get_open_crossings(slot, open_slot_ids, puzzle, slot_graph)
+    scored_words = score_candidate_words(possible_words, crossings, word_index, scoring=scoring, trace=trace)
     
     # Sort by score descending
     scored_words.sort(key=lambda x: x[1], reverse=True)
@@ -311,80 +290,792 @@ def pick_random_valid_word(slot, puzzle, word_index, empty_slots=None, used_word
     return chosen_word, word_pattern
 
 
-def try_fill_slots(empty_slots, filled_slots, puzzle_grid, word_index, level_retries, metrics, top_n=10, verbose=False):
-    if not empty_slots:
-        return filled_slots
-    
-    puzzle_wip = fill_puzzle_grid_with_answers(puzzle_grid, filled_slots)
-    used_words = set(slot['answer'] for slot in filled_slots)
+SLOT_ORDERS = ['random', 'mrv', 'degree', 'domwdeg']
+
+
+class SlotOrdering:
+    """
+    Variable ordering strategy choosing which open slot to fill next, breaking ties randomly.
+    'random': any open slot
+    'mrv': the slot with the fewest remaining candidates (minimum remaining values)
+    'degree': the slot crossing the most open slots
+    'domwdeg': the slot with the lowest ratio of remaining candidates to the weights of its open crossings.
+    Crossing weights start at 1 and grow each time the crossing causes a dead end.
+    """
+
+    def __init__(self, order, slot_graph):
+        self.order = order
+        self.slot_graph = slot_graph
+        self.weights = {}
+
+    def crossing_weight(self, slot_id, other_id):
+        return self.weights.get((min(slot_id, other_id), max(slot_id, other_id)), 1)
+
+    def record_failure(self, slot_id, other_ids):
+        """Bumps the weights of the slot's crossings with the other slots that left it without candidates."""
+        for other_id in other_ids:
+            key = (min(slot_id, other_id), max(slot_id, other_id))
+            self.weights[key] = self.weights.get(key, 1) + 1
+
+    def record_dead_slot(self, slot_id, open_slot_ids):
+        """Bumps the weights of the crossings with the filled slots that set a dead slot's pattern."""
+        if self.order == 'domwdeg':
+            self.record_failure(slot_id, [other_id for other_id, _, _ in self.slot_graph['neighbors'][slot_id] if other_id not in open_slot_ids])
+
+    def pick(self, open_slots, open_slot_ids, domain_size):
+        """Picks from the open slots (a list), where domain_size(slot_id) counts the slot's remaining candidates."""
+        if self.order == 'random':
+            return random.choice(open_slots)
+
+        neighbors = self.slot_graph['neighbors']
+        if self.order == 'mrv':
+            scores = [(domain_size(slot_id), slot_id) for slot_id in open_slots]
+        elif self.order == 'degree':
+            scores = [(-sum(1 for other_id, _, _ in neighbors[slot_id] if other_id in open_slot_ids), slot_id) for slot_id in open_slots]
+        else:
+            scores = []
+            for slot_id in open_slots:
+                weighted_degree = sum(self.crossing_weight(slot_id, other_id) for other_id, _, _ in neighbors[slot_id] if other_id in open_slot_ids)
+                scores.append((domain_size(slot_id) / weighted_degree if weighted_degree else float('inf'), slot_id))
+
+        best = min(score for score, _ in scores)
+        return random.choice([slot_id for score, slot_id in scores if score == best])
+
+
+class SearchState:
+    """
+    Mutable state of the backtracking search: the puzzle grid, used words and open slots.
+    Words are placed and undone through a trail, so each step only touches the cells of one slot.
+    """
+
+    def __init__(self, puzzle_grid, slot_graph):
+        self.slot_graph = slot_graph
+        self.puzzle = [ [ '' if cell == 1 else '#' for cell in row ] for row in puzzle_grid ]
+        self.used_words = set()
+        self.open_slots = [slot['id'] for slot in slot_graph['slots']]
+        self.open_slot_ids = set(self.open_slots)
+        self.answers = {}
+        self.trail = []
+
+    def pattern(self, slot_id):
+        return get_cells_pattern(self.slot_graph['cells'][slot_id], self.puzzle)
+
+    def place(self, slot_id, word):
+        """Writes the word into the slot, recording which cells were empty before so they can be undone."""
+        written_cells = []
+        for (r, c), char in zip(self.slot_graph['cells'][slot_id], word):
+            if self.puzzle[r][c] == '':
+                self.puzzle[r][c] = char
+                written_cells.append((r, c))
+            elif self.puzzle[r][c] != char:
+                raise ValueError(f"Conflict in filling puzzle grid at ({r}, {c}): existing '{self.puzzle[r][c]}', new '{char}'")
+
+        position = self.open_slots.index(slot_id)
+        self.open_slots.pop(position)
+        self.open_slot_ids.remove(slot_id)
+        self.used_words.add(word)
+        self.answers[slot_id] = word
+        self.trail.append((slot_id, position, written_cells))
+
+    def undo(self):
+        """Removes the most recently placed word."""
+        slot_id, position, written_cells = self.trail.pop()
+        for r, c in written_cells:
+            self.puzzle[r][c] = ''
+
+        self.open_slots.insert(position, slot_id)
+        self.open_slot_ids.add(slot_id)
+        self.used_words.remove(self.answers.pop(slot_id))
+
+    def filled_slots(self):
+        return [{**self.slot_graph['slots'][slot_id], 'answer': word} for slot_id, word in self.answers.items()]
+
+
+def try_fill_slots(state, word_index, level_retries, metrics, ordering, top_n=10, scoring='python', budget=None, trace=None, verbose=False):
+    if not state.open_slots:
+        return True
+
+    puzzle_slots = state.slot_graph['slots']
 
     retry_count = 0
     while retry_count <= level_retries:
-        slot = random.choice(empty_slots)
-        word, pattern = pick_random_valid_word(slot, puzzle_wip, word_index, empty_slots=empty_slots, used_words=used_words, top_n=top_n, verbose=verbose)
+        if budget:
+            budget.check()
+
+        slot = puzzle_slots[ordering.pick(state.open_slots, state.open_slot_ids, lambda slot_id: word_index.count(state.pattern(slot_id)))]
+        if trace:
+            depth = len(state.trail)
+            pick_start = trace.clock()
+        word, pattern = pick_random_valid_word(slot, state.puzzle, word_index, slot_graph=state.slot_graph, open_slot_ids=state.open_slot_ids, used_words=state.used_words, top_n=top_n, scoring=scoring, trace=trace, verbose=verbose)
+        if trace:
+            trace.span('pick_random_valid_word', pick_start, depth=depth, slot=slot['id'], pattern=pattern)
+            # Uncached, so tracing doesn't change the pattern cache metrics
+            trace.instant('candidates', depth=depth, slot=slot['id'], pattern=pattern, candidates=word_index.count_matches(pattern))
 
         if word:
             if verbose:
                 print(f"+ '{word}' matches '{pattern}' (dir={slot['direction']}, row={slot['row']}, col={slot['col']})")
             metrics['words_found'] += 1
+            if trace:
+                trace.instant('place', depth=depth, slot=slot['id'], word=word, pattern=pattern)
 
-            new_empty_slots = [s for s in empty_slots if s != slot]
-            new_filled_slots = filled_slots + [ { **slot, 'answer': word } ]
-
+            state.place(slot['id'], word)
             valid_solution = try_fill_slots(
-                new_empty_slots,
-                new_filled_slots,
-                puzzle_grid,
+                state,
                 word_index,
                 max(0, level_retries - 1), # NB: lower retries to limit backtracking in deeper levels
                 metrics,
+                ordering,
                 top_n=top_n,
-                verbose=verbose) 
+                scoring=scoring,
+                budget=budget,
+                trace=trace,
+                verbose=verbose)
+            if not valid_solution:
+                state.undo()
         else:
             if verbose:
                 print(f"- No match for '{pattern}' (dir={slot['direction']}, row={slot['row']}, col={slot['col']})")
                 print(f"=== Intermediate puzzle state ===")
-                for row in puzzle_wip:
+                for row in state.puzzle:
                     print(''.join([cell if cell != '' else '.' for cell in row]))
+            ordering.record_dead_slot(slot['id'], state.open_slot_ids)
             metrics['backtracks'] += 1
-            valid_solution = None
+            if trace:
+                trace.instant('backtrack', depth=depth, slot=slot['id'], pattern=pattern, reason='no_candidates')
+            valid_solution = False
 
         if valid_solution:
-            return valid_solution
+            return True
 
         retry_count += 1
         metrics['retry_count'] += 1
+    return False
+
+
+def revise_domain(domains, slot_id, other_id, idx, other_idx, puzzle_slots, word_index):
+    """
+    Removes words from the other slot's domain that have no supporting word in this slot's domain
+    at their crossing. Returns the revised domain of the other slot.
+    """
+    supported = 0
+    domain = domains[slot_id]
+    other_letters = word_index.position_bits[puzzle_slots[other_id]['length']][other_idx]
+    for char, bits in word_index.position_bits[puzzle_slots[slot_id]['length']][idx].items():
+        if domain & bits:
+            supported |= other_letters.get(char, 0)
+    return domains[other_id] & supported
+
+
+def propagate_placement(domains, slot_id, word_id, slot_graph, word_index, ordering=None):
+    """
+    Reduces the slot's domain to the placed word and prunes the domains of all unfilled slots until
+    they are arc consistent (AC-3). Returns False as soon as any domain is wiped out.
+    """
+    puzzle_slots = slot_graph['slots']
+    crossings = slot_graph['neighbors']
+    domains[slot_id] = 1 << word_id
+
+    # A word may only be used once, so remove it from every other slot of the same length
+    length = puzzle_slots[slot_id]['length']
+    for other_id in domains:
+        if other_id != slot_id and puzzle_slots[other_id]['length'] == length and domains[other_id] >> word_id & 1:
+            domains[other_id] &= ~(1 << word_id)
+            if not domains[other_id]:
+                return False
+
+    queue = [(slot_id, other_id, idx, other_idx) for other_id, idx, other_idx in crossings[slot_id] if other_id in domains]
+    while queue:
+        source_id, other_id, idx, other_idx = queue.pop()
+        revised = revise_domain(domains, source_id, other_id, idx, other_idx, puzzle_slots, word_index)
+        if revised == domains[other_id]:
+            continue
+        if not revised:
+            if ordering is not None and ordering.order == 'domwdeg':
+                ordering.record_failure(other_id, [source_id])
+            return False
+        domains[other_id] = revised
+        for next_id, next_idx, next_other_idx in crossings[other_id]:
+            if next_id != source_id and next_id in domains:
+                queue.append((other_id, next_id, next_idx, next_other_idx))
+    return True
+
+
+def rank_domain_candidates(slot_id, domains, open_slot_ids, slot_graph, word_index, top_n=10):
+    """
+    Scores every word left in a slot's domain by the support it leaves in the crossing open slots' domains,
+    the same way calculate_word_heuristic does for patterns. Returns the top N in random order.
+    """
+    puzzle_slots = slot_graph['slots']
+    length = puzzle_slots[slot_id]['length']
+    candidates = word_index.decode(length, domains[slot_id])
+    open_crossings = [
+        (domains[other_id], word_index.position_bits[puzzle_slots[other_id]['length']][other_idx], idx)
+        for other_id, idx, other_idx in slot_graph['neighbors'][slot_id]
+        if other_id in open_slot_ids
+    ]
+
+    scored_words = []
+    for word in candidates:
+        score = 0
+        for other_domain, other_letters, idx in open_crossings:
+            possible_count = (other_domain & other_letters.get(word[idx], 0)).bit_count()
+            score += possible_count if possible_count else -1_000_000
+        if score >= 0:
+            scored_words.append((word, score))
+
+    scored_words.sort(key=lambda x: x[1], reverse=True)
+    top_candidates = [w for w, s in scored_words[:top_n]]
+    random.shuffle(top_candidates)
+    return top_candidates
+
+
+def try_fill_slots_propagate(slot_graph, word_index, level_retries, metrics, ordering, top_n=10, budget=None, trace=None, verbose=False):
+    """
+    Fills the slots with forward checking: every slot keeps a live domain (a word index bitset)
+    that is pruned to arc consistency after each placement, so dead ends are found before descending.
+    Candidates that wipe out a domain are skipped without using up the level's retries.
+    Returns the filled slots, or None if no fill was found within the retry limits.
+    """
+    puzzle_slots = slot_graph['slots']
+    domains = {}
+    for slot_id, slot in enumerate(puzzle_slots):
+        domains[slot_id] = word_index.pattern_bits('?' * slot['length'])
+        if not domains[slot_id]:
+            if verbose:
+                print(f"- No words of length {slot['length']} for slot (dir={slot['direction']}, row={slot['row']}, col={slot['col']})")
+            return None
+
+    assignment = {}
+    open_slot_ids = set(domains)
+
+    def search(domains, level_retries):
+        if not open_slot_ids:
+            return True
+
+        slot_id = ordering.pick(sorted(open_slot_ids), open_slot_ids, lambda slot_id: domains[slot_id].bit_count())
+        slot = puzzle_slots[slot_id]
+        open_slot_ids.remove(slot_id)
+        if trace:
+            depth = len(assignment)
+            rank_start = trace.clock()
+        candidates = rank_domain_candidates(slot_id, domains, open_slot_ids, slot_graph, word_index, top_n=top_n)
+        if trace:
+            trace.span('rank_domain_candidates', rank_start, depth=depth, slot=slot_id)
+            trace.instant('candidates', depth=depth, slot=slot_id, candidates=domains[slot_id].bit_count(), top=len(candidates))
+
+        retry_count = 0
+        for word in candidates:
+            if budget:
+                budget.check()
+
+            new_domains = dict(domains)
+            if not propagate_placement(new_domains, slot_id, word_index.word_id(word), slot_graph, word_index, ordering=ordering):
+                if verbose:
+                    print(f"- '{word}' wipes out a crossing domain (dir={slot['direction']}, row={slot['row']}, col={slot['col']})")
+                metrics['backtracks'] += 1
+                if trace:
+                    trace.instant('backtrack', depth=depth, slot=slot_id, word=word, reason='wipeout')
+                continue
+
+            if verbose:
+                print(f"+ '{word}' placed (dir={slot['direction']}, row={slot['row']}, col={slot['col']})")
+            metrics['words_found'] += 1
+            if trace:
+                trace.instant('place', depth=depth, slot=slot_id, word=word)
+            assignment[slot_id] = word
+            if search(new_domains, max(0, level_retries - 1)):
+                return True
+            del assignment[slot_id]
+
+            retry_count += 1
+            metrics['retry_count'] += 1
+            if retry_count > level_retries:
+                break
+
+        if not candidates:
+            if verbose:
+                print(f"- No consistent candidates (dir={slot['direction']}, row={slot['row']}, col={slot['col']})")
+            metrics['backtracks'] += 1
+            if trace:
+                trace.instant('backtrack', depth=depth, slot=slot_id, reason='no_candidates')
+        open_slot_ids.add(slot_id)
+        return False
+
+    if not search(domains, level_retries):
+        return None
+    return [{**puzzle_slots[slot_id], 'answer': word} for slot_id, word in assignment.items()]
+
+
+DEFAULT_NOGOOD_STORE_SIZE = 10_000
+
+
+class NogoodStore:
+    """
+    Bounded store of slot neighborhoods proven unfillable during a search: the slot, its pattern and the
+    patterns of its open crossing slots. The oldest nogoods are evicted first once the store is full.
+    """
+
+    def __init__(self, maxsize=DEFAULT_NOGOOD_STORE_SIZE):
+        self.maxsize = maxsize
+        self.nogoods = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.nogoods
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def add(self, key):
+        self.nogoods[key] = True
+        if len(self.nogoods) > self.maxsize:
+            self.nogoods.popitem(last=False)
+
+
+def try_fill_slots_backjump(state, word_index, metrics, nogoods, ordering, top_n=10, scoring='python', budget=None, trace=None, verbose=False):
+    """
+    Backtracking with conflict-directed backjumping. Returns None once every slot is filled, otherwise the
+    conflict set: the filled slots whose words caused the failure. A level whose slot is not in the conflict
+    set of a failed descent can't fix it by trying another word, so it returns the conflict set straight away,
+    jumping back to the most recent slot that can.
+    There's no retry limit per level as in the other engines, since a level that gives up early proves nothing about
+    its crossings: every top candidate is tried, and only the time limit or the restarts end a long search.
+    The candidates cut by top_n aren't tried either, so a level with more than top_n candidates returns every
+    filled slot as its conflict set and the search backtracks chronologically from it.
+    Slots left without any candidate are recorded in the nogood store and skipped when seen again.
+    """
+    if not state.open_slots:
+        return None
+    if budget:
+        budget.check()
+
+    slot_graph = state.slot_graph
+    slot_id = ordering.pick(state.open_slots, state.open_slot_ids, lambda slot_id: word_index.count(state.pattern(slot_id)))
+    slot = slot_graph['slots'][slot_id]
+    pattern = state.pattern(slot_id)
+
+    # Filled crossing slots set this slot's pattern, and those of the open crossing slots limit its candidates
+    crossers = set()
+    neighborhood = set()
+    for other_id, _, _ in slot_graph['neighbors'][slot_id]:
+        if other_id in state.open_slot_ids:
+            neighborhood.update(next_id for next_id, _, _ in slot_graph['neighbors'][other_id] if next_id not in state.open_slot_ids)
+        else:
+            crossers.add(other_id)
+    neighborhood |= crossers
+
+    crossings = get_open_crossings(slot, state.open_slot_ids, state.puzzle, slot_graph)
+    nogood_key = (slot_id, pattern, tuple(crossings))
+    if nogood_key in nogoods:
+        if verbose:
+            print(f"- Nogood '{pattern}' (dir={slot['direction']}, row={slot['row']}, col={slot['col']})")
+        ordering.record_dead_slot(slot_id, state.open_slot_ids)
+        metrics['nogood_hits'] += 1
+        metrics['backtracks'] += 1
+        if trace:
+            trace.instant('backtrack', depth=len(state.trail), slot=slot_id, pattern=pattern, reason='nogood')
+        return neighborhood
+
+    conflicts = set(crossers)
+    possible_words = word_index.get(pattern, [])
+    candidates = [w for w in possible_words if w not in state.used_words]
+    if len(candidates) < len(possible_words):
+        conflicts.update(other_id for other_id, word in state.answers.items() if word in possible_words)
+
+    scored_words = score_candidate_words(candidates, crossings, word_index, scoring=scoring, trace=trace)
+    positive_scored = [(w, s) for w, s in scored_words if s >= 0]
+    if trace:
+        trace.instant('candidates', depth=len(state.trail), slot=slot_id, pattern=pattern, candidates=len(possible_words),
+                      unused=len(candidates), viable=len(positive_scored))
+    if len(positive_scored) < len(scored_words):
+        conflicts |= neighborhood
+
+    if not positive_scored:
+        if verbose:
+            print(f"- No match for '{pattern}' (dir={slot['direction']}, row={slot['row']}, col={slot['col']})")
+        if len(candidates) == len(possible_words):
+            nogoods.add(nogood_key)
+        ordering.record_dead_slot(slot_id, state.open_slot_ids)
+        metrics['backtracks'] += 1
+        if trace:
+            trace.instant('backtrack', depth=len(state.trail), slot=slot_id, pattern=pattern, reason='no_candidates')
+        return conflicts
+
+    positive_scored.sort(key=lambda x: x[1], reverse=True)
+    top_candidates = [w for w, s in positive_scored[:top_n]]
+    random.shuffle(top_candidates)
+
+    for word in top_candidates:
+        if verbose:
+            print(f"+ '{word}' matches '{pattern}' (dir={slot['direction']}, row={slot['row']}, col={slot['col']})")
+        metrics['words_found'] += 1
+        if trace:
+            trace.instant('place', depth=len(state.trail), slot=slot_id, word=word, pattern=pattern)
+
+        state.place(slot_id, word)
+        child_conflicts = try_fill_slots_backjump(
+            state,
+            word_index,
+            metrics,
+            nogoods,
+            ordering,
+            top_n=top_n,
+            scoring=scoring,
+            budget=budget,
+            trace=trace,
+            verbose=verbose)
+        if child_conflicts is None:
+            return None
+        state.undo()
+
+        if slot_id not in child_conflicts:
+            if verbose:
+                print(f"<< Jumping back over '{pattern}' (dir={slot['direction']}, row={slot['row']}, col={slot['col']})")
+            metrics['backjumps'] += 1
+            if trace:
+                trace.instant('backjump', depth=len(state.trail), slot=slot_id, pattern=pattern)
+            return child_conflicts
+        conflicts |= child_conflicts - {slot_id}
+        metrics['retry_count'] += 1
+
+    if len(top_candidates) < len(positive_scored):
+        conflicts = set(state.answers)
+    metrics['backtracks'] += 1
+    if trace:
+        trace.instant('backtrack', depth=len(state.trail), slot=slot_id, pattern=pattern, reason='exhausted')
+    return conflicts
+
+
+SOLVER_ENGINES = ['random', 'propagate', 'backjump']
+DEFAULT_SLOT_ORDERS = {
+    'random': 'random',
+    'propagate': 'mrv',
+    'backjump': 'mrv',
+}
+RESTART_POLICIES = ['none', 'luby', 'geometric']
+DEFAULT_RESTART_UNIT = 100
+DEFAULT_MAX_RESTARTS = 100
+GEOMETRIC_RESTART_FACTOR = 1.5
+
+
+class SearchAbandoned(Exception):
+    """Raised inside a solver engine when a search attempt runs out of budget."""
+
+
+class SearchTimeout(SearchAbandoned):
+    """The time limit for the game has passed."""
+
+
+class SearchCutoff(SearchAbandoned):
+    """The attempt used up its backtracks and should be restarted."""
+
+
+class SearchBudget:
+    """Wall-clock deadline for the whole game and backtrack cutoff for the current attempt."""
+
+    def __init__(self, metrics, deadline=None, max_backtracks=None):
+        self.metrics = metrics
+        self.deadline = deadline
+        self.backtrack_limit = None if max_backtracks is None else metrics['backtracks'] + max_backtracks
+
+    def check(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise SearchTimeout()
+        if self.backtrack_limit is not None and self.metrics['backtracks'] > self.backtrack_limit:
+            raise SearchCutoff()
+
+
+def luby(i):
+    """i-th term (from 1) of the Luby sequence: 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if (1 << k) - 1 == i:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
+def restart_schedule(policy, unit=DEFAULT_RESTART_UNIT, max_restarts=DEFAULT_MAX_RESTARTS):
+    """
+    Yields the backtrack cutoff of every search attempt.
+    'none' is a single attempt without a cutoff, 'luby' and 'geometric' scale their sequence by unit.
+    """
+    if policy == 'none':
+        yield None
+        return
+
+    for i in range(max_restarts + 1):
+        if policy == 'luby':
+            yield unit * luby(i + 1)
+        else:
+            yield int(unit * GEOMETRIC_RESTART_FACTOR ** i)
+
+
+def fill_slots(solver, slot_graph, puzzle_grid, word_index, metrics, top_n=10, scoring='python', budget=None, nogoods=None, ordering=None, trace=None, verbose=False):
+    """Runs one search attempt with the selected solver engine. Returns the filled slots or None."""
+    if ordering is None:
+        ordering = SlotOrdering(DEFAULT_SLOT_ORDERS[solver], slot_graph)
+
+    if solver == 'propagate':
+        return try_fill_slots_propagate(slot_graph, word_index, level_retries=5, metrics=metrics, ordering=ordering, top_n=top_n, budget=budget, trace=trace, verbose=verbose)
+
+    state = SearchState(puzzle_grid, slot_graph)
+    if solver == 'backjump':
+        if nogoods is None:
+            nogoods = NogoodStore()
+        if try_fill_slots_backjump(state, word_index, metrics=metrics, nogoods=nogoods, ordering=ordering, top_n=top_n, scoring=scoring, budget=budget, trace=trace, verbose=verbose) is None:
+            return state.filled_slots()
+        return None
+
+    if try_fill_slots(state, word_index, level_retries=5, metrics=metrics, ordering=ordering, top_n=top_n, scoring=scoring, budget=budget, trace=trace, verbose=verbose):
+        return state.filled_slots()
     return None
 
 
-def generate_game(shape, clues_index, word_index, top_n=10, verbose=False):
-    puzzle_grid = shape['grid']
-    puzzle_slots = find_crossword_word_slots(shape, verbose=verbose)
-    
-    metrics = {
+def new_generation_metrics():
+    return {
         'retry_count': 0,
         'words_found': 0,
         'backtracks': 0,
+        'pattern_cache_hits': 0,
+        'pattern_cache_misses': 0,
+        'restarts': 0,
+        'backjumps': 0,
+        'nogood_hits': 0,
     }
 
-    print("Building crossword with backtracking...")
-    filled_slots = try_fill_slots(puzzle_slots, [], puzzle_grid, word_index, level_retries=5, metrics=metrics, top_n=top_n, verbose=verbose)
+
+def record_pattern_cache_metrics(metrics, word_index, start_info):
+    """Adds the pattern count cache hits and misses since start_info to the metrics, with the hit rate."""
+    start_hits, start_misses = start_info
+    hits, misses = word_index.count_cache_info()
+    metrics['pattern_cache_hits'] += hits - start_hits
+    metrics['pattern_cache_misses'] += misses - start_misses
+    lookups = metrics['pattern_cache_hits'] + metrics['pattern_cache_misses']
+    metrics['pattern_cache_hit_rate'] = round(metrics['pattern_cache_hits'] / lookups, 3) if lookups else 0.0
+
+
+def search_crossword(slot_graph, puzzle_grid, word_index, metrics, top_n=10, solver='random', order=None, restarts='none',
+                     restart_unit=DEFAULT_RESTART_UNIT, max_restarts=DEFAULT_MAX_RESTARTS, timeout_ms=None, scoring='python', trace=None, verbose=False):
+    """
+    Searches for a fill of the slots, restarting on the given schedule until a fill is found,
+    the schedule runs out or the time limit passes. Returns the filled slots or None.
+    """
+    pattern_cache_info = word_index.count_cache_info()
+
+    # Every attempt after the first is reseeded, so a run can be replayed from the recorded attempt seeds
+    deadline = time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+    metrics['attempts'] = []
+    filled_slots = None
+
+    # Nogoods only depend on the slot's neighborhood, so they stay valid across restarts
+    nogoods = NogoodStore()
+    # Likewise dom/wdeg keeps learning which crossings fail across restarts
+    ordering = SlotOrdering(order or DEFAULT_SLOT_ORDERS[solver], slot_graph)
+    for attempt, cutoff in enumerate(restart_schedule(restarts, restart_unit, max_restarts)):
+        seed = None
+        if attempt > 0:
+            metrics['restarts'] += 1
+            seed = random.randrange(1 << 32)
+            random.seed(seed)
+            if verbose:
+                print(f"Restarting search (attempt {attempt + 1}, cutoff {cutoff} backtracks, seed {seed})")
+
+        attempt_start = time.monotonic()
+        if trace:
+            trace_start = trace.clock()
+        attempt_backtracks = metrics['backtracks']
+        budget = SearchBudget(metrics, deadline=deadline, max_backtracks=cutoff) if deadline or cutoff else None
+        try:
+            filled_slots = fill_slots(solver, slot_graph, puzzle_grid, word_index, metrics, top_n=top_n, scoring=scoring, budget=budget, nogoods=nogoods, ordering=ordering, trace=trace, verbose=verbose)
+            outcome = 'solved' if filled_slots else 'exhausted'
+        except SearchCutoff:
+            outcome = 'cutoff'
+        except SearchTimeout:
+            outcome = 'timeout'
+
+        metrics['attempts'].append({
+            'seed': seed,
+            'cutoff': cutoff,
+            'outcome': outcome,
+            'backtracks': metrics['backtracks'] - attempt_backtracks,
+            'elapsed_ms': int((time.monotonic() - attempt_start) * 1000),
+        })
+        if trace:
+            trace.span('fill_slots', trace_start, attempt=attempt + 1, solver=solver, **metrics['attempts'][-1])
+        if filled_slots:
+            break
+        if outcome == 'timeout':
+            print(f"✗ Search timed out after {timeout_ms}ms and {attempt + 1} attempt(s)")
+            break
+
+    record_pattern_cache_metrics(metrics, word_index, pattern_cache_info)
+    return filled_slots
+
+
+# Strategies raced against each other in portfolio mode, each overriding the game's search options
+PORTFOLIO_STRATEGIES = [
+    {'name': 'propagate-luby', 'solver': 'propagate', 'top_n': 100, 'restarts': 'luby'},
+    {'name': 'propagate-narrow', 'solver': 'propagate', 'top_n': 10, 'restarts': 'luby'},
+    {'name': 'propagate-geometric', 'solver': 'propagate', 'top_n': 100, 'restarts': 'geometric'},
+    {'name': 'backjump-luby', 'solver': 'backjump', 'top_n': 100, 'restarts': 'luby'},
+    {'name': 'backjump-domwdeg', 'solver': 'backjump', 'order': 'domwdeg', 'top_n': 100, 'restarts': 'luby'},
+    {'name': 'random-luby', 'solver': 'random', 'top_n': 100, 'restarts': 'luby'},
+]
+
+
+def run_portfolio_strategy(task):
+    strategy, seed, slot_graph, puzzle_grid, search_options = task
+
+    random.seed(seed)
+    metrics = new_generation_metrics()
+    options = {**search_options, **{key: value for key, value in strategy.items() if key != 'name'}}
+    start_time = time.monotonic()
+    filled_slots = search_crossword(slot_graph, puzzle_grid, _worker_context['word_index'], metrics, **options)
+    metrics['elapsed_ms'] = int((time.monotonic() - start_time) * 1000)
+    return strategy['name'], filled_slots, metrics
+
+
+def init_portfolio_worker(word_index):
+    _worker_context['word_index'] = word_index
+
+
+def run_portfolio_process(task, word_index, results):
+    """Runs one strategy in its own process, sending (name, filled slots, metrics, error) to the results queue."""
+    init_portfolio_worker(word_index)
+    try:
+        results.put((*run_portfolio_strategy(task), None))
+    except Exception as e:
+        results.put((task[0]['name'], None, None, f"{type(e).__name__}: {e}"))
+
+
+def next_portfolio_result(results, processes):
+    """The next strategy result, or None once every strategy process has exited without sending one."""
+    while True:
+        try:
+            return results.get(timeout=0.1)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes) and results.empty():
+                return None
+
+
+def race_portfolio(slot_graph, puzzle_grid, word_index, metrics, portfolio_size=None, verbose=False, **search_options):
+    """
+    Runs several search strategies in parallel processes and keeps the first fill found.
+    The other searches are cancelled. Records the winner and every finished strategy in metrics['portfolio'].
+    """
+    strategies = PORTFOLIO_STRATEGIES[:portfolio_size or max(2, multiprocessing.cpu_count())]
+    tasks = [
+        (strategy, random.randrange(1 << 32), slot_graph, puzzle_grid, {**search_options, 'verbose': verbose})
+        for strategy in strategies
+    ]
+
+    # Each strategy runs in its own process, which is simply killed once another strategy wins. Terminating a pool
+    # instead can hang on its task queue lock. Forked processes inherit the word index copy-on-write, while spawned
+    # processes (the default on Windows and macOS) receive a pickled copy.
+    metrics['portfolio'] = {'winner': None, 'strategies': {}}
+    filled_slots = None
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_portfolio_process, args=(task, word_index, results), daemon=True) for task in tasks]
+    for process in processes:
+        process.start()
+    try:
+        for _ in processes:
+            result = next_portfolio_result(results, processes)
+            if result is None:
+                break
+            name, strategy_slots, strategy_metrics, error = result
+            if error:
+                raise RuntimeError(f"Portfolio strategy {name} failed: {error}")
+            metrics['portfolio']['strategies'][name] = {
+                'solved': strategy_slots is not None,
+                'elapsed_ms': strategy_metrics['elapsed_ms'],
+                'backtracks': strategy_metrics['backtracks'],
+                'restarts': strategy_metrics['restarts'],
+            }
+            if strategy_slots:
+                filled_slots = strategy_slots
+                metrics['portfolio']['winner'] = name
+                for key in new_generation_metrics():
+                    metrics[key] += strategy_metrics[key]
+                break
+    finally:
+        # Cancel the strategies that are still searching
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        results.close()
+
+    metrics['portfolio']['cancelled'] = [s['name'] for s in strategies if s['name'] not in metrics['portfolio']['strategies']]
+    if verbose:
+        print(f"Portfolio winner: {metrics['portfolio']['winner']} out of {len(strategies)} strategies")
+    return filled_slots
+
+
+def generate_game(shape, clues_index, word_index, top_n=10, solver='random', order=None, restarts='none', timeout_ms=None, portfolio=False,
+                  portfolio_size=None, scoring='python', metrics=None, trace=None, verbose=False):
+    """
+    Fills the shape and picks clues for the answers. Returns the game, or None if no fill was found.
+    trace, a SearchTrace, records the search steps. Portfolio searches run in other processes and aren't traced.
+    """
+    if trace:
+        trace_start = trace.clock()
+    puzzle_grid = shape['grid']
+    if 'slot_graph' not in shape:
+        # A shape straight from the shapes file rather than the compiled shape library
+        shape = compile_shape(shape)
+    slot_graph = shape['slot_graph']
+    if verbose:
+        print_word_slots(slot_graph['slots'])
+    
+    if metrics is None:
+        metrics = new_generation_metrics()
+
+    search_options = {
+        'top_n': top_n,
+        'solver': solver,
+        'order': order,
+        'restarts': restarts,
+        'timeout_ms': timeout_ms,
+        'scoring': scoring,
+    }
+    if portfolio:
+        print("Building crossword with a portfolio of parallel searches...")
+        filled_slots = race_portfolio(slot_graph, puzzle_grid, word_index, metrics, portfolio_size=portfolio_size, verbose=verbose, **search_options)
+    else:
+        if solver == 'propagate':
+            print("Building crossword with backtracking and constraint propagation...")
+        elif solver == 'backjump':
+            print("Building crossword with conflict-directed backjumping...")
+        else:
+            print("Building crossword with backtracking...")
+        filled_slots = search_crossword(slot_graph, puzzle_grid, word_index, metrics, trace=trace, verbose=verbose, **search_options)
 
     if not filled_slots:
         print(f"Diagnostics:\n{json.dumps(metrics, indent=2)}")
+        if trace:
+            trace.span('generate_game', trace_start, shape=shape.get('name'), solved=False, backtracks=metrics['backtracks'])
         return None
 
     if verbose:
         print(f"Diagnostics:\n{json.dumps(metrics, indent=2)}")
 
     print(f"Filled puzzle with {len(filled_slots)} words after {metrics['backtracks']} backtracks.")
+    if verbose or trace:
+        if trace:
+            fill_start = trace.clock()
+        final_puzzle = fill_puzzle_grid_with_answers(puzzle_grid, filled_slots)
+        if trace:
+            trace.span('fill_puzzle_grid_with_answers', fill_start, grid=[''.join(cell or '.' for cell in row) for row in final_puzzle])
     if verbose:
         print("Final puzzle:")
-        final_puzzle = fill_puzzle_grid_with_answers(puzzle_grid, filled_slots)
         for row in final_puzzle:
             print(''.join([cell if cell != '' else '.' for cell in row]))
 
     clues = format_crossword_clues(filled_slots, clues_index)
+    if trace:
+        trace.span('generate_game', trace_start, shape=shape.get('name'), solved=True, backtracks=metrics['backtracks'])
 
     return {
         'clues': clues,
@@ -392,30 +1083,251 @@ def generate_game(shape, clues_index, word_index, top_n=10, verbose=False):
     }
 
 
-def main(clues_file, shapes_file, output_dir, games_to_generate=1, shape_name=None, top_n=100, verbose=False):
-    print("Building clues and word indices...")
-    clues_index = load_json_file(clues_file)
-    word_index = build_word_index(clues_index.keys(), verbose=verbose)
+def generate_game_from_shapes(shapes, clues_index, word_index, shape_name=None, verbose=False, **generation_options):
+    """
+    Generates one game for a (possibly random) shape from the shape library. Returns the game, its metrics and the time taken.
+    generation_options are passed on to generate_game (e.g. top_n, solver).
+    """
+    crossword_shape = load_crossword_shape(shapes, shape_name=shape_name, verbose=verbose)
+
+    metrics = new_generation_metrics()
+    metrics['shape'] = crossword_shape['name']
+
+    start_time = time.time()
+    game = generate_game(crossword_shape, clues_index, word_index, metrics=metrics, verbose=verbose, **generation_options)
+    elapsed_ms = int((time.time() - start_time) * 1000)
+    metrics['elapsed_ms'] = elapsed_ms
+    return game, metrics, elapsed_ms
+
+
+def save_game_file(game, output_dir):
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    game_file = get_next_available_file(output_path, base_name="game", extension=".json")
+    with open(game_file, 'w', encoding='utf-8') as f:
+        json.dump(game, f, indent=2)
+    return game_file
+
+
+def report_generated_game(game, output_dir, elapsed_ms):
+    if game:
+        game_file = save_game_file(game, output_dir)
+        relative_path = os.path.relpath(game_file, Path(__file__).parent)
+        print(f"✓ Generated crossword game file: {relative_path} ({elapsed_ms}ms)")
+    else:
+        print(f"✗ Failed to generate crossword game! ({elapsed_ms}ms)", file=sys.stderr)
+
+
+# Clues, word index and shapes shared with worker processes. Forked workers inherit them copy-on-write from the
+# parent process; spawned workers load them in init_generation_worker (the word index and shapes from their caches).
+_worker_context = {}
+
+
+def init_generation_worker(clues_file, index_cache_file, shapes_file, shapes_cache_file, pattern_cache_size, trace_file=None, trace_format='jsonl'):
+    if not _worker_context:
+        clues_index = load_clues_index(clues_file)
+        word_index = build_word_index(clues_index.keys(), cache_file=index_cache_file, source_file=clues_file)
+        word_index.set_count_cache_size(pattern_cache_size)
+        shapes = load_shape_library(shapes_file, cache_file=shapes_cache_file)
+        _worker_context.update(clues_index=clues_index, word_index=word_index, shapes=shapes)
+    if trace_file is not None:
+        _worker_context['trace'] = SearchTrace(worker_trace_file(trace_file, os.getpid()), trace_format)
+
+
+def run_generation_worker(task):
+    game_number, seed, shape_name, generation_options, excluded_answers, verbose = task
+
+    # The recently used answers come with every task, so a long-lived pool picks up newly published games.
+    # They only change when a game is published, so the index is only updated when they differ.
+    if excluded_answers is not None and excluded_answers != _worker_context.get('excluded_answers'):
+        _worker_context['word_index'].exclude_words(excluded_answers)
+        _worker_context['excluded_answers'] = excluded_answers
+
+    # Forked workers start with the same RNG state as the parent, so every game gets its own seed
+    random.seed(seed)
+    print(f"\n[worker {os.getpid()}] Generating crossword game {game_number}...")
+    game, metrics, elapsed_ms = generate_game_from_shapes(
+        _worker_context['shapes'],
+        _worker_context['clues_index'],
+        _worker_context['word_index'],
+        shape_name=shape_name,
+        trace=_worker_context.get('trace'),
+        verbose=verbose,
+        **generation_options)
+    if _worker_context.get('trace'):
+        # Pool workers are terminated rather than shut down, so the trace is flushed after every game
+        _worker_context['trace'].flush()
+
+    return {
+        'game_number': game_number,
+        'worker': os.getpid(),
+        'game': game,
+        'metrics': metrics,
+        'elapsed_ms': elapsed_ms,
+    }
+
+
+def print_worker_summary(results):
+    workers = {}
+    for result in results:
+        summary = workers.setdefault(result['worker'], {'games': 0, 'failed': 0, 'elapsed_ms': 0, **new_generation_metrics()})
+        summary['games'] += 1
+        summary['failed'] += 0 if result['game'] else 1
+        summary['elapsed_ms'] += result['elapsed_ms']
+        for key in new_generation_metrics():
+            summary[key] += result['metrics'][key]
+
+    for summary in workers.values():
+        lookups = summary['pattern_cache_hits'] + summary['pattern_cache_misses']
+        summary['pattern_cache_hit_rate'] = summary['pattern_cache_hits'] / lookups if lookups else 0.0
+
+    print("\n=== Worker summary ===")
+    for worker, summary in sorted(workers.items()):
+        print(f"  worker {worker}: {summary['games']} games ({summary['failed']} failed) in {summary['elapsed_ms']}ms, "
+              f"{summary['words_found']} words found, {summary['backtracks']} backtracks, {summary['retry_count']} retries, {summary['restarts']} restarts, {summary['backjumps']} backjumps, "
+              f"{summary['pattern_cache_hit_rate']:.1%} pattern cache hit rate")
+
+
+def generate_games_in_parallel(clues_file, shapes_file, output_dir, clues_index, word_index, shapes, games_to_generate, jobs,
+                               generation_options, shape_name=None, index_cache_file=None, shapes_cache_file=None,
+                               pattern_cache_size=DEFAULT_COUNT_CACHE_SIZE, trace_file=None, trace_format='jsonl', excluded_answers=None, verbose=False):
+    """
+    Generates games across a pool of worker processes.
+    Only the parent process writes game files, so get_next_available_file never hands out the same name twice.
+    Each worker writes its own trace file, named after trace_file and its process id, and they are merged into trace_file.
+    """
+    _worker_context.update(clues_index=clues_index, word_index=word_index, shapes=shapes, excluded_answers=excluded_answers)
+    if trace_file:
+        # Worker traces left by an earlier run would be merged with this one
+        for stale_file in find_worker_trace_files(trace_file):
+            stale_file.unlink()
+    tasks = [
+        (i + 1, random.randrange(1 << 32), shape_name, generation_options, excluded_answers, verbose)
+        for i in range(games_to_generate)
+    ]
+
+    results = []
+    with multiprocessing.Pool(jobs, initializer=init_generation_worker, initargs=(clues_file, index_cache_file, shapes_file, shapes_cache_file, pattern_cache_size, trace_file, trace_format)) as pool:
+        for result in pool.imap_unordered(run_generation_worker, tasks):
+            print(f"\n[worker {result['worker']}] Finished crossword game {result['game_number']}/{games_to_generate}: "
+                  f"{json.dumps(result['metrics'])}")
+            report_generated_game(result['game'], output_dir, result['elapsed_ms'])
+            results.append(result)
+
+    if trace_file:
+        events = merge_trace_files(trace_file, find_worker_trace_files(trace_file), trace_format)
+        print(f"✓ Wrote search trace of {events} events to {trace_file}")
+    print_worker_summary(results)
+    return results
+
+
+def log_portfolio_result(log_file, metrics):
+    """Appends which portfolio strategy won a game to a JSON lines log, for tuning the default search options."""
+    entry = {
+        'timestamp': datetime.now().isoformat(),
+        'shape': metrics.get('shape'),
+        'elapsed_ms': metrics.get('elapsed_ms'),
+        **metrics['portfolio'],
+    }
+    with open(log_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def print_portfolio_summary(games_metrics):
+    wins = {}
+    for metrics in games_metrics:
+        winner = metrics['portfolio']['winner'] or 'none'
+        wins[winner] = wins.get(winner, 0) + 1
+
+    print("\n=== Portfolio wins ===")
+    for name, count in sorted(wins.items(), key=lambda x: x[1], reverse=True):
+        print(f"  {name}: {count}/{len(games_metrics)}")
 
+
+def exclude_recent_answers(word_index, games_dir, fresh_games=DEFAULT_FRESH_GAMES, fresh_days=None):
+    """
+    Leaves the answers of the recently published games in games_dir out of the word index, so they aren't reused.
+    games_dir is where the published games live, which is also where the recent answers log is kept.
+    Returns the excluded answers to pass on to worker processes, or None if answers may be reused.
+    """
+    if not fresh_games:
+        return None
+    recent_answers = load_recent_answers(games_dir, max_games=fresh_games, max_age_days=fresh_days)
+    excluded = word_index.exclude_words(recent_answers)
+    print(f"✓ Excluding {excluded} answers used in the last {fresh_games} published games"
+          + (f" within {fresh_days} days" if fresh_days is not None else ''))
+    return recent_answers
+
+
+def main(clues_file, shapes_file, output_dir, games_to_generate=1, shape_name=None, top_n=100, solver='random', order=None, restarts='none',
+         timeout_ms=None, portfolio=False, portfolio_size=None, portfolio_log_file=None, index_cache_file=None,
+         shapes_cache_file=None, pattern_cache_size=DEFAULT_COUNT_CACHE_SIZE, scoring=DEFAULT_SCORING_ENGINE, trace_file=None, trace_format='jsonl',
+         games_dir=DEFAULT_GAMES_DIR, fresh_games=DEFAULT_FRESH_GAMES, fresh_days=None, jobs=1, verbose=False):
+    generation_options = {
+        'top_n': top_n,
+        'solver': solver,
+        'order': order,
+        'restarts': restarts,
+        'timeout_ms': timeout_ms,
+        'portfolio': portfolio,
+        'portfolio_size': portfolio_size,
+        'scoring': scoring,
+    }
+
+    if scoring == 'numpy' and np is None:
+        print("✗ numpy is not installed, scoring candidates in python", file=sys.stderr)
+        generation_options['scoring'] = 'python'
+
+    if portfolio and jobs > 1:
+        # Pool workers can't start processes of their own, and the portfolio already uses one process per strategy
+        print("✗ --portfolio already runs one process per strategy, ignoring --jobs", file=sys.stderr)
+        jobs = 1
+
+    print("Building clues and word indices...")
+    clues_index = load_clues_index(clues_file)
+    word_index = build_word_index(clues_index.keys(), cache_file=index_cache_file, source_file=clues_file, verbose=verbose)
+    word_index.set_count_cache_size(pattern_cache_size)
+    excluded_answers = exclude_recent_answers(word_index, games_dir, fresh_games=fresh_games, fresh_days=fresh_days)
+    shapes = load_shape_library(shapes_file, cache_file=shapes_cache_file, verbose=verbose)
+
+    if jobs > 1 and games_to_generate > 1:
+        generate_games_in_parallel(
+            clues_file,
+            shapes_file,
+            output_dir,
+            clues_index,
+            word_index,
+            shapes,
+            games_to_generate,
+            min(jobs, games_to_generate),
+            generation_options,
+            shape_name=shape_name,
+            index_cache_file=index_cache_file,
+            shapes_cache_file=shapes_cache_file,
+            pattern_cache_size=pattern_cache_size,
+            trace_file=trace_file,
+            trace_format=trace_format,
+            excluded_answers=excluded_answers,
+            verbose=verbose)
+        return
+
+    trace = SearchTrace(trace_file, trace_format) if trace_file else None
+    portfolio_metrics = []
     for i in range(games_to_generate):
         print(f"\nGenerating crossword game {i + 1}/{games_to_generate}...")
-        crossword_shape = load_crossword_shape(shapes_file, shape_name=shape_name, verbose=verbose)
-
-        start_time = time.time()
-        game = generate_game(crossword_shape, clues_index, word_index, top_n=top_n, verbose=verbose)
-        elapsed_ms = int((time.time() - start_time) * 1000)
-
-        if game:
-            output_path = Path(output_dir)
-            output_path.mkdir(parents=True, exist_ok=True)
-            game_file = get_next_available_file(output_path, base_name="game", extension=".json")
-            with open(game_file, 'w', encoding='utf-8') as f:
-                json.dump(game, f, indent=2)
-                
-            relative_path = Path(game_file).relative_to(Path(__file__).parent)
-            print(f"✓ Generated crossword game file: {relative_path} ({elapsed_ms}ms)")
-        else:
-            print(f"✗ Failed to generate crossword game! ({elapsed_ms}ms)", file=sys.stderr)
+        game, metrics, elapsed_ms = generate_game_from_shapes(shapes, clues_index, word_index, shape_name=shape_name, trace=trace, verbose=verbose, **generation_options)
+        report_generated_game(game, output_dir, elapsed_ms)
+
+        if portfolio:
+            portfolio_metrics.append(metrics)
+            if portfolio_log_file:
+                log_portfolio_result(portfolio_log_file, metrics)
+
+    if trace:
+        trace.close()
+        print(f"✓ Wrote search trace to {trace_file}")
+    if portfolio:
+        print_portfolio_summary(portfolio_metrics)
 
 
 def get_next_available_file(output_dir, base_name="game", extension=".json"):
@@ -440,13 +1352,37 @@ if __name__ == "__main__":
     parser.add_argument("-o", "--output", type=str, help="Output directory for generated games")
     parser.add_argument("-s", "--shape", type=str, help="Specify the name of the crossword shape to use")
     parser.add_argument("-t", "--top", type=int, default=100, help="Number of top-scored words to randomly select from (default: 10)")
+    parser.add_argument("--solver", choices=SOLVER_ENGINES, default='random', help="Search engine used to fill the crossword (default: random)")
+    parser.add_argument("--order", choices=SLOT_ORDERS, help="Strategy for picking the next slot to fill (default: random for the random solver, mrv otherwise)")
+    parser.add_argument("--restarts", choices=RESTART_POLICIES, default='none', help="Restart schedule for abandoning long searches (default: none)")
+    parser.add_argument("--timeout-ms", type=int, help="Give up on a game after this many milliseconds")
+    parser.add_argument("--portfolio", action="store_true", help="Race several search strategies in parallel processes for each game")
+    parser.add_argument("--portfolio-size", type=int, help=f"Number of strategies to race (default: CPU count, at least 2 and at most {len(PORTFOLIO_STRATEGIES)})")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of worker processes to generate games in parallel (default: 1)")
+    parser.add_argument("--pattern-cache-size", type=int, default=DEFAULT_COUNT_CACHE_SIZE, help=f"Number of pattern match counts to memoize, 0 to disable (default: {DEFAULT_COUNT_CACHE_SIZE})")
+    parser.add_argument("--no-index-cache", action="store_true", help="Always rebuild the word index instead of using the cached copy")
+    parser.add_argument("--scoring", choices=SCORING_ENGINES, default=DEFAULT_SCORING_ENGINE, help=f"Engine scoring the candidate words, both give the same scores (default: {DEFAULT_SCORING_ENGINE})")
+    parser.add_argument("--trace", type=str, help="Write a trace of the search steps to this file")
+    parser.add_argument("--trace-format", choices=TRACE_FORMATS, default='jsonl', help="Trace as JSON lines, or Chrome trace events for a flamegraph viewer (default: jsonl)")
+    parser.add_argument("--fresh-games", type=int, default=DEFAULT_FRESH_GAMES, help=f"Don't reuse answers of the last N published games, 0 to allow them (default: {DEFAULT_FRESH_GAMES})")
+    parser.add_argument("--fresh-days", type=int, help="Only avoid answers of games published in the last N days")
+    parser.add_argument("--games-dir", type=str, default=str(DEFAULT_GAMES_DIR), help="Directory of the published games whose answers aren't reused (default: server/data/crossword)")
+    parser.add_argument("--no-shape-cache", action="store_true", help="Always recompile the crossword shapes instead of using the cached copy")
     args = parser.parse_args()
 
     data_directory = Path(__file__).parent / "data"
-    clues_file = data_directory / "crossword_clues.json"
+    clues_file = data_directory / "crossword_clues.db"
+    if not clues_file.exists():
+        # Data formatted before the clue store was added, rerun init.py to create it
+        clues_file = data_directory / "crossword_clues.json"
     shapes_file = data_directory / "crossword_shapes.json"
+    index_cache_file = None if args.no_index_cache else data_directory / "crossword_clues.index"
+    shapes_cache_file = None if args.no_shape_cache else data_directory / "crossword_shapes.cache"
+    portfolio_log_file = data_directory / "portfolio_stats.jsonl"
 
     default_output_dir = Path(__file__).parent / ".." / ".." / "server" / "data" / "crossword"
     output_dir = args.output if args.output else default_output_dir
 
-    main(clues_file, shapes_file, output_dir, games_to_generate=args.number, shape_name=args.shape, top_n=args.top, verbose=args.verbose)
+    main(clues_file, shapes_file, output_dir, games_to_generate=args.number, shape_name=args.shape, top_n=args.top, solver=args.solver, order=args.order, restarts=args.restarts,
+         timeout_ms=args.timeout_ms, portfolio=args.portfolio, portfolio_size=args.portfolio_size, portfolio_log_file=portfolio_log_file, index_cache_file=index_cache_file, shapes_cache_file=shapes_cache_file, pattern_cache_size=args.pattern_cache_size, scoring=args.scoring, trace_file=args.trace, trace_format=args.trace_format,
+         games_dir=args.games_dir, fresh_games=args.fresh_games, fresh_days=args.fresh_days, jobs=args.jobs, verbose=args.verbose)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Generates rotationally symmetric crossword shapes and adds them to the shapes file.
+Every generated shape is connected, every white cell is part of both an across and a down slot,
+and no slot is shorter than the minimum length. Shapes are checked against the word index with
+a short search before they are kept, so only shapes the generator can fill are written.
+
+Usage:
+  python3 generate_shapes.py --size 11 -n 5                 # add five 11x11 shapes
+  python3 generate_shapes.py --size 15 --density 0.18 -n 2
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+from pathlib import Path
+from generate_games import build_word_index, load_clues_index, new_generation_metrics, search_crossword
+from shape_library import compile_shape, grid_key
+
+MIN_SIZE = 9
+MAX_SIZE = 15
+DEFAULT_DENSITY = 0.16
+DEFAULT_MIN_SLOT_LENGTH = 3
+DEFAULT_CHECK_TIMEOUT_MS = 5000
+MAX_PLACEMENT_FAILURES = 200
+
+
+def run_lengths(cells):
+    """Lengths of the runs of white (1) cells in a row or column."""
+    lengths = []
+    length = 0
+    for cell in cells:
+        if cell == 1:
+            length += 1
+        elif length:
+            lengths.append(length)
+            length = 0
+    if length:
+        lengths.append(length)
+    return lengths
+
+
+def has_valid_slots(grid, min_slot_length):
+    """True if every run of white cells, across and down, is at least min_slot_length long."""
+    for line in list(grid) + [list(column) for column in zip(*grid)]:
+        if any(length < min_slot_length for length in run_lengths(line)):
+            return False
+    return True
+
+
+def is_connected(grid):
+    """True if all white cells are connected through their edges."""
+    size = len(grid)
+    white_cells = [(r, c) for r in range(size) for c in range(size) if grid[r][c] == 1]
+    if not white_cells:
+        return False
+
+    seen = {white_cells[0]}
+    stack = [white_cells[0]]
+    while stack:
+        r, c = stack.pop()
+        for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+            if 0 <= nr < size and 0 <= nc < size and grid[nr][nc] == 1 and (nr, nc) not in seen:
+                seen.add((nr, nc))
+                stack.append((nr, nc))
+    return len(seen) == len(white_cells)
+
+
+def is_valid_shape(grid, min_slot_length):
+    return has_valid_slots(grid, min_slot_length) and is_connected(grid)
+
+
+def generate_symmetric_grid(size, density, min_slot_length):
+    """
+    Places black cells in pairs that map onto each other under 180 degree rotation until the
+    target density is reached, skipping any placement that breaks the shape. Returns None if it gets stuck.
+    """
+    grid = [[1] * size for _ in range(size)]
+    target_blacks = round(size * size * density)
+    blacks = 0
+    failures = 0
+    while blacks < target_blacks:
+        if failures >= MAX_PLACEMENT_FAILURES:
+            return None
+
+        r, c = random.randrange(size), random.randrange(size)
+        mirror_r, mirror_c = size - 1 - r, size - 1 - c
+        if grid[r][c] == 0:
+            continue
+
+        grid[r][c] = grid[mirror_r][mirror_c] = 0
+        if is_valid_shape(grid, min_slot_length):
+            blacks += 1 if (r, c) == (mirror_r, mirror_c) else 2
+            failures = 0
+        else:
+            grid[r][c] = grid[mirror_r][mirror_c] = 1
+            failures += 1
+    return grid
+
+
+def check_fillability(shape, word_index, timeout_ms=DEFAULT_CHECK_TIMEOUT_MS):
+    """
+    Quick check that a shape can be filled from the word index: every slot length needs words,
+    then a short backjumping search has to find a fill within the time limit.
+    Returns (fillable, reason).
+    """
+    compiled = compile_shape(shape)
+    missing_lengths = [length for length in compiled['length_histogram'] if word_index.count('?' * length) == 0]
+    if missing_lengths:
+        return False, f"no words of length {', '.join(str(length) for length in missing_lengths)}"
+
+    metrics = new_generation_metrics()
+    with contextlib.redirect_stdout(io.StringIO()):
+        filled_slots = search_crossword(compiled['slot_graph'], shape['grid'], word_index, metrics, top_n=100,
+                                        solver='backjump', restarts='luby', timeout_ms=timeout_ms)
+    if not filled_slots:
+        outcome = 'timed out' if metrics['attempts'] and metrics['attempts'][-1]['outcome'] == 'timeout' else 'gave up'
+        return False, f"no fill found, search {outcome} after {metrics['backtracks']} backtracks"
+    return True, f"filled after {metrics['backtracks']} backtracks"
+
+
+def format_shapes(shapes):
+    """Formats shapes like the hand-written shapes file, with one grid row per line."""
+    entries = []
+    for shape in shapes:
+        rows = ',\n'.join(f"            {json.dumps(row)}" for row in shape['grid'])
+        entries.append(
+            "    {\n"
+            f"        \"name\": {json.dumps(shape['name'])},\n"
+            "        \"grid\": [\n"
+            f"{rows}\n"
+            "        ]\n"
+            "    }")
+    return "[\n" + ',\n'.join(entries) + "\n]"
+
+
+def generate_shapes(size, count, word_index, density=DEFAULT_DENSITY, min_slot_length=DEFAULT_MIN_SLOT_LENGTH,
+                    existing_shapes=(), check_timeout_ms=DEFAULT_CHECK_TIMEOUT_MS, max_attempts=None, check=True):
+    """Generates up to count new shapes that aren't already in existing_shapes."""
+    seen_grids = {grid_key(shape['grid']) for shape in existing_shapes}
+    names = {shape['name'] for shape in existing_shapes}
+    if max_attempts is None:
+        max_attempts = count * 20
+
+    shapes = []
+    for attempt in range(1, max_attempts + 1):
+        if len(shapes) >= count:
+            break
+
+        grid = generate_symmetric_grid(size, density, min_slot_length)
+        if grid is None:
+            print(f"  attempt {attempt}: couldn't reach {density:.0%} black cells, retrying")
+            continue
+        if grid_key(grid) in seen_grids:
+            continue
+
+        number = 1
+        while f"{size}x{size}_generated_{number}" in names:
+            number += 1
+        shape = {'name': f"{size}x{size}_generated_{number}", 'grid': grid}
+
+        if check:
+            fillable, reason = check_fillability(shape, word_index, timeout_ms=check_timeout_ms)
+            if not fillable:
+                print(f"  attempt {attempt}: ✗ skipped unfillable shape, {reason}")
+                continue
+            print(f"  attempt {attempt}: ✓ {shape['name']} {reason}")
+        else:
+            print(f"  attempt {attempt}: ✓ {shape['name']}")
+
+        for row in grid:
+            print('    ' + ''.join('#' if cell == 0 else '.' for cell in row))
+        shapes.append(shape)
+        seen_grids.add(grid_key(grid))
+        names.add(shape['name'])
+    return shapes
+
+
+def main():
+    script_dir = Path(__file__).parent
+    data_dir = script_dir / "data"
+
+    parser = argparse.ArgumentParser(description="Generate rotationally symmetric crossword shapes.")
+    parser.add_argument("--size", type=int, required=True, help=f"Width and height of the grid ({MIN_SIZE}-{MAX_SIZE})")
+    parser.add_argument("-n", "--number", type=int, default=1, help="Number of shapes to generate (default: 1)")
+    parser.add_argument("--density", type=float, default=DEFAULT_DENSITY, help=f"Fraction of black cells (default: {DEFAULT_DENSITY})")
+    parser.add_argument("--min-slot-length", type=int, default=DEFAULT_MIN_SLOT_LENGTH, help=f"Shortest allowed slot (default: {DEFAULT_MIN_SLOT_LENGTH})")
+    parser.add_argument("--shapes", type=str, default=str(data_dir / "crossword_shapes.json"), help="Shapes file to add the shapes to")
+    parser.add_argument("--clues", type=str, help="Clues to check fillability against (default: crossword_clues.db, or crossword_clues.json)")
+    parser.add_argument("--check-timeout-ms", type=int, default=DEFAULT_CHECK_TIMEOUT_MS, help=f"Time limit of the fillability check (default: {DEFAULT_CHECK_TIMEOUT_MS})")
+    parser.add_argument("--no-check", action="store_true", help="Skip the fillability check")
+    parser.add_argument("--seed", type=int, help="Random seed, for reproducible shapes")
+    parser.add_argument("--dry-run", action="store_true", help="Print the shapes without writing the shapes file")
+    args = parser.parse_args()
+
+    if not MIN_SIZE <= args.size <= MAX_SIZE:
+        print(f"✗ Shape size must be between {MIN_SIZE} and {MAX_SIZE}", file=sys.stderr)
+        sys.exit(2)
+    if args.min_slot_length < 2:
+        print("✗ Slots must be at least 2 letters long", file=sys.stderr)
+        sys.exit(2)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    shapes_file = Path(args.shapes)
+    existing_shapes = []
+    if shapes_file.exists():
+        with open(shapes_file, 'r', encoding='utf-8') as f:
+            existing_shapes = json.load(f)
+
+    word_index = None
+    if not args.no_check:
+        clues_file = args.clues
+        if clues_file is None:
+            clues_file = data_dir / "crossword_clues.db"
+            if not clues_file.exists():
+                clues_file = data_dir / "crossword_clues.json"
+        clues_index = load_clues_index(clues_file)
+        word_index = build_word_index(clues_index.keys(), cache_file=data_dir / "crossword_clues.index", source_file=clues_file)
+
+    print(f"Generating {args.number} {args.size}x{args.size} shapes with {args.density:.0%} black cells...")
+    shapes = generate_shapes(args.size, args.number, word_index, density=args.density, min_slot_length=args.min_slot_length,
+                             existing_shapes=existing_shapes, check_timeout_ms=args.check_timeout_ms, check=not args.no_check)
+    if len(shapes) < args.number:
+        print(f"✗ Only generated {len(shapes)} of {args.number} shapes", file=sys.stderr)
+    if not shapes or args.dry_run:
+        return
+
+    with open(shapes_file, 'w', encoding='utf-8') as f:
+        f.write(format_shapes(existing_shapes + shapes))
+    print(f"✓ Added {len(shapes)} shapes to {shapes_file}")
+
+
+if __name__ == "__main__":
+    main()
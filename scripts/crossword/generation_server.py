@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Long-lived crossword generation server.
+Loads the clues, word index and shapes once and keeps them resident in a pool of worker processes,
+so each request only pays for the search. Listens on localhost HTTP or a Unix socket.
+
+  GET  /health                                   -> {"status": "ok", "words": ..., "shapes": [...], "workers": ...}
+  POST /generate  {"count": 2, "shape": "7x7_wheel", "top_n": 100}
+  GET  /generate?count=2&shape=7x7_wheel&top_n=100
+
+/generate streams one JSON line per game as the games finish, with the game in the same format
+as the game files ({"clues": [...], "shape": [...]}, or null if the search failed), then a summary line
+{"done": true, "generated": ..., "failed": ...}. If a worker raises, an {"error": ...} line comes before the summary.
+Besides count, shape and top_n a request can set solver, order, restarts, timeout_ms and scoring.
+Every game gets a time limit, so one request can't hold a worker indefinitely: the server's --timeout-ms
+is both the default and the largest timeout_ms a request can ask for.
+Concurrent requests share the worker pool. The answers of recently published games are read again
+for every request, so games published while the server runs aren't reused either.
+
+Usage:
+  python3 generation_server.py --port 8765 -j 4
+  python3 generation_server.py --socket /tmp/crossword.sock
+  curl -N 'http://127.0.0.1:8765/generate?count=2&top_n=50'
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socketserver
+import threading
+import traceback
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from answer_freshness import DEFAULT_GAMES_DIR, load_recent_answers
+from generate_games import (
+    DEFAULT_FRESH_GAMES, DEFAULT_SCORING_ENGINE, RESTART_POLICIES, SCORING_ENGINES, SLOT_ORDERS, SOLVER_ENGINES, _worker_context,
+    build_word_index, exclude_recent_answers, init_generation_worker, load_clues_index, run_generation_worker,
+)
+from shape_library import load_shape_library
+from word_index import DEFAULT_COUNT_CACHE_SIZE
+
+DEFAULT_PORT = 8765
+MAX_GAMES_PER_REQUEST = 100
+DEFAULT_TIMEOUT_MS = 30_000
+
+
+def parse_int(value):
+    """An integer from a JSON number or a query string. Booleans and fractions are rejected rather than truncated."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"expected an integer, got {json.dumps(value)}")
+    return int(value)
+
+
+def parse_str(value):
+    if not isinstance(value, str):
+        raise ValueError(f"expected a string, got {json.dumps(value)}")
+    return value
+
+
+# Request fields and how to parse them from a JSON body or a query string
+REQUEST_FIELDS = {
+    'count': parse_int,
+    'shape': parse_str,
+    'top_n': parse_int,
+    'solver': parse_str,
+    'order': parse_str,
+    'restarts': parse_str,
+    'timeout_ms': parse_int,
+    'scoring': parse_str,
+}
+CHOICES = {
+    'solver': SOLVER_ENGINES,
+    'order': SLOT_ORDERS,
+    'restarts': RESTART_POLICIES,
+    'scoring': SCORING_ENGINES,
+}
+
+
+class RequestError(ValueError):
+    """A generation request that can't be served, reported to the client as 400 Bad Request."""
+
+
+def parse_generation_request(fields, shapes, max_timeout_ms=DEFAULT_TIMEOUT_MS):
+    """
+    Validates a generation request. Returns (count, shape_name, generation_options) for run_generation_worker.
+    timeout_ms defaults to max_timeout_ms and can't exceed it.
+    Raises RequestError if a field is unknown or invalid.
+    """
+    unknown = sorted(set(fields) - set(REQUEST_FIELDS))
+    if unknown:
+        raise RequestError(f"Unknown request fields: {', '.join(unknown)}")
+
+    request = {}
+    for key, value in fields.items():
+        if value is None:
+            continue
+        try:
+            request[key] = REQUEST_FIELDS[key](value)
+        except ValueError as e:
+            raise RequestError(f"Invalid request field {key}: {e}")
+
+    count = request.get('count', 1)
+    if not 1 <= count <= MAX_GAMES_PER_REQUEST:
+        raise RequestError(f"count must be between 1 and {MAX_GAMES_PER_REQUEST}")
+    shape_name = request.get('shape')
+    if shape_name and shapes.get(shape_name) is None:
+        raise RequestError(f"No crossword shape named '{shape_name}'")
+    top_n = request.get('top_n', 100)
+    if top_n < 1:
+        raise RequestError("top_n must be at least 1")
+    # 0 would mean no time limit to the search
+    timeout_ms = request.get('timeout_ms', max_timeout_ms)
+    if not 1 <= timeout_ms <= max_timeout_ms:
+        raise RequestError(f"timeout_ms must be between 1 and {max_timeout_ms}")
+    for key, choices in CHOICES.items():
+        if request.get(key) is not None and request[key] not in choices:
+            raise RequestError(f"{key} must be one of {', '.join(choices)}")
+
+    generation_options = {
+        'top_n': top_n,
+        'solver': request.get('solver') or 'random',
+        'order': request.get('order'),
+        'restarts': request.get('restarts') or 'none',
+        'timeout_ms': timeout_ms,
+        'scoring': request.get('scoring') or DEFAULT_SCORING_ENGINE,
+    }
+    return count, shape_name, generation_options
+
+
+class GenerationRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'CrosswordGenerationServer/1.0'
+
+    def address_string(self):
+        # Unix socket clients don't have an address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            context = self.server.context
+            self.send_json(HTTPStatus.OK, {
+                'status': 'ok',
+                'words': len(context['word_index']),
+                'shapes': [shape['name'] for shape in context['shapes'].shapes],
+                'workers': context['jobs'],
+            })
+        elif url.path == '/generate':
+            self.generate({key: values[-1] for key, values in parse_qs(url.query).items()})
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': f"Unknown path {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/generate':
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': f"Unknown path {url.path}"})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            fields = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as e:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': f"Invalid JSON: {e}"})
+            return
+        if not isinstance(fields, dict):
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': "Expected a JSON object"})
+            return
+        self.generate(fields)
+
+    def generate(self, fields):
+        context = self.server.context
+        try:
+            count, shape_name, generation_options = parse_generation_request(fields, context['shapes'], max_timeout_ms=context['timeout_ms'])
+        except RequestError as e:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+            return
+
+        excluded_answers = self.recent_answers()
+        tasks = [
+            (i + 1, random.randrange(1 << 32), shape_name, generation_options, excluded_answers, context['verbose'])
+            for i in range(count)
+        ]
+
+        # The games are streamed as JSON lines while they finish, the connection closing after the summary
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+
+        generated = 0
+        lines = []
+        try:
+            for result in context['pool'].imap_unordered(run_generation_worker, tasks):
+                generated += 1 if result['game'] else 0
+                self.write_line({
+                    'game_number': result['game_number'],
+                    'shape': result['metrics'].get('shape'),
+                    'elapsed_ms': result['elapsed_ms'],
+                    'game': result['game'],
+                    'metrics': result['metrics'],
+                })
+        except (BrokenPipeError, ConnectionResetError):
+            # The games already queued for this request still finish in the pool, their results are dropped
+            self.log_message("client disconnected before all %d games were sent", count)
+            return
+        except Exception as e:
+            # The headers are already sent, so the error is reported in the stream. Games not sent count as failed.
+            error = f"{type(e).__name__}: {e}"
+            self.log_error("generating games failed: %s", error)
+            traceback.print_exc()
+            lines.append({'error': error})
+
+        lines.append({'done': True, 'generated': generated, 'failed': count - generated})
+        try:
+            for line in lines:
+                self.write_line(line)
+        except (BrokenPipeError, ConnectionResetError):
+            self.log_message("client disconnected before the summary was sent")
+
+    def recent_answers(self):
+        """The answers of the recently published games, re-read so newly published games are picked up."""
+        context = self.server.context
+        if not context['fresh_games']:
+            return None
+        # The log may be appended to while reading it, so requests read it one at a time
+        with context['fresh_lock']:
+            return load_recent_answers(context['games_dir'], max_games=context['fresh_games'], max_age_days=context['fresh_days'])
+
+    def write_line(self, data):
+        self.wfile.write(json.dumps(data).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+else:  # Windows
+    ThreadingUnixHTTPServer = None
+
+
+def create_server(context, port=DEFAULT_PORT, socket_path=None):
+    if socket_path is not None:
+        if ThreadingUnixHTTPServer is None:
+            raise OSError("Unix sockets aren't supported on this platform, use --port")
+        if os.path.exists(socket_path):
+            # Left over from a server that didn't shut down cleanly
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, GenerationRequestHandler)
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', port), GenerationRequestHandler)
+    server.context = context
+    return server
+
+
+def main():
+    data_directory = Path(__file__).parent / "data"
+
+    parser = argparse.ArgumentParser(description="Serve crossword games from a long-lived generation process.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Localhost port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--socket", type=str, help="Listen on this Unix socket instead of a localhost port")
+    parser.add_argument("-j", "--jobs", type=int, default=multiprocessing.cpu_count(), help="Number of worker processes generating games (default: CPU count)")
+    parser.add_argument("--pattern-cache-size", type=int, default=DEFAULT_COUNT_CACHE_SIZE, help=f"Number of pattern match counts to memoize in each worker (default: {DEFAULT_COUNT_CACHE_SIZE})")
+    parser.add_argument("--timeout-ms", type=int, default=DEFAULT_TIMEOUT_MS, help=f"Time limit of every game, and the largest timeout_ms a request can set (default: {DEFAULT_TIMEOUT_MS})")
+    parser.add_argument("--fresh-games", type=int, default=DEFAULT_FRESH_GAMES, help=f"Don't reuse answers of the last N published games, 0 to allow them (default: {DEFAULT_FRESH_GAMES})")
+    parser.add_argument("--fresh-days", type=int, help="Only avoid answers of games published in the last N days")
+    parser.add_argument("--games-dir", type=str, default=str(DEFAULT_GAMES_DIR), help="Directory of the published games whose answers aren't reused (default: server/data/crossword)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging of the searches")
+    args = parser.parse_args()
+    if args.timeout_ms < 1:
+        parser.error("--timeout-ms must be at least 1")
+
+    clues_file = data_directory / "crossword_clues.db"
+    if not clues_file.exists():
+        clues_file = data_directory / "crossword_clues.json"
+    shapes_file = data_directory / "crossword_shapes.json"
+    index_cache_file = data_directory / "crossword_clues.index"
+    shapes_cache_file = data_directory / "crossword_shapes.cache"
+
+    print("Building clues and word indices...")
+    clues_index = load_clues_index(clues_file)
+    word_index = build_word_index(clues_index.keys(), cache_file=index_cache_file, source_file=clues_file)
+    word_index.set_count_cache_size(args.pattern_cache_size)
+    excluded_answers = exclude_recent_answers(word_index, args.games_dir, fresh_games=args.fresh_games, fresh_days=args.fresh_days)
+    shapes = load_shape_library(shapes_file, cache_file=shapes_cache_file)
+
+    # Forked workers inherit the loaded data copy-on-write, spawned workers load it from the caches
+    _worker_context.update(clues_index=clues_index, word_index=word_index, shapes=shapes, excluded_answers=excluded_answers)
+    jobs = max(1, args.jobs)
+    pool = multiprocessing.Pool(jobs, initializer=init_generation_worker,
+                                initargs=(clues_file, index_cache_file, shapes_file, shapes_cache_file, args.pattern_cache_size))
+
+    context = {
+        'pool': pool, 'word_index': word_index, 'shapes': shapes, 'jobs': jobs, 'timeout_ms': args.timeout_ms, 'verbose': args.verbose,
+        'games_dir': args.games_dir, 'fresh_games': args.fresh_games, 'fresh_days': args.fresh_days, 'fresh_lock': threading.Lock(),
+    }
+    server = create_server(context, port=args.port, socket_path=args.socket)
+    where = args.socket if args.socket else f"http://127.0.0.1:{args.port}"
+    print(f"✓ Serving crossword games on {where} with {jobs} workers ({len(word_index)} words, {len(shapes)} shapes)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        pool.terminate()
+        pool.join()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,14 @@
 Initialize the data files required for generating crossword game files.
 """
 import sys
+import shutil
+import urllib.parse
 import urllib.request
 import zipfile
 import argparse
 from pathlib import Path
 from format_crossword_clues import format_crossword_clues_dictionary
+from stage_timer import StageTimer
 
 
 def download_file(url, dest_path):
@@ -22,32 +25,64 @@ def download_file(url, dest_path):
         return False
 
 
-def download_and_extract_zip(url, dest_path, extract_file):
-    """Download a zip file and extract a specific file from it."""
-    zip_path = dest_path.parent / "temp.zip"
-    
-    print(f"Downloading {url}...")
+def resolve_local_path(source):
+    """Returns the path of a file:// URL or a plain local path, or None for a remote URL."""
+    parsed = urllib.parse.urlparse(source)
+    if parsed.scheme == 'file':
+        return Path(urllib.request.url2pathname(parsed.path))
+    # A single letter scheme is a Windows drive letter
+    if len(parsed.scheme) <= 1:
+        return Path(source)
+    return None
+
+
+def fetch_zip(source, zip_path):
+    """
+    Make a zip file available locally, downloading it to zip_path unless the source is a local file.
+    Returns (path, is_temporary), or None if it couldn't be fetched.
+    """
+    local_path = resolve_local_path(source)
+    if local_path is not None:
+        if not local_path.exists():
+            print(f"✗ Zip file {local_path} not found", file=sys.stderr)
+            return None
+        print(f"✓ Using local zip file {local_path}")
+        return local_path, False
+
+    print(f"Downloading {source}...")
     try:
-        urllib.request.urlretrieve(url, zip_path)
+        urllib.request.urlretrieve(source, zip_path)
         print(f"✓ Successfully downloaded zip file")
     except Exception as e:
         print(f"✗ Failed to download zip: {e}", file=sys.stderr)
+        return None
+    return zip_path, True
+
+
+def download_and_extract_zip(url, dest_path, extract_file, stages=None):
+    """Download a zip file and extract a specific file from it."""
+    if stages is None:
+        stages = StageTimer()
+    with stages.stage('download_clues'):
+        fetched = fetch_zip(url, dest_path.parent / "temp.zip")
+    if fetched is None:
         return False
+    zip_path, is_temporary = fetched
     
     print(f"Extracting {extract_file} from zip...")
     try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        with stages.stage('extract_clues'), zipfile.ZipFile(zip_path, 'r') as zip_ref:
             # Extract the specific file
             with zip_ref.open(extract_file) as source:
                 with open(dest_path, 'wb') as target:
-                    target.write(source.read())
+                    shutil.copyfileobj(source, target)
         print(f"✓ Successfully extracted {dest_path.name}")
     except Exception as e:
         print(f"✗ Failed to extract file: {e}", file=sys.stderr)
         return False
     finally:
         # Clean up zip file
-        if zip_path.exists():
+        if is_temporary and zip_path.exists():
             zip_path.unlink()
     
     return True
@@ -56,9 +91,24 @@ def download_and_extract_zip(url, dest_path, extract_file):
 def main():
     # Parse arguments
     parser = argparse.ArgumentParser(description='Initialize crossword data by downloading and processing files.')
-    parser.add_argument('--no-cleanup', action='store_true', 
-                        help='Keep intermediate wordlist and clues files after processing')
+    parser.add_argument('--cleanup', action='store_true',
+                        help='Delete the downloaded wordlist and clues files after processing, so the next run downloads and rebuilds them')
+    # The downloads are kept by default now, so the build manifest can skip unchanged rebuilds
+    parser.add_argument('--no-cleanup', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--refresh', action='store_true',
+                        help='Download the wordlist and clues again even if they exist; the clues are only rebuilt if the downloads changed')
+    parser.add_argument('--clues-source', default="https://xd.saul.pw/xd-clues.zip",
+                        help='URL, file:// URL or local path of the xd clues zip file')
+    parser.add_argument('--stream-clues', action='store_true',
+                        help='Read the clues straight out of the zip file instead of extracting clues.tsv')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild the crossword clues even if the downloaded files and parameters are unchanged')
+    parser.add_argument('--report',
+                        help='Append the time and memory of each stage as a JSON line to this file')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Also record peak Python allocations per stage with tracemalloc (slower)')
     args = parser.parse_args()
+    stages = StageTimer(trace_memory=args.trace_memory)
     
     # Setup paths
     script_dir = Path(__file__).parent
@@ -71,9 +121,10 @@ def main():
     wordlist_url = "https://drive.google.com/uc?export=download&id=1fbGFn596W047OVOYdrKAxx3OVmwO8UyL"
     wordlist_path = data_dir / "spreadthewordlist_caps.txt"
     
-    clues_zip_url = "https://xd.saul.pw/xd-clues.zip"
     clues_path = data_dir / "clues.tsv"
     clues_zip_internal_path = "xd/clues.tsv"
+    # Kept between runs with --stream-clues, in place of the extracted clues.tsv
+    clues_zip_download_path = data_dir / "xd-clues.zip"
     
     crossword_clues_file = data_dir / "crossword_clues.json"
     
@@ -83,19 +134,33 @@ def main():
     print()
     
     # Download word list
-    if wordlist_path.exists():
+    if wordlist_path.exists() and not args.refresh:
         print(f"✓ {wordlist_path.name} already exists, skipping download")
         success1 = True
     else:
-        success1 = download_file(wordlist_url, wordlist_path)
+        with stages.stage('download_wordlist'):
+            success1 = download_file(wordlist_url, wordlist_path)
     print()
     
     # Download and extract clues
-    if clues_path.exists():
+    clues_zip_path = None
+    clues_zip_is_temporary = False
+    if clues_path.exists() and not args.refresh:
         print(f"✓ {clues_path.name} already exists, skipping download")
         success2 = True
+    elif args.stream_clues:
+        # Keep the zip file and stream the clues out of it while formatting
+        if clues_zip_download_path.exists() and not args.refresh and resolve_local_path(args.clues_source) is None:
+            print(f"✓ {clues_zip_download_path.name} already exists, skipping download")
+            fetched = clues_zip_download_path, True
+        else:
+            with stages.stage('download_clues'):
+                fetched = fetch_zip(args.clues_source, clues_zip_download_path)
+        success2 = fetched is not None
+        if success2:
+            clues_zip_path, clues_zip_is_temporary = fetched
     else:
-        success2 = download_and_extract_zip(clues_zip_url, clues_path, clues_zip_internal_path)
+        success2 = download_and_extract_zip(args.clues_source, clues_path, clues_zip_internal_path, stages=stages)
     print()
     
     # Summary
@@ -110,14 +175,28 @@ def main():
         print("=" * 60)
         print()
         
-        format_crossword_clues_dictionary(
-            str(wordlist_path), 
-            str(clues_path), 
-            str(crossword_clues_file)
-        )
+        with stages.stage('format_clues'):
+            if clues_zip_path is not None:
+                print(f"Streaming {clues_zip_internal_path} from {clues_zip_path}")
+                format_crossword_clues_dictionary(
+                    str(wordlist_path),
+                    str(clues_zip_path),
+                    str(crossword_clues_file),
+                    clues_member=clues_zip_internal_path,
+                    force=args.force,
+                    stages=stages
+                )
+            else:
+                format_crossword_clues_dictionary(
+                    str(wordlist_path), 
+                    str(clues_path), 
+                    str(crossword_clues_file),
+                    force=args.force,
+                    stages=stages
+                )
         
-        # Clean up intermediate files if --no-cleanup is not specified
-        if not args.no_cleanup:
+        # Clean up intermediate files if --cleanup is specified
+        if args.cleanup:
             print()
             print("Cleaning up intermediate files...")
             if wordlist_path.exists():
@@ -126,16 +205,26 @@ def main():
             if clues_path.exists():
                 clues_path.unlink()
                 print(f"✓ Deleted {clues_path.name}")
+            if clues_zip_is_temporary and clues_zip_path.exists():
+                clues_zip_path.unlink()
+                print(f"✓ Deleted {clues_zip_path.name}")
         else:
             print()
-            print(f"Keeping intermediate files (--no-cleanup specified):")
+            print(f"Keeping intermediate files for the next run (--cleanup deletes them):")
             print(f"  Word list: {wordlist_path}")
-            print(f"  Clues:     {clues_path}")
+            print(f"  Clues:     {clues_zip_path if clues_zip_path is not None else clues_path}")
         
         print()
         print("=" * 60)
         print("✓ Crossword data initialization complete!")
         print(f"  Output: {crossword_clues_file}")
+        print(f"          {crossword_clues_file.with_suffix('.db')}")
+        print()
+        stages.stop()
+        stages.print_table()
+        if args.report:
+            stages.write_report(args.report, script='init.py', clues_source=args.clues_source, stream_clues=args.stream_clues, force=args.force)
+            print(f"✓ Appended stage report to {args.report}")
     else:
         print("✗ Some downloads failed. Please check the errors above.")
         sys.exit(1)
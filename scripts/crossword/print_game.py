@@ -7,6 +7,7 @@ import json
 import sys
 from pathlib import Path
 from generate_games import fill_puzzle_grid_with_answers
+from shape_library import load_shape_library
 
 
 def print_solved_puzzle(puzzle_grid):
@@ -39,7 +40,19 @@ def print_clues(clues):
         print()
 
 
-def main(game_file):
+def print_shape_info(puzzle_grid, shapes_file, shapes_cache_file=None):
+    """Print which crossword shape the game was generated from, if it's in the shapes file."""
+    if not Path(shapes_file).exists():
+        return
+    shape = load_shape_library(shapes_file, cache_file=shapes_cache_file).find_grid(puzzle_grid)
+    if shape is None:
+        print("Shape: not in the shapes file")
+        return
+    lengths = ', '.join(f"{count} of length {length}" for length, count in shape['length_histogram'].items())
+    print(f"Shape: {shape['name']} ({shape['symmetry']} symmetry, {len(shape['slot_graph']['slots'])} slots: {lengths})")
+
+
+def main(game_file, shapes_file=None, shapes_cache_file=None):
     """Load and print a crossword game file."""
     game_path = Path(game_file)
     
@@ -67,6 +80,8 @@ def main(game_file):
     
     print(f"\n{'='*60}")
     print(f"Crossword Game: {game_path.name}")
+    if shapes_file is not None:
+        print_shape_info(game['shape'], shapes_file, shapes_cache_file)
     print(f"{'='*60}")
     
     # Fill and print the solved puzzle
@@ -97,5 +112,6 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Pretty print a crossword game file.")
     parser.add_argument("game_file", type=str, help="Path to the game JSON file")
     args = parser.parse_args()
-    
-    main(args.game_file)
+
+    data_directory = Path(__file__).parent / "data"
+    main(args.game_file, shapes_file=data_directory / "crossword_shapes.json", shapes_cache_file=data_directory / "crossword_shapes.cache")
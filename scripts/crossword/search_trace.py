@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Structured trace of the crossword search.
+Records placements, backtracks and candidate counts at each search depth, along with spans timing
+the search steps (pick_random_valid_word, calculate_word_heuristic, fill_puzzle_grid_with_answers, ...).
+The trace is written either as JSON lines or in the Chrome trace event format, which loads into
+chrome://tracing, Perfetto or speedscope as a flamegraph. Worker processes write their own trace files,
+which merge_trace_files combines into one trace with the workers' events lined up in time.
+Tracing is opt-in: the search only checks `if trace:` when no trace is given.
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+TRACE_FORMATS = ['jsonl', 'chrome']
+
+
+def worker_trace_file(trace_file, pid):
+    """Trace file of a worker process, e.g. trace.jsonl -> trace.1234.jsonl, so workers don't interleave events."""
+    trace_path = Path(trace_file)
+    return trace_path.with_name(f"{trace_path.stem}.{pid}{trace_path.suffix}")
+
+
+def find_worker_trace_files(trace_file):
+    """The worker trace files written next to trace_file, see worker_trace_file."""
+    trace_path = Path(trace_file)
+    prefix, suffix = f"{trace_path.stem}.", trace_path.suffix
+    return sorted(
+        path for path in trace_path.parent.glob(f"{prefix}*{suffix}")
+        if path.name[len(prefix):len(path.name) - len(suffix)].isdigit()
+    )
+
+
+def read_trace_events(trace_file, trace_format='jsonl'):
+    text = Path(trace_file).read_text(encoding='utf-8')
+    if trace_format == 'chrome':
+        # Terminated workers don't write the closing bracket
+        return json.loads('[' + text.strip().lstrip('[').rstrip(']') + ']')
+    return [json.loads(line) for line in text.splitlines() if line]
+
+
+def merge_trace_files(trace_file, worker_files, trace_format='jsonl'):
+    """
+    Merges worker trace files into trace_file, sorted by time, and removes them.
+    Each worker's timestamps are shifted by when its trace started, so they count from the first worker's start.
+    JSON lines events get the worker's process id, which Chrome trace events already have.
+    Returns the number of events.
+    """
+    workers = []
+    for worker_file in worker_files:
+        events = read_trace_events(worker_file, trace_format)
+        start = next((event for event in events if event.get('name', event.get('event')) == 'trace_start'), None)
+        if start is not None:
+            workers.append((start.get('args', start), events))
+
+    origin = min((start['unix_time'] for start, _ in workers), default=0)
+    merged = []
+    for start, events in workers:
+        offset = (start['unix_time'] - origin) * 1_000_000
+        for event in events:
+            event['ts'] = round(event['ts'] + offset, 1)
+            if trace_format == 'jsonl':
+                event.setdefault('pid', start['pid'])
+        merged.extend(events)
+    merged.sort(key=lambda event: event['ts'])
+
+    with open(trace_file, 'w', encoding='utf-8') as f:
+        if trace_format == 'chrome':
+            f.write('[\n' + ',\n'.join(json.dumps(event, default=str) for event in merged) + '\n]\n')
+        else:
+            f.writelines(json.dumps(event, default=str) + '\n' for event in merged)
+    for worker_file in worker_files:
+        Path(worker_file).unlink()
+    return len(merged)
+
+
+class SearchTrace:
+    """
+    Writes trace events to a file. Timestamps are microseconds since the trace was opened.
+    instant(): a point event, e.g. a placement or a backtrack
+    span(): a timed step, started from clock()
+    """
+
+    def __init__(self, trace_file, trace_format='jsonl'):
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format '{trace_format}', expected one of {', '.join(TRACE_FORMATS)}")
+        self.trace_format = trace_format
+        self.pid = os.getpid()
+        self.start = time.perf_counter()
+        self.file = open(trace_file, 'w', encoding='utf-8')
+        self.events = 0
+        if trace_format == 'chrome':
+            # Chrome accepts a trace without the closing bracket, so a worker that is killed still leaves a readable file
+            self.file.write('[\n')
+        # Lines up the traces of different processes when they are merged
+        self.instant('trace_start', pid=self.pid, unix_time=time.time())
+
+    def clock(self):
+        return (time.perf_counter() - self.start) * 1_000_000
+
+    def write(self, event):
+        if self.events and self.trace_format == 'chrome':
+            self.file.write(',\n')
+        self.file.write(json.dumps(event, default=str))
+        if self.trace_format == 'jsonl':
+            self.file.write('\n')
+        self.events += 1
+
+    def instant(self, name, **args):
+        timestamp = round(self.clock(), 1)
+        if self.trace_format == 'chrome':
+            self.write({'name': name, 'ph': 'i', 's': 't', 'ts': timestamp, 'pid': self.pid, 'tid': 0, 'args': args})
+        else:
+            self.write({'ts': timestamp, 'event': name, **args})
+
+    def span(self, name, start, **args):
+        """Records a step that started at start (from clock()) and ends now."""
+        duration = round(self.clock() - start, 1)
+        if self.trace_format == 'chrome':
+            self.write({'name': name, 'ph': 'X', 'ts': round(start, 1), 'dur': duration, 'pid': self.pid, 'tid': 0, 'args': args})
+        else:
+            self.write({'ts': round(start, 1), 'event': name, 'dur': duration, **args})
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.trace_format == 'chrome':
+            self.file.write('\n]\n')
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Compiled crossword shapes.
+Every shape in crossword_shapes.json is compiled once into its word slots, cell map, slot graph,
+slot length histogram and symmetry class. The compiled library is saved to a cache file keyed by
+a hash of the shapes file, so later runs load it without parsing and scanning the grids again.
+"""
+import hashlib
+import json
+import os
+import pickle
+import random
+import sys
+from pathlib import Path
+
+SHAPE_CACHE_VERSION = 1
+
+
+def get_slot_cells(slot):
+    """Get list of (row, col) cells that a slot occupies."""
+    cells = []
+    for i in range(slot['length']):
+        if slot['direction'] == 'across':
+            cells.append((slot['row'], slot['col'] + i))
+        else:
+            cells.append((slot['row'] + i, slot['col']))
+    return cells
+
+
+def find_crossword_word_slots(crossword_shape, verbose=False):
+    slots = []
+    grid = crossword_shape['grid']
+    rows = len(grid)
+    cols = len(grid[0])
+
+    # Find horizontal slots
+    for r in range(rows):
+        c = 0
+        while c < cols:
+            if grid[r][c] == 1:
+                start_c = c
+                while c < cols and grid[r][c] == 1:
+                    c += 1
+                length = c - start_c
+                if length > 1:
+                    slots.append({'row': r, 'col': start_c, 'length': length, 'direction': 'across'})
+            else:
+                c += 1
+
+    # Find vertical slots
+    for c in range(cols):
+        r = 0
+        while r < rows:
+            if grid[r][c] == 1:
+                start_r = r
+                while r < rows and grid[r][c] == 1:
+                    r += 1
+                length = r - start_r
+                if length > 1:
+                    slots.append({'row': start_r, 'col': c, 'length': length, 'direction': 'down'})
+            else:
+                r += 1
+
+    for slot_id, slot in enumerate(slots):
+        slot['id'] = slot_id
+
+    if verbose:
+        print_word_slots(slots)
+    return slots
+
+
+def print_word_slots(slots):
+    print(f"Found {len(slots)} clues to fill in the crossword shape.")
+    for slot in slots:
+        print(f"  - {slot['direction'].capitalize()} slot at (row={slot['row']}, col={slot['col']}) length={slot['length']}")
+
+
+def build_slot_graph(slots):
+    """
+    Compiles the word slots of a shape into the graph used by the search. Built once per shape.
+    ["slots"]: the word slots, slot['id'] is the position in the lists below
+    ["cells"]: list of (row, col) cells for each slot
+    ["neighbors"]: list of (neighbor id, index in this slot, index in neighbor) crossings for each slot
+    ["cell_map"]: {(row, col): [(slot id, index in slot)]} for every white cell in a slot
+    """
+    cells = [get_slot_cells(slot) for slot in slots]
+
+    cell_map = {}
+    for slot_id, slot_cells in enumerate(cells):
+        for idx, cell in enumerate(slot_cells):
+            cell_map.setdefault(cell, []).append((slot_id, idx))
+
+    neighbors = [[] for _ in slots]
+    for owners in cell_map.values():
+        for slot_id, idx in owners:
+            for other_id, other_idx in owners:
+                if other_id != slot_id:
+                    neighbors[slot_id].append((other_id, idx, other_idx))
+
+    return {
+        'slots': slots,
+        'cells': cells,
+        'neighbors': neighbors,
+        'cell_map': cell_map,
+    }
+
+
+def find_symmetries(grid):
+    """Lists the symmetries of a grid's black and white cells."""
+    rows, cols = len(grid), len(grid[0])
+    transforms = {
+        'rotational_180': lambda r, c: (rows - 1 - r, cols - 1 - c),
+        'mirror_left_right': lambda r, c: (r, cols - 1 - c),
+        'mirror_top_bottom': lambda r, c: (rows - 1 - r, c),
+    }
+    if rows == cols:
+        transforms['rotational_90'] = lambda r, c: (c, cols - 1 - r)
+        transforms['diagonal'] = lambda r, c: (c, r)
+        transforms['anti_diagonal'] = lambda r, c: (cols - 1 - c, rows - 1 - r)
+
+    symmetries = []
+    for name, transform in transforms.items():
+        if all(grid[r][c] == grid[tr][tc] for r in range(rows) for c in range(cols) for tr, tc in [transform(r, c)]):
+            symmetries.append(name)
+    return sorted(symmetries)
+
+
+def classify_symmetry(symmetries):
+    """The strongest symmetry class of a grid, as used by crossword constructors."""
+    if 'rotational_90' in symmetries:
+        return 'rotational_90'
+    if 'rotational_180' in symmetries:
+        return 'rotational'
+    if 'mirror_left_right' in symmetries or 'mirror_top_bottom' in symmetries:
+        return 'mirror'
+    if 'diagonal' in symmetries or 'anti_diagonal' in symmetries:
+        return 'diagonal'
+    return 'none'
+
+
+def compile_shape(shape):
+    """
+    Compiles a shape from the shapes file.
+    ["name"], ["grid"]: as in the shapes file
+    ["slot_graph"]: the slots, cells, crossings and cell map from build_slot_graph
+    ["length_histogram"]: {slot length: number of slots}
+    ["symmetries"], ["symmetry"]: the grid's symmetries and its symmetry class
+    """
+    slot_graph = build_slot_graph(find_crossword_word_slots(shape))
+    length_histogram = {}
+    for slot in slot_graph['slots']:
+        length_histogram[slot['length']] = length_histogram.get(slot['length'], 0) + 1
+    symmetries = find_symmetries(shape['grid'])
+
+    return {
+        'name': shape['name'],
+        'grid': shape['grid'],
+        'slot_graph': slot_graph,
+        'length_histogram': dict(sorted(length_histogram.items())),
+        'symmetries': symmetries,
+        'symmetry': classify_symmetry(symmetries),
+    }
+
+
+def grid_key(grid):
+    return '/'.join(''.join(str(cell) for cell in row) for row in grid)
+
+
+class ShapeLibrary:
+    """Compiled shapes, looked up by name or by grid."""
+
+    def __init__(self, shapes):
+        self.shapes = shapes
+        self.by_name = {}
+        self.by_grid = {}
+        for shape in shapes:
+            self.by_name.setdefault(shape['name'], shape)
+            self.by_grid.setdefault(grid_key(shape['grid']), shape)
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def get(self, name, default=None):
+        return self.by_name.get(name, default)
+
+    def find_grid(self, grid):
+        """The compiled shape with the same black and white cells as the grid, or None."""
+        return self.by_grid.get(grid_key(grid))
+
+    def random_shape(self):
+        return random.choice(self.shapes)
+
+
+def compute_shapes_key(shapes_file):
+    digest = hashlib.sha256()
+    with open(shapes_file, 'rb') as f:
+        digest.update(f.read())
+    digest.update(f"shape cache version {SHAPE_CACHE_VERSION}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_shape_library_cache(cache_file, cache_key):
+    """Loads the compiled library from the cache file. Returns None if it is missing, stale or corrupt."""
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['key'] != cache_key:
+            return None
+        return cached['library']
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, KeyError, TypeError, ValueError):
+        return None
+
+
+def save_shape_library_cache(library, cache_file, cache_key):
+    """Writes the compiled library to the cache file. The file is replaced atomically."""
+    cache_path = Path(cache_file)
+    temp_path = cache_path.with_name(cache_path.name + '.tmp')
+    with open(temp_path, 'wb') as f:
+        pickle.dump({'key': cache_key, 'library': library}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, cache_path)
+
+
+def load_shape_library(shapes_file, cache_file=None, verbose=False):
+    """
+    Loads the compiled shapes from the cache file when it matches the shapes file,
+    otherwise compiles every shape and refreshes the cache.
+    """
+    cache_key = None
+    if cache_file is not None:
+        cache_key = compute_shapes_key(shapes_file)
+        library = load_shape_library_cache(cache_file, cache_key)
+        if library is not None:
+            if verbose:
+                print(f"Loaded {len(library)} compiled crossword shapes from {cache_file}")
+            return library
+
+    with open(shapes_file, 'r', encoding='utf-8') as f:
+        shapes = json.load(f)
+    library = ShapeLibrary([compile_shape(shape) for shape in shapes])
+    if verbose:
+        print(f"Compiled {len(library)} crossword shapes from {shapes_file}")
+
+    if cache_file is not None:
+        try:
+            save_shape_library_cache(library, cache_file, cache_key)
+        except OSError as e:
+            print(f"✗ Failed to write shape cache {cache_file}: {e}", file=sys.stderr)
+    return library
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Wall time and peak memory of the stages of a pipeline.
+Stages can be nested, e.g. the parse and write steps inside the format stage of init.py.
+Peak RSS is the process high-water mark when a stage ends, so it only grows from stage to stage;
+rss_growth_kb shows which stage raised it. Worker processes are reported separately as the
+largest peak RSS of any finished child process. tracemalloc gives the peak Python allocations
+within each stage, but slows the pipeline down, so it is opt-in.
+"""
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_kb(who=None):
+    """Peak resident set size of this process (or of its largest child with who=resource.RUSAGE_CHILDREN) in KB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def peak_child_rss_kb():
+    return peak_rss_kb(resource.RUSAGE_CHILDREN) if resource is not None else None
+
+
+class StageTimer:
+    """
+    Records the wall time and memory of named stages:
+        stages = StageTimer()
+        with stages.stage('download'):
+            ...
+        stages.print_table()
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.open_stages = []
+        self.start_time = time.perf_counter()
+        self.started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        if self.trace_memory:
+            # Save the enclosing stage's peak before resetting it for this stage
+            if self.open_stages:
+                parent = self.open_stages[-1]
+                parent['traced_peak'] = max(parent['traced_peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        record = {'stage': name, 'depth': len(self.open_stages)}
+        self.stages.append(record)
+        current = {'record': record, 'traced_peak': 0}
+        self.open_stages.append(current)
+        rss_before = peak_rss_kb()
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            record['failed'] = True
+            raise
+        finally:
+            record['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            record['peak_rss_kb'] = peak_rss_kb()
+            record['rss_growth_kb'] = record['peak_rss_kb'] - rss_before if rss_before is not None else None
+            record['peak_child_rss_kb'] = peak_child_rss_kb()
+            self.open_stages.pop()
+            if self.trace_memory:
+                traced_peak = max(current['traced_peak'], tracemalloc.get_traced_memory()[1])
+                record['peak_traced_kb'] = traced_peak // 1024
+                if self.open_stages:
+                    parent = self.open_stages[-1]
+                    parent['traced_peak'] = max(parent['traced_peak'], traced_peak)
+                tracemalloc.reset_peak()
+
+    def total_ms(self):
+        return round((time.perf_counter() - self.start_time) * 1000, 1)
+
+    def stop(self):
+        """Stops tracemalloc if this timer started it."""
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def print_table(self):
+        print(f"{'stage':<32} {'ms':>10} {'peak rss kb':>12} {'rss +kb':>9} {'child rss kb':>13}" + (f" {'traced kb':>10}" if self.trace_memory else ''))
+        for record in self.stages:
+            name = '  ' * record['depth'] + record['stage'] + (' ✗' if record.get('failed') else '')
+            line = (f"{name:<32} {record['elapsed_ms']:>10.1f} {record['peak_rss_kb'] or '-':>12} "
+                    f"{record['rss_growth_kb'] if record['rss_growth_kb'] is not None else '-':>9} {record['peak_child_rss_kb'] or '-':>13}")
+            if self.trace_memory:
+                line += f" {record.get('peak_traced_kb', '-'):>10}"
+            print(line)
+        print(f"{'total':<32} {self.total_ms():>10.1f} {peak_rss_kb() or '-':>12}")
+
+    def report(self, **details):
+        return {
+            'timestamp': datetime.now().isoformat(),
+            **details,
+            'total_ms': self.total_ms(),
+            'peak_rss_kb': peak_rss_kb(),
+            'peak_child_rss_kb': peak_child_rss_kb(),
+            'stages': self.stages,
+        }
+
+    def write_report(self, report_file, **details):
+        """Appends the stages as one JSON line to report_file, so runs can be compared over time."""
+        with open(report_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.report(**details)) + '\n')
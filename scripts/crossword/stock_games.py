@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Keeps a stock of unjudged crossword games, so judging never waits on generation.
+Counts the unjudged .new.json games in the game directory by shape and estimated difficulty,
+then generates games only for the shapes short of the target, stopping as soon as every target is met.
+
+Judging decides the real difficulty, so unjudged games are estimated from their clues. A judged game is HARD
+when some answer has no easy clue, and those answers are nearly always names (OTERI, DYAN, CAREW) whose clues
+all refer to someone by name. An answer counts as a name if at least NAME_CLUE_SHARE of its clues capitalize a
+word after the first one, and a game with more than --max-name-answers of them is estimated HARD.
+On the judged games this agrees with the judged difficulty for 18 of 25 games.
+Games for a bucket that is already full are dropped rather than overfilling the stock.
+
+Usage:
+  python3 stock_games.py --target 2                 # two EASY and two HARD games for every shape
+  python3 stock_games.py --target 3 -s 7x7_wheel -j 4
+  python3 stock_games.py --dry-run                  # only show the stock and the deficits
+"""
+import argparse
+import json
+import multiprocessing
+import queue
+import random
+import re
+import sys
+from pathlib import Path
+from generate_games import (
+    DEFAULT_FRESH_GAMES, DEFAULT_GAMES_DIR, DEFAULT_SCORING_ENGINE, RESTART_POLICIES, SCORING_ENGINES, SLOT_ORDERS, SOLVER_ENGINES, _worker_context,
+    build_word_index, exclude_recent_answers, init_generation_worker, load_clues_index, report_generated_game, run_generation_worker,
+)
+from shape_library import load_shape_library
+from word_index import DEFAULT_COUNT_CACHE_SIZE
+
+DIFFICULTIES = ['EASY', 'HARD']
+NAME_CLUE_SHARE = 0.8
+DEFAULT_MAX_NAME_ANSWERS = 1
+DEFAULT_TARGET = 2
+DEFAULT_TIMEOUT_MS = 30_000
+# Attempts per missing game before a shape is given up on, e.g. when it never yields an EASY game
+DEFAULT_ATTEMPTS_PER_GAME = 4
+
+
+def is_name_answer(clues):
+    """Whether the clues mostly refer to a name, e.g. 'Comic Fields' or 'SNL alum Kevin'."""
+    if not clues:
+        return False
+    naming = sum(1 for clue in clues if any(word[0].isupper() for word in re.findall(r"[A-Za-z][\w'.-]*", clue)[1:]))
+    return naming >= NAME_CLUE_SHARE * len(clues)
+
+
+def estimate_difficulty(game, max_name_answers=DEFAULT_MAX_NAME_ANSWERS):
+    """Estimated difficulty of an unjudged game: HARD if more than max_name_answers answers are names."""
+    name_answers = sum(1 for entry in game['clues'] if is_name_answer(entry.get('clues', []) + entry.get('hardClues', [])))
+    return 'HARD' if name_answers > max_name_answers else 'EASY'
+
+
+def is_unjudged(game_file):
+    """A game_N.new.json file is unjudged until judge_commit.py writes game_N.json."""
+    return not game_file.with_name(game_file.name.replace('.new.json', '.json')).exists()
+
+
+def count_unjudged_games(output_dir, shapes, max_name_answers=DEFAULT_MAX_NAME_ANSWERS):
+    """Counts the unjudged games by (shape name, estimated difficulty). Games of unknown shapes are counted under None."""
+    stock = {}
+    for game_file in sorted(Path(output_dir).glob('game_*.new.json')):
+        if not is_unjudged(game_file):
+            continue
+        try:
+            with open(game_file, 'r', encoding='utf-8') as f:
+                game = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"✗ Skipping unreadable game file {game_file.name}: {e}", file=sys.stderr)
+            continue
+        shape = shapes.find_grid(game['shape'])
+        key = (shape['name'] if shape else None, estimate_difficulty(game, max_name_answers))
+        stock[key] = stock.get(key, 0) + 1
+    return stock
+
+
+def find_deficits(stock, shape_names, difficulties, target):
+    """Number of games missing from each (shape name, difficulty) bucket."""
+    return {
+        (shape_name, difficulty): max(0, target - stock.get((shape_name, difficulty), 0))
+        for shape_name in shape_names
+        for difficulty in difficulties
+    }
+
+
+def print_stock(stock, deficits):
+    print(f"{'shape':<28} {'difficulty':<10} {'stock':>6} {'missing':>8}")
+    for (shape_name, difficulty), missing in deficits.items():
+        print(f"{shape_name:<28} {difficulty:<10} {stock.get((shape_name, difficulty), 0):>6} {missing:>8}")
+    unknown = sum(count for (shape_name, _), count in stock.items() if shape_name is None)
+    if unknown:
+        print(f"  + {unknown} unjudged games of shapes that aren't in the shapes file")
+
+
+def refill_stock(deficits, output_dir, jobs, generation_options, attempts_per_game=DEFAULT_ATTEMPTS_PER_GAME, max_name_answers=DEFAULT_MAX_NAME_ANSWERS,
+                 excluded_answers=None, pool=None, verbose=False):
+    """
+    Generates games until every deficit is filled or the shapes run out of attempts.
+    At most jobs games are generated at a time, always for the shape missing the most games that
+    isn't already being generated. Once every deficit is filled, the games still being generated are
+    left to the caller to cancel. Returns the number of games written.
+    """
+    deficits = dict(deficits)
+    shape_deficits = {}
+    for (shape_name, _), missing in deficits.items():
+        shape_deficits[shape_name] = shape_deficits.get(shape_name, 0) + missing
+    attempts_left = {shape_name: missing * attempts_per_game for shape_name, missing in shape_deficits.items() if missing}
+    in_flight = {}
+    results = queue.Queue()
+    game_number = 0
+    written = 0
+
+    def missing_games(shape_name):
+        return sum(missing for (name, _), missing in deficits.items() if name == shape_name)
+
+    def next_shape():
+        candidates = [
+            (missing_games(shape_name) - in_flight.get(shape_name, 0), shape_name)
+            for shape_name, attempts in attempts_left.items()
+            if attempts > 0
+        ]
+        candidates = [(missing, shape_name) for missing, shape_name in candidates if missing > 0]
+        return max(candidates)[1] if candidates else None
+
+    while True:
+        while sum(in_flight.values()) < jobs:
+            shape_name = next_shape()
+            if shape_name is None:
+                break
+            game_number += 1
+            attempts_left[shape_name] -= 1
+            in_flight[shape_name] = in_flight.get(shape_name, 0) + 1
+            task = (game_number, random.randrange(1 << 32), shape_name, generation_options, excluded_answers, verbose)
+            if pool is None:
+                results.put(run_generation_worker(task))
+            else:
+                pool.apply_async(run_generation_worker, (task,), callback=results.put, error_callback=results.put)
+
+        if not sum(in_flight.values()) or not any(missing > 0 for missing in deficits.values()):
+            break
+
+        result = results.get()
+        if isinstance(result, BaseException):
+            raise result
+        shape_name = result['metrics']['shape']
+        in_flight[shape_name] -= 1
+        if not result['game']:
+            print(f"✗ Failed to generate a {shape_name} game ({result['elapsed_ms']}ms)", file=sys.stderr)
+            continue
+
+        key = (shape_name, estimate_difficulty(result['game'], max_name_answers))
+        if deficits.get(key, 0) <= 0:
+            print(f"  Dropped a {key[1]} {shape_name} game, that stock is already full ({result['elapsed_ms']}ms)")
+            continue
+        deficits[key] -= 1
+        report_generated_game(result['game'], output_dir, result['elapsed_ms'])
+        written += 1
+
+    for shape_name, attempts in attempts_left.items():
+        if attempts <= 0 and missing_games(shape_name):
+            print(f"✗ Gave up on {shape_name} with {missing_games(shape_name)} games still missing", file=sys.stderr)
+    return written
+
+
+def main():
+    script_dir = Path(__file__).parent
+    data_directory = script_dir / "data"
+
+    parser = argparse.ArgumentParser(description="Keep a stock of unjudged crossword games for every shape and difficulty.")
+    parser.add_argument("--target", type=int, default=DEFAULT_TARGET, help=f"Unjudged games to keep for every shape and difficulty (default: {DEFAULT_TARGET})")
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, action="append", help="Only stock this estimated difficulty, can be repeated (default: all)")
+    parser.add_argument("-s", "--shape", action="append", help="Only stock this shape, can be repeated (default: every shape)")
+    parser.add_argument("-o", "--output", type=str, help="Game directory (default: server/data/crossword)")
+    parser.add_argument("-j", "--jobs", type=int, default=max(1, multiprocessing.cpu_count() - 1), help="CPU budget: number of games generated at a time (default: CPU count - 1)")
+    parser.add_argument("-t", "--top", type=int, default=100, help="Number of top-scored words to randomly select from (default: 100)")
+    parser.add_argument("--solver", choices=SOLVER_ENGINES, default='random', help="Search engine used to fill the crossword (default: random)")
+    parser.add_argument("--order", choices=SLOT_ORDERS, help="Strategy for picking the next slot to fill")
+    parser.add_argument("--restarts", choices=RESTART_POLICIES, default='none', help="Restart schedule for abandoning long searches (default: none)")
+    parser.add_argument("--timeout-ms", type=int, default=DEFAULT_TIMEOUT_MS, help=f"Give up on a game after this many milliseconds (default: {DEFAULT_TIMEOUT_MS})")
+    parser.add_argument("--scoring", choices=SCORING_ENGINES, default=DEFAULT_SCORING_ENGINE, help=f"Engine scoring the candidate words (default: {DEFAULT_SCORING_ENGINE})")
+    parser.add_argument("--attempts-per-game", type=int, default=DEFAULT_ATTEMPTS_PER_GAME, help=f"Attempts per missing game before giving up on a shape (default: {DEFAULT_ATTEMPTS_PER_GAME})")
+    parser.add_argument("--max-name-answers", type=int, default=DEFAULT_MAX_NAME_ANSWERS, help=f"Estimate games with more name answers than this as HARD (default: {DEFAULT_MAX_NAME_ANSWERS})")
+    parser.add_argument("--fresh-games", type=int, default=DEFAULT_FRESH_GAMES, help=f"Don't reuse answers of the last N published games, 0 to allow them (default: {DEFAULT_FRESH_GAMES})")
+    parser.add_argument("--fresh-days", type=int, help="Only avoid answers of games published in the last N days")
+    parser.add_argument("--games-dir", type=str, default=str(DEFAULT_GAMES_DIR), help="Directory of the published games whose answers aren't reused (default: server/data/crossword)")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the stock and what is missing")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose logging")
+    args = parser.parse_args()
+
+    clues_file = data_directory / "crossword_clues.db"
+    if not clues_file.exists():
+        clues_file = data_directory / "crossword_clues.json"
+    shapes_file = data_directory / "crossword_shapes.json"
+    index_cache_file = data_directory / "crossword_clues.index"
+    shapes_cache_file = data_directory / "crossword_shapes.cache"
+    output_dir = args.output if args.output else script_dir / ".." / ".." / "server" / "data" / "crossword"
+
+    shapes = load_shape_library(shapes_file, cache_file=shapes_cache_file)
+    shape_names = args.shape or [shape['name'] for shape in shapes.shapes]
+    unknown_shapes = [shape_name for shape_name in shape_names if shapes.get(shape_name) is None]
+    if unknown_shapes:
+        print(f"✗ No crossword shapes found named {', '.join(unknown_shapes)}", file=sys.stderr)
+        sys.exit(2)
+
+    stock = count_unjudged_games(output_dir, shapes, args.max_name_answers)
+    deficits = find_deficits(stock, shape_names, args.difficulty or DIFFICULTIES, args.target)
+    print_stock(stock, deficits)
+    missing = sum(deficits.values())
+    if not missing:
+        print("✓ The stock is full, nothing to generate")
+        return
+    if args.dry_run:
+        return
+
+    print(f"\nGenerating {missing} missing games with up to {args.jobs} at a time...")
+    clues_index = load_clues_index(clues_file)
+    word_index = build_word_index(clues_index.keys(), cache_file=index_cache_file, source_file=clues_file)
+    excluded_answers = exclude_recent_answers(word_index, args.games_dir, fresh_games=args.fresh_games, fresh_days=args.fresh_days)
+    _worker_context.update(clues_index=clues_index, word_index=word_index, shapes=shapes, excluded_answers=excluded_answers)
+    generation_options = {
+        'top_n': args.top,
+        'solver': args.solver,
+        'order': args.order,
+        'restarts': args.restarts,
+        'timeout_ms': args.timeout_ms,
+        'scoring': args.scoring,
+    }
+
+    if args.jobs > 1:
+        pool = multiprocessing.Pool(args.jobs, initializer=init_generation_worker,
+                                    initargs=(clues_file, index_cache_file, shapes_file, shapes_cache_file, DEFAULT_COUNT_CACHE_SIZE))
+        try:
+            written = refill_stock(deficits, output_dir, args.jobs, generation_options, attempts_per_game=args.attempts_per_game, max_name_answers=args.max_name_answers,
+                                   excluded_answers=excluded_answers, pool=pool, verbose=args.verbose)
+        finally:
+            # Searches still running once the targets are met are cancelled
+            pool.terminate()
+            pool.join()
+    else:
+        written = refill_stock(deficits, output_dir, 1, generation_options, attempts_per_game=args.attempts_per_game, max_name_answers=args.max_name_answers,
+                               excluded_answers=excluded_answers, verbose=args.verbose)
+
+    print(f"\n✓ Added {written} of {missing} missing games to the stock")
+
+
+if __name__ == "__main__":
+    main()
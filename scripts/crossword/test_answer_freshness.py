@@ -0,0 +1,72 @@
+import json
+from datetime import datetime
+
+from answer_freshness import RECENT_ANSWERS_FILE, format_log_line, load_recent_answers, read_recent_answers_log
+
+NOW = datetime(2026, 10, 1)
+
+
+def write_game(games_dir, name, timestamp, answers, difficulty='EASY'):
+    game = {'timestamp': timestamp, 'difficulty': difficulty, 'clues': [{'answer': answer} for answer in answers]}
+    (games_dir / name).write_text(json.dumps(game), encoding='utf-8')
+
+
+def test_recent_answers_come_from_the_latest_published_games(tmp_path):
+    (tmp_path / "_archive").mkdir()
+    write_game(tmp_path / "_archive", "game_1.json", "2026-08-01T10:00:00", ['OLD'])
+    write_game(tmp_path, "game_2.json", "2026-09-20T10:00:00", ['CAT', 'DOG'])
+    write_game(tmp_path, "game_3.json", "2026-09-25T10:00:00", ['EMU'], difficulty='REJECT')
+    write_game(tmp_path, "game_4.json", "2026-09-30T10:00:00", ['COW'])
+    write_game(tmp_path, "game_5.new.json", "2026-09-30T11:00:00", ['NEW'])
+
+    assert load_recent_answers(tmp_path, now=NOW) == {'OLD', 'CAT', 'DOG', 'COW'}
+    assert load_recent_answers(tmp_path, max_games=2, now=NOW) == {'CAT', 'DOG', 'COW'}
+    assert load_recent_answers(tmp_path, max_age_days=5, now=NOW) == {'COW'}
+    assert load_recent_answers(tmp_path, max_games=0, now=NOW) == set()
+
+
+def test_log_only_reads_new_games(tmp_path):
+    write_game(tmp_path, "game_1.json", "2026-09-20T10:00:00", ['CAT'])
+    load_recent_answers(tmp_path)
+    log_file = tmp_path / RECENT_ANSWERS_FILE
+    assert list(read_recent_answers_log(log_file)) == [('game_1.json', '2026-09-20T10:00:00')]
+
+    # Logged games aren't read again, even after they are archived or changed
+    (tmp_path / "_archive").mkdir()
+    (tmp_path / "game_1.json").rename(tmp_path / "_archive" / "game_1.json")
+    write_game(tmp_path / "_archive", "game_1.json", "2026-09-20T10:00:00", ['DOG'])
+    write_game(tmp_path, "game_2.json", "2026-09-21T10:00:00", ['EMU'])
+    assert load_recent_answers(tmp_path) == {'CAT', 'EMU'}
+    assert len(log_file.read_text(encoding='utf-8').splitlines()) == 2
+
+
+def archive_and_reuse_game_8(games_dir):
+    """Archives game_8.json and commits a new game under the number get_next_available_file hands out again."""
+    (games_dir / "_archive").mkdir()
+    write_game(games_dir / "_archive", "game_8.json", "2026-09-20T10:00:00", ['CAT', 'DOG'])
+    load_recent_answers(games_dir)
+    write_game(games_dir, "game_8.json", "2026-09-28T10:00:00", ['EMU'])
+
+
+def test_reused_game_name_is_logged_as_a_new_game(tmp_path):
+    archive_and_reuse_game_8(tmp_path)
+
+    assert load_recent_answers(tmp_path) == {'CAT', 'DOG', 'EMU'}
+    assert load_recent_answers(tmp_path, max_games=1) == {'EMU'}
+    assert len((tmp_path / RECENT_ANSWERS_FILE).read_text(encoding='utf-8').splitlines()) == 2
+
+
+def test_reused_game_name_logged_by_judge_commit_keeps_both_games(tmp_path):
+    archive_and_reuse_game_8(tmp_path)
+    # judge_commit.py logs the new game as it commits it
+    log_file = tmp_path / RECENT_ANSWERS_FILE
+    with open(log_file, 'a', encoding='utf-8') as f:
+        f.write(format_log_line("2026-09-28T10:00:00", "game_8.json", "EASY", ['EMU']))
+
+    assert load_recent_answers(tmp_path) == {'CAT', 'DOG', 'EMU'}
+    assert len(log_file.read_text(encoding='utf-8').splitlines()) == 2
+
+
+def test_missing_games_dir_has_no_recent_answers(tmp_path):
+    assert load_recent_answers(tmp_path / "missing") == set()
+    assert not (tmp_path / "missing").exists()
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from clue_store import ClueStore, write_clue_store
+from generate_games import load_clues_index
+
+CLUES = {
+    'CAT': {'score': 60, 'clues': ['Feline', 'Tom, for one', 'Feline']},
+    'DOG': {'score': 55, 'clues': ['Canine']},
+    'EMU': {'score': 50, 'clues': ['Flightless bird', 'Outback runner']},
+}
+
+
+@pytest.fixture
+def store_file(tmp_path):
+    store_file = tmp_path / "clues.db"
+    write_clue_store(CLUES, store_file)
+    return store_file
+
+
+def test_store_answers_like_the_clues_dictionary(store_file):
+    store = ClueStore(store_file)
+    try:
+        assert sorted(store.keys()) == sorted(CLUES)
+        assert len(store) == len(CLUES)
+        for answer, entry in CLUES.items():
+            assert answer in store
+            # Clues come back in their original order, duplicates included
+            assert store.get(answer) == entry
+        assert 'COW' not in store
+        assert store.get('COW') is None
+        assert store.get('COW', {}) == {}
+    finally:
+        store.close()
+
+
+def test_store_is_replaced_atomically(store_file):
+    write_clue_store({'COW': {'score': 70, 'clues': ['Bovine']}}, store_file)
+    assert not store_file.with_name(store_file.name + '.tmp').exists()
+
+    store = ClueStore(store_file)
+    try:
+        assert store.keys() == ['COW']
+    finally:
+        store.close()
+
+
+def test_missing_store_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ClueStore(tmp_path / "missing.db")
+
+
+def test_load_clues_index_picks_the_store_by_extension(tmp_path, store_file):
+    json_file = tmp_path / "clues.json"
+    json_file.write_text(json.dumps(CLUES), encoding='utf-8')
+
+    assert load_clues_index(json_file) == CLUES
+    store = load_clues_index(store_file)
+    try:
+        assert isinstance(store, ClueStore)
+        assert store.get('EMU') == CLUES['EMU']
+    finally:
+        store.close()
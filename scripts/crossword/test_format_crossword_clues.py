@@ -0,0 +1,140 @@
+import random
+import zipfile
+
+import pytest
+
+from clue_store import ClueStore
+from format_crossword_clues import format_crossword_clues_dictionary
+from stage_timer import StageTimer
+
+PARAMETERS = {'min_length': 3, 'max_length': 6, 'min_year': 2005, 'max_year': 2022, 'min_score': 50}
+ANSWERS = [''.join(random.Random(i).choices('ABCDEIOST', k=3 + i % 5)) for i in range(150)] + ['R2D2', 'C3PO', 'AB', 'TOOLONGWORD']
+
+
+def write_clues_file(clues_file, seed=0, lines=3000):
+    """A clues.tsv with duplicate clues, invalid lines and lines ending in \\r\\n or a lone \\r."""
+    rng = random.Random(seed)
+    rows = ["pubid\tyear\tanswer\tclue\n"]
+    for i in range(lines):
+        if i % 97 == 0:
+            rows.append("not a clue line\n")
+            continue
+        answer = rng.choice(ANSWERS)
+        ending = rng.choice(["\n"] * 8 + ["\r\n", "\r"])
+        rows.append(f"nyt\t{rng.randint(2000, 2024)}\t{answer}\tClue {rng.randint(0, 40)} for {answer.lower()}{ending}")
+    clues_file.write_bytes(''.join(rows).encode('utf-8'))
+
+
+def write_wordlist(wordlist_file, seed=0):
+    """A word list with some answers missing, some below the score threshold and some listed twice."""
+    rng = random.Random(seed)
+    lines = []
+    for answer in ANSWERS:
+        if rng.random() < 0.1:
+            continue
+        lines.append(f"{answer};{rng.choice([25, 50, 60])}\n")
+        if rng.random() < 0.1:
+            lines.append(f"{answer};{rng.choice([25, 60])}\n")
+    lines.append("bad line\n")
+    wordlist_file.write_text(''.join(lines), encoding='utf-8')
+
+
+def format_clues(output_dir, wordlist_file, clues_file, **kwargs):
+    output_dir.mkdir(exist_ok=True)
+    output_file = output_dir / "crossword_clues.json"
+    format_crossword_clues_dictionary(wordlist_file, clues_file, output_file, parameters=dict(PARAMETERS), **kwargs)
+    return output_file
+
+
+def assert_same_output(output_file, expected_file):
+    assert output_file.read_bytes() == expected_file.read_bytes()
+    store, expected_store = ClueStore(output_file.with_suffix('.db')), ClueStore(expected_file.with_suffix('.db'))
+    try:
+        assert sorted(store.keys()) == sorted(expected_store.keys())
+        for answer in expected_store.keys():
+            assert store.get(answer) == expected_store.get(answer)
+    finally:
+        store.close()
+        expected_store.close()
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    wordlist_file = tmp_path / "wordlist.txt"
+    clues_file = tmp_path / "clues.tsv"
+    write_wordlist(wordlist_file)
+    write_clues_file(clues_file)
+    return wordlist_file, clues_file
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_parallel_parsing_matches_a_single_process(tmp_path, inputs, workers):
+    expected_file = format_clues(tmp_path / "single", *inputs)
+    output_file = format_clues(tmp_path / "parallel", *inputs, workers=workers)
+    assert_same_output(output_file, expected_file)
+
+
+def test_zip_member_matches_the_extracted_file(tmp_path, inputs):
+    wordlist_file, clues_file = inputs
+    zip_file = tmp_path / "xd-clues.zip"
+    with zipfile.ZipFile(zip_file, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.write(clues_file, 'xd/clues.tsv')
+
+    expected_file = format_clues(tmp_path / "extracted", wordlist_file, clues_file)
+    # Zip members are read by a single process whatever the number of workers
+    output_file = format_clues(tmp_path / "streamed", wordlist_file, zip_file, clues_member='xd/clues.tsv', workers=2)
+    assert_same_output(output_file, expected_file)
+
+
+def test_unchanged_inputs_skip_the_rebuild(tmp_path, inputs, capsys):
+    output_file = format_clues(tmp_path / "output", *inputs)
+    built = output_file.read_bytes()
+    capsys.readouterr()
+
+    format_clues(tmp_path / "output", *inputs)
+    assert "skipping rebuild" in capsys.readouterr().out
+    assert output_file.read_bytes() == built
+
+
+def test_incremental_rebuild_matches_a_full_rebuild(tmp_path, inputs, capsys):
+    wordlist_file, clues_file = inputs
+    output_file = format_clues(tmp_path / "incremental", wordlist_file, clues_file)
+
+    # Another word list drops, adds and rescores answers without touching the clues file
+    new_wordlist_file = tmp_path / "new_wordlist.txt"
+    write_wordlist(new_wordlist_file, seed=1)
+    capsys.readouterr()
+    format_clues(tmp_path / "incremental", new_wordlist_file, clues_file)
+    output = capsys.readouterr().out
+    assert "Clues file and parameters unchanged" in output
+    assert "newly kept answers" in output
+
+    expected_file = format_clues(tmp_path / "full", new_wordlist_file, clues_file, force=True)
+    assert_same_output(output_file, expected_file)
+
+
+def test_changed_clues_file_is_parsed_again(tmp_path, inputs, capsys):
+    wordlist_file, clues_file = inputs
+    output_file = format_clues(tmp_path / "incremental", wordlist_file, clues_file)
+
+    write_clues_file(clues_file, seed=1)
+    capsys.readouterr()
+    format_clues(tmp_path / "incremental", wordlist_file, clues_file)
+    assert "Clues file and parameters unchanged" not in capsys.readouterr().out
+
+    expected_file = format_clues(tmp_path / "full", wordlist_file, clues_file, force=True)
+    assert_same_output(output_file, expected_file)
+
+
+def test_traced_stages_of_a_build(tmp_path, inputs):
+    # init.py --trace-memory times the build with a tracing StageTimer
+    stages = StageTimer(trace_memory=True)
+    try:
+        format_clues(tmp_path / "output", *inputs, workers=2, stages=stages)
+    finally:
+        stages.stop()
+
+    names = [record['stage'] for record in stages.stages]
+    assert names[0] == 'fingerprint_inputs'
+    assert {'read_wordlist', 'read_clues', 'merge_scores'} <= set(names)
+    assert all(record['peak_traced_kb'] >= 0 and 'failed' not in record for record in stages.stages)
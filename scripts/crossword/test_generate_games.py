@@ -0,0 +1,201 @@
+import json
+import random
+
+import pytest
+
+from conftest import SHAPES_FILE
+from generate_games import (NUMPY_SCORING_MIN_WORDS, SOLVER_ENGINES, generate_games_in_parallel, get_open_crossings, luby,
+                            new_generation_metrics, race_portfolio, restart_schedule, run_generation_worker, score_candidate_words, search_crossword)
+from shape_library import load_shape_library
+
+SHAPE_NAME = '5x5_corners'
+
+
+def assert_valid_fill(shape, filled_slots, words):
+    """Every slot of the shape holds a distinct indexed word of its length, and crossing slots agree on their letters."""
+    slot_keys = {(slot['row'], slot['col'], slot['direction']): slot['length'] for slot in shape['slot_graph']['slots']}
+    filled_keys = [(slot['row'], slot['col'], slot['direction']) for slot in filled_slots]
+    assert sorted(filled_keys) == sorted(slot_keys)
+
+    answers = [slot['answer'] for slot in filled_slots]
+    assert len(set(answers)) == len(answers), "an answer is used twice"
+
+    letters = {}
+    for slot in filled_slots:
+        answer = slot['answer']
+        assert answer in words
+        assert len(answer) == slot_keys[(slot['row'], slot['col'], slot['direction'])]
+        for i, letter in enumerate(answer):
+            cell = (slot['row'], slot['col'] + i) if slot['direction'] == 'across' else (slot['row'] + i, slot['col'])
+            assert shape['grid'][cell[0]][cell[1]] == 1
+            assert letters.setdefault(cell, letter) == letter, f"crossing slots disagree at {cell}"
+
+
+def test_parallel_generation_writes_every_game(tmp_path, clues_index, word_index, shapes, worker_context):
+    # Spawned workers load the clues and shapes from the files rather than inheriting them
+    clues_file = tmp_path / "clues.json"
+    clues_file.write_text(json.dumps(clues_index), encoding='utf-8')
+    output_dir = tmp_path / "games"
+
+    random.seed(0)
+    results = generate_games_in_parallel(
+        clues_file, SHAPES_FILE, output_dir, clues_index, word_index, load_shape_library(SHAPES_FILE),
+        games_to_generate=3, jobs=2, generation_options={'solver': 'backjump', 'top_n': 10}, shape_name=SHAPE_NAME)
+
+    assert sorted(result['game_number'] for result in results) == [1, 2, 3]
+    game_files = sorted(output_dir.glob('game_*.json'))
+    assert len(game_files) == 3
+    for game_file in game_files:
+        game = json.loads(game_file.read_text(encoding='utf-8'))
+        assert game['shape'] == shapes[SHAPE_NAME]['grid']
+        assert_valid_fill(shapes[SHAPE_NAME], game['clues'], clues_index)
+        for entry in game['clues']:
+            assert entry['clues'] == clues_index[entry['answer']]['clues']
+
+
+def test_luby_sequence():
+    assert [luby(i) for i in range(1, 16)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+
+
+def test_restart_schedules():
+    assert list(restart_schedule('none')) == [None]
+    assert list(restart_schedule('luby', unit=10, max_restarts=6)) == [10, 10, 20, 10, 10, 20, 40]
+    assert list(restart_schedule('geometric', unit=10, max_restarts=3)) == [10, 15, 22, 33]
+
+
+def test_restarts_stop_after_the_schedule(word_index, shapes):
+    shape = shapes['5x5_square']
+    metrics = new_generation_metrics()
+    random.seed(0)
+    filled_slots = search_crossword(shape['slot_graph'], shape['grid'], word_index, metrics,
+                                    solver='random', restarts='luby', restart_unit=1, max_restarts=3)
+
+    # A one-backtrack unit cuts every attempt off long before the random solver fills the square
+    assert filled_slots is None
+    attempts = metrics['attempts']
+    assert [attempt['cutoff'] for attempt in attempts] == [1, 1, 2, 1]
+    assert [attempt['outcome'] for attempt in attempts] == ['cutoff'] * 4
+    assert metrics['restarts'] == 3
+    # Every attempt after the first is reseeded, so it can be replayed from its seed
+    assert attempts[0]['seed'] is None
+    assert all(attempt['seed'] is not None for attempt in attempts[1:])
+
+
+def test_timeout_abandons_the_search(word_index, shapes):
+    shape = shapes['7x7_wheel']
+    metrics = new_generation_metrics()
+    random.seed(0)
+    filled_slots = search_crossword(shape['slot_graph'], shape['grid'], word_index, metrics,
+                                    solver='random', restarts='luby', timeout_ms=1)
+
+    assert filled_slots is None
+    assert metrics['attempts'][-1]['outcome'] == 'timeout'
+    assert len(metrics['attempts']) < 100
+
+
+@pytest.mark.parametrize('solver', SOLVER_ENGINES)
+@pytest.mark.parametrize('restarts', ['none', 'luby'])
+def test_every_solver_fills_the_shape(solver, restarts, word_index, shapes):
+    shape = shapes[SHAPE_NAME]
+    metrics = new_generation_metrics()
+    # The random solver only fills the corners reliably with restarts, so it gets a seed it fills without them
+    random.seed(4)
+    filled_slots = search_crossword(shape['slot_graph'], shape['grid'], word_index, metrics, solver=solver, restarts=restarts, timeout_ms=10_000)
+
+    assert filled_slots is not None
+    assert metrics['attempts'][-1]['outcome'] == 'solved'
+    assert_valid_fill(shape, filled_slots, word_index)
+
+
+@pytest.mark.parametrize('shape_name', ['5x5_square', '6x6_corners'])
+def test_backjumping_never_skips_a_fill(shape_name, word_index, shapes):
+    # Unsound conflict sets jump over levels that still had a fill, which shows up as exhausted searches on open shapes
+    shape = shapes[shape_name]
+    for seed in range(3):
+        metrics = new_generation_metrics()
+        random.seed(seed)
+        filled_slots = search_crossword(shape['slot_graph'], shape['grid'], word_index, metrics, solver='backjump', top_n=10)
+
+        assert filled_slots is not None, f"seed {seed}"
+        assert_valid_fill(shape, filled_slots, word_index)
+
+
+def test_numpy_scores_match_python_scores(word_index, shapes):
+    pytest.importorskip('numpy')
+    shape = shapes['6x6_corners']
+    slot_graph = shape['slot_graph']
+    # A partly filled grid, so some crossings have fixed letters and some candidates leave a crossing without words
+    puzzle = [['' if cell == 1 else '#' for cell in row] for row in shape['grid']]
+    first_slot = slot_graph['slots'][0]
+    for (row, col), letter in zip(slot_graph['cells'][0], word_index.get('?' * first_slot['length'])[0]):
+        puzzle[row][col] = letter
+    open_slot_ids = set(range(1, len(slot_graph['slots'])))
+
+    dead_ends = 0
+    for slot in slot_graph['slots'][1:]:
+        crossings = get_open_crossings(slot, open_slot_ids, puzzle, slot_graph)
+        words = word_index.get('?' * slot['length'], [])
+        assert len(words) >= NUMPY_SCORING_MIN_WORDS
+        python_scores = score_candidate_words(words, crossings, word_index, scoring='python')
+        numpy_scores = score_candidate_words(words, crossings, word_index, scoring='numpy')
+        assert numpy_scores == python_scores
+        dead_ends += sum(1 for _, score in python_scores if score < 0)
+    assert dead_ends
+
+
+@pytest.mark.parametrize('solver', ['random', 'backjump'])
+def test_scoring_engines_make_the_same_search(solver, word_index, shapes):
+    pytest.importorskip('numpy')
+    shape = shapes[SHAPE_NAME]
+    searches = []
+    for scoring in ['python', 'numpy']:
+        metrics = new_generation_metrics()
+        random.seed(4)
+        filled_slots = search_crossword(shape['slot_graph'], shape['grid'], word_index, metrics, top_n=100, solver=solver, scoring=scoring)
+        searches.append((filled_slots, metrics['backtracks'], metrics['retry_count']))
+    assert searches[0] == searches[1]
+
+
+def test_portfolio_keeps_the_first_fill(word_index, shapes, worker_context):
+    shape = shapes[SHAPE_NAME]
+    metrics = new_generation_metrics()
+    random.seed(0)
+    filled_slots = race_portfolio(shape['slot_graph'], shape['grid'], word_index, metrics, portfolio_size=2, top_n=10)
+
+    assert_valid_fill(shape, filled_slots, word_index)
+    portfolio = metrics['portfolio']
+    assert portfolio['strategies'][portfolio['winner']]['solved']
+    assert sorted(list(portfolio['strategies']) + portfolio['cancelled']) == ['propagate-luby', 'propagate-narrow']
+
+
+@pytest.mark.parametrize('solver', SOLVER_ENGINES)
+def test_excluded_answers_are_never_placed(solver, word_index, shapes):
+    shape = shapes[SHAPE_NAME]
+    random.seed(4)
+    first_fill = search_crossword(shape['slot_graph'], shape['grid'], word_index, new_generation_metrics(), solver=solver, restarts='luby')
+    excluded = {slot['answer'] for slot in first_fill}
+
+    word_index.exclude_words(excluded)
+    random.seed(4)
+    filled_slots = search_crossword(shape['slot_graph'], shape['grid'], word_index, new_generation_metrics(), solver=solver, restarts='luby')
+    assert_valid_fill(shape, filled_slots, word_index)
+    assert not excluded & {slot['answer'] for slot in filled_slots}
+
+
+def test_worker_applies_the_exclusions_of_each_task(clues_index, word_index, shapes, worker_context):
+    worker_context.update(clues_index=clues_index, word_index=word_index, shapes=load_shape_library(SHAPES_FILE))
+    options = {'solver': 'backjump', 'top_n': 10}
+    first = run_generation_worker((1, 0, SHAPE_NAME, options, frozenset(), False))
+    excluded = frozenset(entry['answer'] for entry in first['game']['clues'])
+
+    # A long-lived pool gets newly published answers with the next task
+    second = run_generation_worker((2, 0, SHAPE_NAME, options, excluded, False))
+    assert not excluded & {entry['answer'] for entry in second['game']['clues']}
+    assert worker_context['excluded_answers'] == excluded
+
+
+def test_portfolio_reports_a_failed_strategy(word_index, shapes, worker_context):
+    shape = shapes[SHAPE_NAME]
+    # An option search_crossword doesn't take makes every strategy raise before it searches
+    with pytest.raises(RuntimeError, match="Portfolio strategy .* failed: TypeError"):
+        race_portfolio(shape['slot_graph'], shape['grid'], word_index, new_generation_metrics(), portfolio_size=2, unknown_option=True)
@@ -0,0 +1,91 @@
+import json
+import random
+
+import pytest
+
+from conftest import SHAPES_FILE
+from generate_shapes import (MAX_SIZE, MIN_SIZE, check_fillability, format_shapes, generate_shapes, generate_symmetric_grid,
+                             is_connected, is_valid_shape)
+from shape_library import compile_shape
+
+
+def assert_valid_generated_grid(grid, size, min_slot_length):
+    assert len(grid) == size and all(len(row) == size for row in grid)
+    for r in range(size):
+        for c in range(size):
+            assert grid[r][c] == grid[size - 1 - r][size - 1 - c], (r, c)
+
+    slot_graph = compile_shape({'name': 'generated', 'grid': grid})['slot_graph']
+    assert min(slot['length'] for slot in slot_graph['slots']) >= min_slot_length
+    white_cells = {(r, c) for r in range(size) for c in range(size) if grid[r][c] == 1}
+    # Every white cell is in an across and a down slot
+    assert set(slot_graph['cell_map']) == white_cells
+    assert all(len(slots) == 2 for slots in slot_graph['cell_map'].values())
+    assert is_connected(grid)
+
+
+@pytest.mark.parametrize('size', [MIN_SIZE, 11, 13, MAX_SIZE])
+@pytest.mark.parametrize('min_slot_length', [3, 4])
+def test_generated_grids_are_symmetric_connected_and_have_long_slots(size, min_slot_length):
+    random.seed(size * 10 + min_slot_length)
+    grids = [generate_symmetric_grid(size, 0.16, min_slot_length) for _ in range(5)]
+    grids = [grid for grid in grids if grid is not None]
+    assert grids
+
+    for grid in grids:
+        assert_valid_generated_grid(grid, size, min_slot_length)
+        blacks = sum(row.count(0) for row in grid)
+        # Pairs of black cells overshoot the target by at most the one cell the center adds
+        assert round(size * size * 0.16) <= blacks <= round(size * size * 0.16) + 1
+
+
+def test_shape_checks():
+    open_grid = [[1] * 5 for _ in range(5)]
+    assert is_valid_shape(open_grid, 5)
+    assert not is_valid_shape(open_grid, 6)
+
+    short_slot = [row[:] for row in open_grid]
+    short_slot[0][2] = 0
+    assert not is_valid_shape(short_slot, 3)
+    assert is_valid_shape(short_slot, 2)
+
+    # A black column splits the grid into two halves with long enough slots
+    split = [[1, 1, 0, 1, 1] for _ in range(5)]
+    assert not is_connected(split)
+    assert not is_valid_shape(split, 2)
+    assert not is_connected([[0] * 5 for _ in range(5)])
+
+
+def test_stuck_grid_returns_none():
+    random.seed(0)
+    # Any black cell in a 3x3 grid leaves a slot shorter than 3
+    assert generate_symmetric_grid(3, 0.2, 3) is None
+
+
+def test_format_shapes_reproduces_shapes_file():
+    text = SHAPES_FILE.read_text(encoding='utf-8')
+    assert format_shapes(json.loads(text)) == text
+
+
+def test_generated_shapes_are_new_and_named_after_existing_ones(capsys):
+    existing_shapes = json.loads(SHAPES_FILE.read_text(encoding='utf-8'))
+    existing_shapes.append({'name': '9x9_generated_1', 'grid': [[1] * 9 for _ in range(9)]})
+    random.seed(1)
+    shapes = generate_shapes(9, 3, None, existing_shapes=existing_shapes, check=False)
+
+    assert [shape['name'] for shape in shapes] == ['9x9_generated_2', '9x9_generated_3', '9x9_generated_4']
+    assert len({json.dumps(shape['grid']) for shape in shapes + existing_shapes}) == len(shapes) + len(existing_shapes)
+    for shape in shapes:
+        assert_valid_generated_grid(shape['grid'], 9, 3)
+    # Written shapes read back as the same shapes
+    assert json.loads(format_shapes(existing_shapes + shapes)) == existing_shapes + shapes
+
+
+def test_fillability_check(word_index, shapes):
+    fillable, reason = check_fillability(shapes['5x5_corners'], word_index, timeout_ms=5000)
+    assert fillable, reason
+
+    # The benchmark words are at most 7 letters long
+    fillable, reason = check_fillability({'name': '9x9_open', 'grid': [[1] * 9 for _ in range(9)]}, word_index)
+    assert not fillable
+    assert reason == "no words of length 9"
@@ -0,0 +1,152 @@
+import http.client
+import json
+import multiprocessing
+import threading
+
+import pytest
+
+from conftest import SHAPES_FILE
+from generate_games import DEFAULT_SCORING_ENGINE, build_word_index, init_generation_worker
+from generation_server import MAX_GAMES_PER_REQUEST, RequestError, create_server, parse_generation_request
+from shape_library import load_shape_library
+
+SHAPE_NAME = '5x5_corners'
+
+
+@pytest.fixture(scope="module")
+def shape_library():
+    return load_shape_library(SHAPES_FILE)
+
+
+def test_request_defaults(shape_library):
+    count, shape_name, generation_options = parse_generation_request({}, shape_library, max_timeout_ms=5000)
+    assert (count, shape_name) == (1, None)
+    assert generation_options == {
+        'top_n': 100, 'solver': 'random', 'order': None, 'restarts': 'none', 'timeout_ms': 5000, 'scoring': DEFAULT_SCORING_ENGINE,
+    }
+
+
+def test_query_string_fields_are_parsed(shape_library):
+    fields = {'count': '3', 'shape': SHAPE_NAME, 'top_n': '10', 'solver': 'backjump', 'timeout_ms': '250'}
+    count, shape_name, generation_options = parse_generation_request(fields, shape_library, max_timeout_ms=5000)
+    assert (count, shape_name) == (3, SHAPE_NAME)
+    assert generation_options['top_n'] == 10
+    assert generation_options['solver'] == 'backjump'
+    assert generation_options['timeout_ms'] == 250
+
+
+@pytest.mark.parametrize('fields', [
+    {'colour': 'red'},
+    {'count': 0},
+    {'count': MAX_GAMES_PER_REQUEST + 1},
+    {'count': 1.5},
+    {'count': True},
+    {'count': '2.5'},
+    {'count': [2]},
+    {'shape': 'missing'},
+    {'shape': 5},
+    {'top_n': 0},
+    {'top_n': 'many'},
+    {'solver': 'magic'},
+    {'order': 'alphabetical'},
+    {'restarts': 'always'},
+    {'scoring': 'gpu'},
+    {'timeout_ms': 0},
+    {'timeout_ms': -5},
+    {'timeout_ms': 5001},
+    {'timeout_ms': 100.5},
+])
+def test_invalid_requests_are_rejected(fields, shape_library):
+    with pytest.raises(RequestError):
+        parse_generation_request(fields, shape_library, max_timeout_ms=5000)
+
+
+@pytest.fixture
+def serve(tmp_path, worker_context):
+    """Starts servers on free localhost ports, each generating from the given clues in a real worker pool."""
+    servers = []
+
+    def start(clues_index):
+        clues_file = tmp_path / "clues.json"
+        clues_file.write_text(json.dumps(clues_index), encoding='utf-8')
+        word_index = build_word_index(clues_index.keys())
+        shapes = load_shape_library(SHAPES_FILE)
+
+        # Forked workers inherit the context, spawned workers load the clues file
+        worker_context.clear()
+        worker_context.update(clues_index=clues_index, word_index=word_index, shapes=shapes)
+        pool = multiprocessing.Pool(1, initializer=init_generation_worker, initargs=(clues_file, None, SHAPES_FILE, None, 1000))
+        context = {
+            'pool': pool, 'word_index': word_index, 'shapes': shapes, 'jobs': 1, 'timeout_ms': 10_000, 'verbose': False,
+            'games_dir': tmp_path / "games", 'fresh_games': 0, 'fresh_days': None, 'fresh_lock': threading.Lock(),
+        }
+        server = create_server(context, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_address[1]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+        server.context['pool'].terminate()
+        server.context['pool'].join()
+
+
+def request(port, method, path, body=None):
+    """Sends a request and returns the status and the response body, read until the server closes the connection."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request(method, path, body=json.dumps(body) if body is not None else None)
+        response = connection.getresponse()
+        return response.status, response.read().decode('utf-8')
+    finally:
+        connection.close()
+
+
+def test_generate_streams_a_line_per_game_and_a_summary(serve, clues_index, shapes):
+    port = serve(clues_index)
+    status, body = request(port, 'POST', '/generate', {'count': 2, 'shape': SHAPE_NAME, 'solver': 'backjump', 'top_n': 10})
+
+    assert status == 200
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert len(lines) == 3
+    assert sorted(line['game_number'] for line in lines[:2]) == [1, 2]
+    for line in lines[:2]:
+        assert line['shape'] == SHAPE_NAME
+        assert line['game']['shape'] == shapes[SHAPE_NAME]['grid']
+        assert {entry['answer'] for entry in line['game']['clues']} <= set(clues_index)
+    assert lines[2] == {'done': True, 'generated': 2, 'failed': 0}
+
+
+def test_query_string_requests_and_health(serve, clues_index):
+    port = serve(clues_index)
+    status, body = request(port, 'GET', f'/generate?count=1&shape={SHAPE_NAME}&solver=propagate&top_n=10')
+    assert status == 200
+    assert json.loads(body.splitlines()[-1]) == {'done': True, 'generated': 1, 'failed': 0}
+
+    status, body = request(port, 'GET', '/health')
+    assert status == 200
+    health = json.loads(body)
+    assert health['status'] == 'ok'
+    assert health['words'] == len(clues_index)
+    assert SHAPE_NAME in health['shapes']
+
+
+@pytest.mark.parametrize('body', [{'count': 1.5}, {'timeout_ms': 0}, [1, 2]])
+def test_invalid_requests_get_bad_request(serve, clues_index, body):
+    port = serve(clues_index)
+    status, response = request(port, 'POST', '/generate', body)
+    assert status == 400
+    assert 'error' in json.loads(response)
+
+
+def test_worker_error_ends_the_stream_with_a_summary(serve, clues_index):
+    # Without clues for the answers the worker raises once it has filled the grid
+    port = serve({word: {'score': entry['score'], 'clues': []} for word, entry in clues_index.items()})
+    status, body = request(port, 'POST', '/generate', {'count': 2, 'shape': SHAPE_NAME, 'solver': 'backjump', 'top_n': 10})
+
+    assert status == 200
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert lines[0]['error'].startswith('ValueError: No clues for word')
+    assert lines[-1] == {'done': True, 'generated': 0, 'failed': 2}
@@ -0,0 +1,131 @@
+import json
+import random
+import time
+
+import pytest
+
+import generate_games
+import search_trace
+from conftest import SHAPES_FILE
+from generate_games import generate_games_in_parallel
+from search_trace import SearchTrace, find_worker_trace_files, merge_trace_files, read_trace_events, worker_trace_file
+from shape_library import load_shape_library
+
+SHAPE_NAME = '5x5_corners'
+
+
+def event_name(event):
+    return event.get('name', event.get('event'))
+
+
+@pytest.fixture
+def clues_file(tmp_path, clues_index):
+    clues_file = tmp_path / "clues.json"
+    clues_file.write_text(json.dumps(clues_index), encoding='utf-8')
+    return clues_file
+
+
+@pytest.mark.parametrize('trace_format', ['jsonl', 'chrome'])
+def test_traced_search_records_every_step(tmp_path, clues_file, trace_format):
+    trace_file = tmp_path / f"search.{trace_format}"
+    output_dir = tmp_path / "games"
+    random.seed(4)
+    generate_games.main(clues_file, SHAPES_FILE, output_dir, shape_name=SHAPE_NAME, top_n=10, solver='random',
+                        trace_file=trace_file, trace_format=trace_format, games_dir=tmp_path / "published", fresh_games=0)
+
+    if trace_format == 'chrome':
+        # A closed Chrome trace is a plain JSON array
+        events = json.loads(trace_file.read_text(encoding='utf-8'))
+        assert {event['ph'] for event in events} == {'i', 'X'}
+        assert all(event['dur'] >= 0 for event in events if event['ph'] == 'X')
+        args = [event['args'] for event in events]
+    else:
+        events = read_trace_events(trace_file)
+        args = events
+    names = [event_name(event) for event in events]
+
+    assert names[0] == 'trace_start'
+    assert names[-1] == 'generate_game'
+    assert {'candidates', 'place', 'pick_random_valid_word', 'calculate_word_heuristic', 'fill_slots',
+            'fill_puzzle_grid_with_answers'} <= set(names)
+    timestamps = [event['ts'] for event in events if event_name(event) in ('candidates', 'place', 'backtrack')]
+    assert timestamps == sorted(timestamps)
+
+    game = json.loads(next(output_dir.glob('*.json')).read_text(encoding='utf-8'))
+    placed = {arg['word'] for name, arg in zip(names, args) if name == 'place'}
+    assert {entry['answer'] for entry in game['clues']} <= placed
+    assert all(arg['depth'] >= 0 for name, arg in zip(names, args) if name in ('place', 'candidates'))
+    assert args[-1]['solved'] and args[-1]['shape'] == SHAPE_NAME
+
+
+def test_unknown_trace_format(tmp_path):
+    with pytest.raises(ValueError, match="Unknown trace format"):
+        SearchTrace(tmp_path / "trace.txt", 'text')
+
+
+def test_unclosed_chrome_trace_is_readable(tmp_path):
+    # A terminated worker only flushes its trace
+    trace = SearchTrace(tmp_path / "trace.json", 'chrome')
+    trace.instant('place', depth=0, word='CAT')
+    trace.flush()
+    assert [event['name'] for event in read_trace_events(tmp_path / "trace.json", 'chrome')] == ['trace_start', 'place']
+
+    trace.close()
+    trace.close()
+    assert len(json.loads((tmp_path / "trace.json").read_text(encoding='utf-8'))) == 2
+
+
+def test_worker_trace_files(tmp_path):
+    trace_file = tmp_path / "search.jsonl"
+    assert worker_trace_file(trace_file, 1234) == tmp_path / "search.1234.jsonl"
+
+    for name in ["search.1234.jsonl", "search.99.jsonl", "search.old.jsonl", "search.1234.json", "other.5.jsonl"]:
+        (tmp_path / name).write_text('', encoding='utf-8')
+    assert find_worker_trace_files(trace_file) == [tmp_path / "search.1234.jsonl", tmp_path / "search.99.jsonl"]
+
+
+@pytest.mark.parametrize('trace_format', ['jsonl', 'chrome'])
+def test_merge_lines_up_worker_traces(tmp_path, monkeypatch, trace_format):
+    trace_file = tmp_path / "search.trace"
+    worker_files = []
+    for pid, word in [(101, 'CAT'), (102, 'DOG')]:
+        monkeypatch.setattr(search_trace.os, 'getpid', lambda: pid)
+        worker_files.append(worker_trace_file(trace_file, pid))
+        with SearchTrace(worker_files[-1], trace_format) as trace:
+            start = trace.clock()
+            trace.instant('place', depth=0, word=word)
+            trace.span('fill_slots', start)
+        time.sleep(0.05)
+
+    assert merge_trace_files(trace_file, worker_files, trace_format) == 6
+    assert not any(worker_file.exists() for worker_file in worker_files)
+
+    events = read_trace_events(trace_file, trace_format)
+    assert [event['ts'] for event in events] == sorted(event['ts'] for event in events)
+    # Spans are sorted by when they started
+    assert [(event['pid'], event_name(event)) for event in events][:3] == [(101, 'trace_start'), (101, 'fill_slots'), (101, 'place')]
+    # The second worker's events count from the first worker's start
+    second_start = next(event for event in events if event['pid'] == 102)
+    assert event_name(second_start) == 'trace_start'
+    assert second_start['ts'] >= 50_000
+
+
+def test_parallel_generation_merges_worker_traces(tmp_path, clues_file, clues_index, word_index, worker_context):
+    trace_file = tmp_path / "search.jsonl"
+    stale_file = worker_trace_file(trace_file, 999)
+    stale_file.write_text(json.dumps({'ts': 0, 'event': 'trace_start', 'pid': 999, 'unix_time': 0}) + '\n', encoding='utf-8')
+
+    random.seed(0)
+    results = generate_games_in_parallel(
+        clues_file, SHAPES_FILE, tmp_path / "games", clues_index, word_index, load_shape_library(SHAPES_FILE),
+        games_to_generate=3, jobs=2, generation_options={'solver': 'backjump', 'top_n': 10}, shape_name=SHAPE_NAME,
+        trace_file=trace_file)
+
+    assert find_worker_trace_files(trace_file) == []
+    events = read_trace_events(trace_file)
+    assert [event['ts'] for event in events] == sorted(event['ts'] for event in events)
+    assert 999 not in {event['pid'] for event in events}
+    assert sum(1 for event in events if event['event'] == 'trace_start') == 2
+    # Each worker's games are in its process' events
+    games = [event for event in events if event['event'] == 'generate_game']
+    assert sorted(event['pid'] for event in games) == sorted(result['worker'] for result in results)
@@ -0,0 +1,76 @@
+import json
+
+from conftest import SHAPES_FILE
+from shape_library import compile_shape, compute_shapes_key, load_shape_library, load_shape_library_cache
+
+GRID = [
+    [1, 1, 1, 0],
+    [1, 0, 1, 1],
+    [1, 1, 1, 1],
+    [0, 1, 1, 1],
+]
+
+
+def write_shapes(shapes_file, shapes):
+    shapes_file.write_text(json.dumps(shapes), encoding='utf-8')
+
+
+def test_compiled_shape_slots_and_crossings():
+    shape = compile_shape({'name': 'test', 'grid': GRID})
+    slot_graph = shape['slot_graph']
+    slots = {(slot['row'], slot['col'], slot['direction']): slot for slot in slot_graph['slots']}
+    assert sorted((key, slot['length']) for key, slot in slots.items()) == [
+        ((0, 0, 'across'), 3), ((0, 0, 'down'), 3), ((0, 2, 'down'), 4), ((1, 2, 'across'), 2),
+        ((1, 3, 'down'), 3), ((2, 0, 'across'), 4), ((2, 1, 'down'), 2), ((3, 1, 'across'), 3),
+    ]
+    assert shape['length_histogram'] == {2: 2, 3: 4, 4: 2}
+    assert shape['symmetry'] == 'diagonal'
+
+    for slot_id, cells in enumerate(slot_graph['cells']):
+        for other_id, idx, other_idx in slot_graph['neighbors'][slot_id]:
+            assert cells[idx] == slot_graph['cells'][other_id][other_idx]
+            assert (slot_id, idx) in slot_graph['cell_map'][cells[idx]]
+    # Every white cell of this grid is in a slot, and only (0, 1) and (1, 0) are in a single slot
+    white_cells = {(r, c) for r, row in enumerate(GRID) for c, cell in enumerate(row) if cell == 1}
+    assert set(slot_graph['cell_map']) == white_cells
+    assert [cell for cell, owners in slot_graph['cell_map'].items() if len(owners) == 1] == [(0, 1), (1, 0)]
+
+
+def test_library_lookups():
+    library = load_shape_library(SHAPES_FILE)
+    with open(SHAPES_FILE, 'r', encoding='utf-8') as f:
+        shapes = json.load(f)
+    assert len(library) == len(shapes)
+    for shape in shapes:
+        assert library.get(shape['name'])['grid'] == shape['grid']
+        assert library.find_grid(shape['grid'])['grid'] == shape['grid']
+    assert library.get('missing') is None
+    assert library.find_grid(GRID) is None
+
+
+def test_cache_round_trip(tmp_path):
+    shapes_file = tmp_path / "shapes.json"
+    cache_file = tmp_path / "shapes.cache"
+    write_shapes(shapes_file, [{'name': 'test', 'grid': GRID}])
+
+    library = load_shape_library(shapes_file, cache_file=cache_file)
+    cached = load_shape_library_cache(cache_file, compute_shapes_key(shapes_file))
+    assert cached.shapes == library.shapes
+    assert load_shape_library(shapes_file, cache_file=cache_file).shapes == library.shapes
+
+
+def test_cache_is_rebuilt_when_stale_or_corrupt(tmp_path):
+    shapes_file = tmp_path / "shapes.json"
+    cache_file = tmp_path / "shapes.cache"
+    write_shapes(shapes_file, [{'name': 'test', 'grid': GRID}])
+    load_shape_library(shapes_file, cache_file=cache_file)
+
+    # The cache key is a hash of the shapes file, so the edited file isn't served from the old cache
+    write_shapes(shapes_file, [{'name': 'renamed', 'grid': GRID}])
+    assert load_shape_library_cache(cache_file, compute_shapes_key(shapes_file)) is None
+    assert load_shape_library(shapes_file, cache_file=cache_file).get('renamed') is not None
+
+    cache_file.write_bytes(b'not a pickle')
+    assert load_shape_library_cache(cache_file, compute_shapes_key(shapes_file)) is None
+    assert load_shape_library(shapes_file, cache_file=cache_file).get('renamed') is not None
+    assert load_shape_library_cache(cache_file, compute_shapes_key(shapes_file)) is not None
@@ -0,0 +1,88 @@
+import json
+import time
+import tracemalloc
+
+import pytest
+
+from stage_timer import StageTimer, resource
+
+
+def test_stages_record_time_and_memory(tmp_path):
+    stages = StageTimer()
+    with stages.stage('download') as record:
+        time.sleep(0.02)
+        record['files'] = 2
+    with stages.stage('format'):
+        with stages.stage('parse'):
+            time.sleep(0.01)
+
+    download, format_stage, parse = stages.stages
+    assert [(record['stage'], record['depth']) for record in stages.stages] == [('download', 0), ('format', 0), ('parse', 1)]
+    assert download['files'] == 2
+    assert download['elapsed_ms'] >= 20
+    assert format_stage['elapsed_ms'] >= parse['elapsed_ms'] >= 10
+    for record in stages.stages:
+        assert 'failed' not in record and 'peak_traced_kb' not in record
+        if resource is not None:
+            assert record['peak_rss_kb'] > 0 and record['rss_growth_kb'] >= 0 and record['peak_child_rss_kb'] >= 0
+
+    report = stages.report(script='test')
+    assert list(report) == ['timestamp', 'script', 'total_ms', 'peak_rss_kb', 'peak_child_rss_kb', 'stages']
+    assert report['total_ms'] >= download['elapsed_ms'] + format_stage['elapsed_ms']
+    assert report['stages'] == stages.stages
+
+    report_file = tmp_path / "report.jsonl"
+    stages.write_report(report_file, run=1)
+    stages.write_report(report_file, run=2)
+    lines = [json.loads(line) for line in report_file.read_text(encoding='utf-8').splitlines()]
+    assert [line['run'] for line in lines] == [1, 2]
+    assert lines[0]['stages'] == stages.stages
+
+
+def test_failed_stage_is_recorded(capsys):
+    stages = StageTimer()
+    with pytest.raises(ValueError):
+        with stages.stage('download'):
+            raise ValueError("offline")
+
+    assert stages.stages[0]['failed']
+    assert 'elapsed_ms' in stages.stages[0]
+    stages.print_table()
+    assert 'download ✗' in capsys.readouterr().out
+
+
+def test_traced_memory_is_the_peak_of_each_stage(capsys):
+    assert not tracemalloc.is_tracing()
+    stages = StageTimer(trace_memory=True)
+    with stages.stage('load'):
+        with stages.stage('allocate'):
+            data = bytearray(4 * 1024 * 1024)
+            del data
+        small = [0] * 10
+    with stages.stage('small'):
+        small.append(1)
+    assert tracemalloc.is_tracing()
+    stages.stop()
+    assert not tracemalloc.is_tracing()
+
+    load, allocate, small_stage = stages.stages
+    assert allocate['peak_traced_kb'] >= 4096
+    # The enclosing stage's peak includes its nested stages, later stages start from a fresh peak
+    assert load['peak_traced_kb'] >= allocate['peak_traced_kb']
+    assert small_stage['peak_traced_kb'] < 1024
+
+    stages.print_table()
+    assert 'traced kb' in capsys.readouterr().out
+
+
+def test_stop_leaves_tracing_started_elsewhere():
+    tracemalloc.start()
+    try:
+        stages = StageTimer(trace_memory=True)
+        with stages.stage('load'):
+            pass
+        stages.stop()
+        assert tracemalloc.is_tracing()
+        assert 'peak_traced_kb' in stages.stages[0]
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from conftest import SHAPES_FILE
+from shape_library import load_shape_library
+from stock_games import count_unjudged_games, estimate_difficulty, find_deficits, is_name_answer, refill_stock
+
+SHAPE_NAME = '5x5_corners'
+
+NAME_CLUES = {
+    'OTERI': {'clues': [], 'hardClues': ["Comic Cheri", "Former SNL regular Cheri", "Comedian Cheri"]},
+    'DYAN': {'clues': [], 'hardClues': ["Actress Cannon", "Oscar nominee Cannon"]},
+    'CAREW': {'clues': ["Rod of Cooperstown"], 'hardClues': ["Twins great Rod", "Seven-time batting champ Rod"]},
+}
+WORD_CLUES = {
+    'OCEAN': {'clues': ["Big body of water", "Atlantic or Pacific"], 'hardClues': []},
+    'TREES': {'clues': ["Forest growth", "Oaks and elms"], 'hardClues': ["They're often barked at"]},
+    'ASTER': {'clues': ["Fall flower"], 'hardClues': []},
+}
+
+
+def make_game(answers, grid=None):
+    clues = {**NAME_CLUES, **WORD_CLUES}
+    return {
+        'shape': grid or [[1]],
+        'clues': [{'answer': answer, **clues[answer]} for answer in answers],
+    }
+
+
+def test_name_answers():
+    for entry in NAME_CLUES.values():
+        assert is_name_answer(entry['clues'] + entry['hardClues'])
+    for entry in WORD_CLUES.values():
+        assert not is_name_answer(entry['clues'] + entry['hardClues'])
+    # Only words after the first count, as every clue starts with a capital
+    assert not is_name_answer(["Feline", "Purring pet"])
+    assert not is_name_answer([])
+
+
+def test_difficulty_estimate():
+    assert estimate_difficulty(make_game(['OCEAN', 'TREES', 'ASTER'])) == 'EASY'
+    assert estimate_difficulty(make_game(['OCEAN', 'TREES', 'OTERI'])) == 'EASY'
+    assert estimate_difficulty(make_game(['OCEAN', 'DYAN', 'OTERI'])) == 'HARD'
+    assert estimate_difficulty(make_game(['OCEAN', 'DYAN', 'OTERI']), max_name_answers=2) == 'EASY'
+    assert estimate_difficulty(make_game(['OTERI']), max_name_answers=0) == 'HARD'
+
+
+def test_deficits():
+    stock = {('a', 'EASY'): 3, ('a', 'HARD'): 1, (None, 'EASY'): 5}
+    assert find_deficits(stock, ['a', 'b'], ['EASY', 'HARD'], target=2) == {
+        ('a', 'EASY'): 0, ('a', 'HARD'): 1, ('b', 'EASY'): 2, ('b', 'HARD'): 2,
+    }
+    assert find_deficits(stock, ['a'], ['HARD'], target=0) == {('a', 'HARD'): 0}
+
+
+def test_unjudged_games_are_counted_by_shape_and_estimate(tmp_path, capsys):
+    shapes = load_shape_library(SHAPES_FILE)
+    grid = shapes.get(SHAPE_NAME)['grid']
+
+    def write_game(name, game):
+        (tmp_path / name).write_text(json.dumps(game), encoding='utf-8')
+
+    write_game("game_1.new.json", make_game(['OCEAN', 'TREES'], grid))
+    write_game("game_2.new.json", make_game(['DYAN', 'OTERI'], grid))
+    write_game("game_3.new.json", make_game(['OCEAN'], [[1, 0], [0, 1]]))
+    # Judged games and other game files aren't stock
+    write_game("game_4.new.json", make_game(['ASTER'], grid))
+    write_game("game_4.json", make_game(['ASTER'], grid))
+    write_game("game_5.json", make_game(['ASTER'], grid))
+    (tmp_path / "game_6.new.json").write_text("{", encoding='utf-8')
+
+    assert count_unjudged_games(tmp_path, shapes) == {(SHAPE_NAME, 'EASY'): 1, (SHAPE_NAME, 'HARD'): 1, (None, 'EASY'): 1}
+    assert count_unjudged_games(tmp_path, shapes, max_name_answers=2) == {(SHAPE_NAME, 'EASY'): 2, (None, 'EASY'): 1}
+    assert "game_6.new.json" in capsys.readouterr().err
+
+
+@pytest.fixture
+def easy_worker(clues_index, word_index, worker_context):
+    """Generates in this process from the benchmark words, with clues that never name anyone."""
+    plain_clues = {word: {'score': entry['score'], 'clues': ["plain benchmark clue"]} for word, entry in clues_index.items()}
+    worker_context.update(clues_index=plain_clues, word_index=word_index, shapes=load_shape_library(SHAPES_FILE))
+
+
+def test_refill_writes_the_missing_games(tmp_path, easy_worker):
+    deficits = {(SHAPE_NAME, 'EASY'): 2, (SHAPE_NAME, 'HARD'): 0}
+    written = refill_stock(deficits, tmp_path, jobs=1, generation_options={'solver': 'backjump', 'top_n': 10})
+
+    assert written == 2
+    assert len(list(tmp_path.glob('game_*.json'))) == 2
+
+
+def test_refill_gives_up_on_a_shape_out_of_attempts(tmp_path, easy_worker, capsys):
+    # Plain clues only make EASY games, so the HARD game is never found
+    deficits = {(SHAPE_NAME, 'EASY'): 0, (SHAPE_NAME, 'HARD'): 1}
+    written = refill_stock(deficits, tmp_path, jobs=1, generation_options={'solver': 'backjump', 'top_n': 10}, attempts_per_game=3)
+
+    assert written == 0
+    assert not list(tmp_path.glob('game_*.json'))
+    output = capsys.readouterr()
+    assert output.out.count("Dropped a EASY") == 3
+    assert f"Gave up on {SHAPE_NAME}" in output.err
@@ -0,0 +1,160 @@
+import pickle
+import random
+
+from word_index import (CACHE_MAGIC, WordIndex, compute_cache_key, load_or_build_word_index, load_word_index_cache,
+                        save_word_index_cache)
+
+WORDS = ['CAT', 'COT', 'CUT', 'CAR', 'BAT', 'ACT', 'CART', 'CAST', 'COAT', 'TACT', 'CACTI', 'CATCH']
+
+
+def build_wildcard_index(words):
+    """The 2^L wildcard expansion the position bitsets replaced, kept as the reference for lookups."""
+    wildcard_index = {}
+    for word in words:
+        for mask in range(1 << len(word)):
+            variant = ''.join('?' if (mask >> i) & 1 else char for i, char in enumerate(word))
+            wildcard_index.setdefault(variant, set()).add(word)
+    return wildcard_index
+
+
+def sample_patterns(words, count, seed=0):
+    """Patterns made from indexed words with random letters wildcarded or changed, so some match nothing."""
+    rng = random.Random(seed)
+    patterns = []
+    for _ in range(count):
+        word = rng.choice(words)
+        pattern = [rng.choice(['?', char, char, 'Q']) for char in word]
+        patterns.append(''.join(pattern))
+    return patterns
+
+
+def test_lookups_match_wildcard_index():
+    word_index = WordIndex(WORDS)
+    wildcard_index = build_wildcard_index(WORDS)
+    patterns = list(wildcard_index) + ['C?Z', 'QQQ', '??', '??????', 'Z????']
+    for pattern in patterns:
+        expected = wildcard_index.get(pattern, set())
+        assert set(word_index.get(pattern, [])) == expected, pattern
+        assert word_index.count(pattern) == len(expected), pattern
+        assert word_index.count_matches(pattern) == len(expected), pattern
+
+
+def test_lookups_match_wildcard_index_on_benchmark_words(clues_index):
+    words = sorted(word for word in clues_index if len(word) <= 6)
+    word_index = WordIndex(words)
+    wildcard_index = build_wildcard_index(words)
+    for pattern in sample_patterns(words, 2000):
+        expected = wildcard_index.get(pattern, set())
+        assert sorted(word_index.get(pattern, [])) == sorted(expected), pattern
+        assert word_index.count(pattern) == len(expected), pattern
+
+
+def test_get_returns_default_without_matches():
+    word_index = WordIndex(WORDS)
+    assert word_index.get('Z??') is None
+    assert word_index.get('????????', []) == []
+
+
+def test_word_ids_and_membership():
+    word_index = WordIndex(WORDS + ['CAT'])
+    assert len(word_index) == len(WORDS)
+    assert 'CAT' in word_index
+    assert 'CAZ' not in word_index
+    assert 'C?T' not in word_index
+    for word in WORDS:
+        word_id = word_index.word_id(word)
+        assert word_index.words_by_length[len(word)][word_id] == word
+        assert word_index.decode(len(word), 1 << word_id) == [word]
+    assert word_index.word_id('ZZZ') == -1
+
+
+def write_words(tmp_path, words):
+    words_file = tmp_path / "words.txt"
+    words_file.write_text('\n'.join(words) + '\n', encoding='utf-8')
+    return words_file
+
+
+def assert_same_index(loaded, word_index):
+    assert loaded.words_by_length == word_index.words_by_length
+    assert loaded.position_bits == word_index.position_bits
+    assert loaded.all_bits == word_index.all_bits
+
+
+def test_cache_round_trip(tmp_path):
+    word_index = WordIndex(WORDS)
+    cache_key = compute_cache_key(write_words(tmp_path, WORDS))
+    cache_file = tmp_path / "words.index"
+    save_word_index_cache(word_index, cache_file, cache_key)
+
+    loaded = load_word_index_cache(cache_file, cache_key)
+    assert_same_index(loaded, word_index)
+    assert loaded.get('C?T') == word_index.get('C?T')
+    assert loaded.count('CA??') == word_index.count('CA??')
+
+
+def test_cache_rejects_stale_and_corrupt_files(tmp_path):
+    word_index = WordIndex(WORDS)
+    cache_key = compute_cache_key(write_words(tmp_path, WORDS))
+    cache_file = tmp_path / "words.index"
+    save_word_index_cache(word_index, cache_file, cache_key)
+    data = cache_file.read_bytes()
+
+    assert load_word_index_cache(tmp_path / "missing.index", cache_key) is None
+    assert load_word_index_cache(cache_file, "another key") is None
+
+    corrupt_files = {
+        'magic': b'NOTINDEX' + data[len(CACHE_MAGIC):],
+        'truncated': data[:len(data) // 2],
+        'payload': data[:-1] + bytes([data[-1] ^ 0xFF]),
+        'empty': b'',
+    }
+    for name, corrupt in corrupt_files.items():
+        cache_file.write_bytes(corrupt)
+        assert load_word_index_cache(cache_file, cache_key) is None, name
+
+
+def test_load_or_build_refreshes_stale_cache(tmp_path):
+    words_file = write_words(tmp_path, WORDS)
+    cache_file = tmp_path / "words.index"
+    load_or_build_word_index(words_file, lambda: WORDS, cache_file=cache_file)
+    assert cache_file.exists()
+
+    # A changed source file changes the key, so the old cache is rebuilt from the new words
+    new_words = WORDS + ['DOG']
+    write_words(tmp_path, new_words)
+    word_index = load_or_build_word_index(words_file, lambda: new_words, cache_file=cache_file)
+    assert 'DOG' in word_index
+    assert 'DOG' in load_word_index_cache(cache_file, compute_cache_key(words_file))
+
+
+def test_pickled_index_keeps_lookups_and_count_cache_size():
+    word_index = WordIndex(WORDS)
+    word_index.set_count_cache_size(10)
+    word_index.count('C?T')
+
+    unpickled = pickle.loads(pickle.dumps(word_index))
+    assert_same_index(unpickled, word_index)
+    assert unpickled.count('C?T') == 3
+    assert unpickled.count.cache_parameters()['maxsize'] == 10
+    assert unpickled.count_cache_info() == (0, 1)
+
+
+def test_excluded_words_are_left_out_of_lookups():
+    word_index = WordIndex(WORDS)
+    word_index.count('C?T')
+    assert word_index.exclude_words(['CAT', 'CART', 'DOG']) == 2
+
+    # The count cache is cleared, so counts from before the exclusion aren't served
+    assert word_index.count('C?T') == 2
+    assert word_index.get('C?T') == ['COT', 'CUT']
+    assert word_index.get('?A??') == ['CAST', 'TACT']
+    assert 'CAT' not in word_index
+    # Excluded words keep their bits, so cached bitsets and word ids stay valid
+    assert word_index.word_id('CAT') >= 0
+    assert len(word_index) == len(WORDS)
+
+    # Each call replaces the earlier exclusions
+    assert word_index.exclude_words(['COT']) == 1
+    assert word_index.get('C?T') == ['CAT', 'CUT']
+    assert word_index.exclude_words([]) == 0
+    assert word_index.get('???') == sorted(word for word in WORDS if len(word) == 3)
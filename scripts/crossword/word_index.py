@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Wildcard word index for the crossword generator.
+Words are grouped by length and every (length, position, letter) gets a bitset of the words
+that have that letter at that position. A pattern like C?T?? is answered by intersecting
+the bitsets of its fixed letters, so the index grows linearly with word length instead of 2^L.
+
+The built index can be saved to a binary cache file keyed by a hash of its source data,
+which later runs read back instead of rebuilding the index. Loading still copies every bitset into a
+Python int, so it saves the build time but not the memory, and each worker process holds its own copy.
+"""
+import bisect
+import functools
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+DEFAULT_COUNT_CACHE_SIZE = 100_000
+
+
+class WordIndex:
+    """
+    Index of words answering wildcard pattern lookups, e.g. C?T would match CAT, COT, CUT, etc.
+    Bit i of a bitset for length L refers to words_by_length[L][i].
+    """
+
+    WILDCARD = '?'
+
+    def __init__(self, words):
+        self.words_by_length = {}
+        for word in sorted(set(words)):
+            self.words_by_length.setdefault(len(word), []).append(word)
+
+        self.all_bits = {}
+        self.position_bits = {}
+        for length, bucket in self.words_by_length.items():
+            self.all_bits[length] = (1 << len(bucket)) - 1
+            self.position_bits[length] = build_position_bitsets(bucket, length)
+        self.excluded_bits = {}
+        self.set_count_cache_size(DEFAULT_COUNT_CACHE_SIZE)
+
+    @classmethod
+    def from_bitsets(cls, words_by_length, position_bits):
+        """Creates an index from prebuilt word buckets and bitsets, e.g. read back from a cache file."""
+        word_index = cls.__new__(cls)
+        word_index.words_by_length = words_by_length
+        word_index.position_bits = position_bits
+        word_index.all_bits = {length: (1 << len(bucket)) - 1 for length, bucket in words_by_length.items()}
+        word_index.excluded_bits = {}
+        word_index.set_count_cache_size(DEFAULT_COUNT_CACHE_SIZE)
+        return word_index
+
+    def set_count_cache_size(self, maxsize):
+        """
+        Memoizes count() in an LRU cache of up to maxsize patterns (0 disables it).
+        The cache lives as long as the index, so it carries over between games and retries.
+        Each worker process gets its own copy, so no locking is needed.
+        """
+        if maxsize:
+            self.count = functools.lru_cache(maxsize=maxsize)(self.count_matches)
+        else:
+            self.count = self.count_matches
+
+    def __getstate__(self):
+        # The count cache wraps a bound method, so it is rebuilt empty rather than pickled
+        state = dict(self.__dict__)
+        cache_parameters = getattr(state.pop('count'), 'cache_parameters', None)
+        state['count_cache_size'] = cache_parameters()['maxsize'] if cache_parameters else 0
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        count_cache_size = state.pop('count_cache_size')
+        self.__dict__.update(state)
+        self.set_count_cache_size(count_cache_size)
+
+    def count_cache_info(self):
+        """Returns the (hits, misses) of the count cache so far."""
+        cache_info = getattr(self.count, 'cache_info', None)
+        if cache_info is None:
+            return 0, 0
+        info = cache_info()
+        return info.hits, info.misses
+
+    def exclude_words(self, words):
+        """
+        Leaves the words out of every pattern lookup, replacing any earlier exclusions.
+        Their bits are cleared from the bitset each lookup starts from, so excluded words cost nothing per candidate.
+        Returns the number of indexed words that are excluded.
+        """
+        self.excluded_bits = {}
+        for word in words:
+            word_id = self.word_id(word)
+            if word_id >= 0:
+                self.excluded_bits[len(word)] = self.excluded_bits.get(len(word), 0) | (1 << word_id)
+        for length, bucket in self.words_by_length.items():
+            self.all_bits[length] = ((1 << len(bucket)) - 1) & ~self.excluded_bits.get(length, 0)
+
+        cache_clear = getattr(self.count, 'cache_clear', None)
+        if cache_clear is not None:
+            cache_clear()
+        return sum(bits.bit_count() for bits in self.excluded_bits.values())
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.words_by_length.values())
+
+    def __contains__(self, word):
+        return self.WILDCARD not in word and self.pattern_bits(word) != 0
+
+    def bitset_count(self):
+        return sum(len(letters) for positions in self.position_bits.values() for letters in positions)
+
+    def word_id(self, word):
+        """Position of the word in its length bucket (bit index in the bitsets), or -1 if not indexed."""
+        bucket = self.words_by_length.get(len(word), [])
+        i = bisect.bisect_left(bucket, word)
+        return i if i < len(bucket) and bucket[i] == word else -1
+
+    def letter_bits(self, length, position, letter):
+        """Bitset of words of the given length with the letter at the position."""
+        return self.position_bits[length][position].get(letter, 0)
+
+    def pattern_bits(self, pattern):
+        """Bitset of the words matching the wildcard pattern."""
+        length = len(pattern)
+        bits = self.all_bits.get(length, 0)
+        if not bits:
+            return 0
+
+        positions = self.position_bits[length]
+        for i, char in enumerate(pattern):
+            if char == self.WILDCARD:
+                continue
+            bits &= positions[i].get(char, 0)
+            if not bits:
+                return 0
+        return bits
+
+    def decode(self, length, bits):
+        """List the words set in a bitset for the given length."""
+        bucket = self.words_by_length.get(length, [])
+        if bits == self.all_bits.get(length) and not self.excluded_bits.get(length):
+            return list(bucket)
+
+        # Scan the binary string in C rather than peeling off one bit at a time
+        binary = format(bits, 'b')[::-1]
+        words = []
+        word_id = binary.find('1')
+        while word_id != -1:
+            words.append(bucket[word_id])
+            word_id = binary.find('1', word_id + 1)
+        return words
+
+    def count_matches(self, pattern):
+        """Number of words matching the wildcard pattern. Usually called through the cached count()."""
+        return self.pattern_bits(pattern).bit_count()
+
+    def get(self, pattern, default=None):
+        """List of words matching the wildcard pattern, or default if there are none."""
+        bits = self.pattern_bits(pattern)
+        if not bits:
+            return default
+        return self.decode(len(pattern), bits)
+
+
+def build_position_bitsets(bucket, length):
+    """
+    Builds a list (one per position) of {letter: bitset} for words of the same length.
+    Bits are collected in bytearrays first since OR-ing into big ints one word at a time is quadratic.
+    """
+    num_bytes = (len(bucket) + 7) // 8
+    positions = [{} for _ in range(length)]
+    for word_id, word in enumerate(bucket):
+        byte_index = word_id >> 3
+        bit_mask = 1 << (word_id & 7)
+        for i, char in enumerate(word):
+            letter_bytes = positions[i].get(char)
+            if letter_bytes is None:
+                letter_bytes = positions[i][char] = bytearray(num_bytes)
+            letter_bytes[byte_index] |= bit_mask
+
+    return [
+        {char: int.from_bytes(letter_bytes, 'little') for char, letter_bytes in letters.items()}
+        for letters in positions
+    ]
+
+
+# Binary cache layout: MAGIC | u32 header length | JSON header | payload
+# The header records the cache key, a CRC of the payload and the byte ranges of every word list and bitset.
+CACHE_MAGIC = b'XWINDEX\n'
+CACHE_VERSION = 1
+INDEX_PARAMETERS = {
+    'version': CACHE_VERSION,
+    'wildcard': WordIndex.WILDCARD,
+    'byteorder': 'little',
+}
+
+
+def compute_cache_key(source_file, parameters=None):
+    """Content hash of the source file combined with the index parameters."""
+    if parameters is None:
+        parameters = INDEX_PARAMETERS
+
+    digest = hashlib.sha256()
+    with open(source_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(json.dumps(parameters, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def save_word_index_cache(word_index, cache_file, cache_key):
+    """Writes the index to a binary cache file. The file is replaced atomically."""
+    payload = bytearray()
+    lengths = {}
+
+    def append_block(data):
+        offset = len(payload)
+        payload.extend(data)
+        return [offset, len(data)]
+
+    for length, bucket in sorted(word_index.words_by_length.items()):
+        num_bytes = (len(bucket) + 7) // 8
+        lengths[str(length)] = {
+            'count': len(bucket),
+            'words': append_block('\n'.join(bucket).encode('utf-8')),
+            'positions': [
+                {char: append_block(bits.to_bytes(num_bytes, 'little')) for char, bits in sorted(letters.items())}
+                for letters in word_index.position_bits[length]
+            ],
+        }
+
+    header = json.dumps({
+        'key': cache_key,
+        'crc32': zlib.crc32(payload),
+        'size': len(payload),
+        'lengths': lengths,
+    }, sort_keys=True).encode('utf-8')
+
+    cache_path = Path(cache_file)
+    temp_path = cache_path.with_name(cache_path.name + '.tmp')
+    with open(temp_path, 'wb') as f:
+        f.write(CACHE_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        f.write(payload)
+    os.replace(temp_path, cache_path)
+
+
+def load_word_index_cache(cache_file, cache_key):
+    """
+    Reads a binary cache file and rebuilds the index from it.
+    Returns None if the cache is missing, stale (different key) or corrupt.
+    """
+    try:
+        with open(cache_file, 'rb') as f:
+            return read_word_index_cache(f.read(), cache_key)
+    except (OSError, ValueError, KeyError, TypeError, struct.error, UnicodeDecodeError):
+        return None
+
+
+def read_word_index_cache(buffer, cache_key):
+    prefix_size = len(CACHE_MAGIC) + 4
+    if buffer[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+        raise ValueError("Bad word index cache magic")
+    (header_size,) = struct.unpack('<I', buffer[len(CACHE_MAGIC):prefix_size])
+    header = json.loads(buffer[prefix_size:prefix_size + header_size].decode('utf-8'))
+    if header['key'] != cache_key:
+        return None
+
+    payload = memoryview(buffer)[prefix_size + header_size:]
+    if len(payload) != header['size'] or zlib.crc32(payload) != header['crc32']:
+        raise ValueError("Word index cache payload is corrupt")
+
+    def read_block(block):
+        offset, size = block
+        return payload[offset:offset + size]
+
+    words_by_length = {}
+    position_bits = {}
+    for length_key, entry in header['lengths'].items():
+        length = int(length_key)
+        bucket = bytes(read_block(entry['words'])).decode('utf-8').split('\n')
+        if len(bucket) != entry['count'] or any(len(word) != length for word in bucket):
+            raise ValueError(f"Word index cache has a bad word list for length {length}")
+        words_by_length[length] = bucket
+        position_bits[length] = [
+            {char: int.from_bytes(read_block(block), 'little') for char, block in letters.items()}
+            for letters in entry['positions']
+        ]
+    return WordIndex.from_bitsets(words_by_length, position_bits)
+
+
+def load_or_build_word_index(source_file, words_loader, cache_file=None, verbose=False):
+    """
+    Loads the word index from the cache file when it matches the source file, otherwise
+    builds it from words_loader() and refreshes the cache.
+    """
+    if cache_file is None:
+        return WordIndex(words_loader())
+
+    cache_key = compute_cache_key(source_file)
+    word_index = load_word_index_cache(cache_file, cache_key)
+    if word_index is not None:
+        if verbose:
+            print(f"Loaded word index cache {cache_file}")
+        return word_index
+
+    if verbose and Path(cache_file).exists():
+        print(f"Word index cache {cache_file} is stale or corrupt, rebuilding")
+    word_index = WordIndex(words_loader())
+    try:
+        save_word_index_cache(word_index, cache_file, cache_key)
+    except OSError as e:
+        print(f"✗ Failed to write word index cache {cache_file}: {e}", file=sys.stderr)
+    return word_index
@@ -41,6 +41,17 @@ def calculate_difficulty(clue_entries):
         return "HARD"
 
 
+def record_recent_answers(output_filepath, data):
+    """
+    Appends the game's answers to recent_answers.tsv, which the generator reads to avoid repeating them.
+    One line per game: timestamp<TAB>game file name<TAB>difficulty<TAB>ANSWER ANSWER ...
+    """
+    log_filepath = os.path.join(os.path.dirname(output_filepath), "recent_answers.tsv")
+    answers = " ".join(entry["answer"] for entry in data["clues"])
+    with open(log_filepath, 'a', encoding='utf-8') as f:
+        f.write(f"{data['timestamp']}\t{os.path.basename(output_filepath)}\t{data['difficulty']}\t{answers}\n")
+
+
 def process_ratings_file(ratings_filepath):
     """Process a single ratings file and create the final game file."""
     # Read TSV file
@@ -100,6 +111,7 @@ def process_ratings_file(ratings_filepath):
         json.dump(data, f, indent=2, ensure_ascii=False)
 
     print(f"Wrote {output_filepath} | Difficulty: {difficulty}")
+    record_recent_answers(output_filepath, data)
 
     # Delete the ratings file and source file after successful commit
     os.remove(ratings_filepath)